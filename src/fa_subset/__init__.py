@@ -1,4 +1,18 @@
-__all__ = ("downloader", "fa_extractor", "input_reader", "zip_extractor")
+__all__ = (
+    "archive",
+    "batch",
+    "cache",
+    "daemon",
+    "downloader",
+    "fa_extractor",
+    "icon_index",
+    "input_reader",
+    "metrics",
+    "remote_cache",
+    "subset_cache",
+    "superfont",
+    "zip_extractor",
+)
 
 
 def __getattr__(name):
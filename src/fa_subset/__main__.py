@@ -1,15 +1,27 @@
+import concurrent.futures
+import contextlib
+import datetime
 import functools
 import operator
+import os
 import shutil
 import sys
-import tempfile
-from collections.abc import Iterable, MutableSequence, Sequence
+from collections.abc import (
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableSequence,
+    Sequence,
+)
 from pathlib import Path
-from typing import NoReturn
+from typing import Any, Final, NoReturn
 
 import click
 
-from . import fa_extractor, input_reader
+from . import archive, cache, fa_extractor, icon_index, input_reader
+from . import metrics as metrics_
+from . import remote_cache as remote_cache_
+from . import superfont
 
 ExistingDir = click.Path(dir_okay=True, file_okay=False, exists=True, path_type=Path)
 ExistingFileOrDir = click.Path(
@@ -17,37 +29,180 @@ ExistingFileOrDir = click.Path(
 )
 ExistingFile = click.Path(dir_okay=False, file_okay=True, exists=True, path_type=Path)
 
+# Defaults for the options controlled by `--profile`. Options passed explicitly
+# on the command line always take precedence over the profile.
+BUILD_PROFILES: Final[Mapping[str, Mapping[str, Any]]] = {
+    "release": {"flavor": ("woff", "woff2"), "optimize": None, "cache": False},
+    # Skip all compression and optimization work, and reuse previously
+    # generated fonts when the inputs haven't changed.
+    "dev": {"flavor": ("ttf",), "optimize": None, "cache": True},
+}
+
 
 def _get_default_output_loc() -> Path:
     return Path.cwd() / "fontawesome-subset"
 
 
+@contextlib.contextmanager
+def _output_writer(
+    stream_output: bool, archive_format: str, mtime: int | None
+) -> Iterator[fa_extractor.OutputWriter]:
+    if not stream_output:
+        yield fa_extractor.write_file
+        return
+
+    with archive.open_archive(sys.stdout.buffer, archive_format, mtime=mtime) as add:
+        yield add
+
+
 def _bad_options(message: str) -> NoReturn:
-    print(message)
+    # Never on stdout, which may be carrying an archive (see --output -).
+    click.echo(message, err=True)
     sys.exit(1)
 
 
-@click.command()
+def _source_date_epoch() -> int | None:
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        _bad_options(f"SOURCE_DATE_EPOCH must be an integer, not {value!r}")
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def _parse_size(ctx: click.Context, param: click.Parameter, value: str | None):
+    if value is None:
+        return None
+    try:
+        return cache.parse_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+def _fetch_release(cache_dir: Path, version: str, offline: bool) -> Path:
+    from . import downloader, zip_extractor
+
+    font_awesome = downloader.download_version(version, cache_dir, offline=offline)
+    try:
+        zip_extractor.verify(font_awesome)
+    except ValueError:
+        # Remove it, so that it is downloaded again next time.
+        font_awesome.unlink(missing_ok=True)
+        raise
+
+    fa_dir = zip_extractor.unzip(font_awesome)
+    fa_extractor.ensure_index(fa_dir)
+    superfont.ensure(fa_dir, superfont.available(fa_extractor.find_input_fonts(fa_dir)))
+    for path in (font_awesome, fa_dir):
+        cache.touch(path)
+    return fa_dir
+
+
+def _release_dir(
+    obj: Mapping[str, Any], font_awesome: Path | None, version: str | None
+) -> Path:
+    if font_awesome is None:
+        from . import downloader
+
+        obj["cache_dir"].mkdir(parents=True, exist_ok=True)
+        try:
+            font_awesome = downloader.download_version(
+                downloader.LATEST_FA_VERSION if version is None else version,
+                obj["cache_dir"],
+                offline=obj["offline"],
+            )
+        except FileNotFoundError as e:
+            _bad_options(str(e))
+        cache.touch(font_awesome)
+
+    if font_awesome.suffix == ".zip":
+        from . import zip_extractor
+
+        return zip_extractor.unzip(font_awesome)
+    return font_awesome
+
+
+def _release_options(f):
+    # Options picking the release to look icons up in, for subcommands.
+    f = click.option(
+        "--font-awesome-version",
+        "version",
+        type=str,
+        default=None,
+        help="The version of font-awesome to use, downloading it if needed. "
+        "Defaults to the latest version.",
+    )(f)
+    f = click.option(
+        "--font-awesome",
+        type=ExistingFileOrDir,
+        default=None,
+        help="A copy of font-awesome to use, either as a zip or a directory.",
+    )(f)
+    return f
+
+
+def _print_size_report(size_report: Iterable[fa_extractor.FlavorSize]) -> None:
+    for size in size_report:
+        saved = size.before - size.after
+        percent = (100 * saved / size.before) if size.before else 0.0
+        click.echo(
+            f"{size.flavor}: {size.before} -> {size.after} bytes "
+            f"(-{saved} bytes, -{percent:.1f}%)",
+            err=True,
+        )
+
+
+def _print_memory_report(memory_report: Iterable[fa_extractor.StageMemory]) -> None:
+    for stage in memory_report:
+        click.echo(f"{stage.stage}: {_format_size(stage.peak)} peak", err=True)
+
+
+@click.group(invoke_without_command=True)
 @click.option(
     "--input",
     "-i",
-    type=ExistingFile,
-    default=None,
-    help="A newline-delimited text file containing a list of glyphs to include "
-    "in the output",
+    type=str,
+    multiple=True,
+    metavar="FILE",
+    help="A file listing the glyphs to include in the output: either a "
+    "newline-delimited text file, or a `.json` or `.toml` file with an `icons` "
+    "list. May be given more than once, and may be a glob pattern. Glyphs may "
+    "be prefixed with the style to use for them, e.g. `regular:user`. If not "
+    "given, a newline-delimited list is read from stdin.",
 )
 @click.option(
     "--output",
     "-o",
-    type=ExistingDir,
+    # click only accepts `-` for paths that may be files, so directories are
+    # checked in main.
+    type=click.Path(
+        dir_okay=True, file_okay=True, exists=True, allow_dash=True, path_type=Path
+    ),
     default=None,
     help="A directory (which may exist already, but will be made if "
     "it does not exist) where the outputs should go. If you "
     "would like to specify the CSS and font output locations "
     "separately, use `--css-output` and `--font-output`. If "
-    "those are used, you must not specify `--output`.",
+    "those are used, you must not specify `--output`. Use `-` to write "
+    "an archive of the outputs to stdout instead (see `--archive-format`).",
     show_default=_get_default_output_loc(),
 )
+@click.option(
+    "--archive-format",
+    type=click.Choice(archive.FORMATS),
+    default="tar",
+    show_default=True,
+    help="The format of the archive written by `--output -`.",
+)
 @click.option(
     "--css-output",
     type=ExistingDir,
@@ -94,11 +249,119 @@ def _bad_options(message: str) -> NoReturn:
     help="Flavors of font to output. Currently supported options are:\n"
     "    woff2, woff and ttf",
 )
+@click.option(
+    "--optimize",
+    type=click.Choice(sorted(fa_extractor.OPTIMIZE_PROFILES)),
+    default=None,
+    help="Apply an optimization profile to the output fonts. The `size` "
+    "profile strips hinting, layout features and most name records, and "
+    "reports the size of each font flavor before and after optimization.",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(sorted(BUILD_PROFILES)),
+    default="release",
+    show_default=True,
+    help="Pick defaults suited to a type of build. The `dev` profile only "
+    "outputs an uncompressed ttf, skips optimizations and caches the "
+    "generated fonts between runs, to make rebuilds as fast as possible.",
+)
+@click.option(
+    "--reproducible",
+    is_flag=True,
+    default=False,
+    help="Make the output fonts byte-for-byte reproducible, with timestamps "
+    "taken from SOURCE_DATE_EPOCH (if set) or from the input fonts. This is "
+    "the default if SOURCE_DATE_EPOCH is set.",
+)
+@click.option(
+    "--fingerprint",
+    is_flag=True,
+    default=False,
+    help="Include a hash of the contents in the name of each output file, "
+    "so that they can be served with long-lived caching headers. Implies "
+    "`--manifest`.",
+)
+@click.option(
+    "--manifest",
+    type=click.Path(dir_okay=False, file_okay=True, path_type=Path),
+    default=None,
+    help="Write a JSON manifest mapping the logical name of each output file "
+    "to the file actually written. Defaults to `manifest.json` in the output "
+    "directory (or the CSS output directory) if `--fingerprint` is used.",
+)
+@click.option(
+    "--depfile",
+    type=click.Path(dir_okay=False, file_okay=True, path_type=Path),
+    default=None,
+    help="Write a Makefile-style dependency file listing the input files "
+    "used to generate the outputs, for use with make or ninja.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(dir_okay=True, file_okay=False, path_type=Path),
+    default=None,
+    envvar=cache.CACHE_DIR_ENV,
+    help="The directory in which to cache downloaded releases and generated "
+    "fonts. Defaults to `fa-subset` in the XDG cache directory. The cache is "
+    "pruned at most once an hour, after a run, according to "
+    "FA_SUBSET_CACHE_MAX_SIZE and FA_SUBSET_CACHE_MAX_AGE (in days).",
+)
+@click.option(
+    "--remote-cache",
+    type=str,
+    default=None,
+    metavar="URL",
+    envvar=remote_cache_.REMOTE_CACHE_ENV,
+    help="A cache of generated fonts shared between machines: either a "
+    "directory (e.g. on a network file system) or an http(s) URL supporting "
+    "GET and PUT. Fonts are fetched from it when possible, and fonts that had "
+    "to be built are uploaded to it.",
+)
+@click.option(
+    "--metrics",
+    "metrics_out",
+    type=click.Path(dir_okay=False, file_okay=True, path_type=Path),
+    default=None,
+    help="Write metrics about the build (durations, cache hits, output sizes "
+    "and memory use) to this file.",
+)
+@click.option(
+    "--metrics-format",
+    type=click.Choice(metrics_.FORMATS),
+    default="jsonl",
+    show_default=True,
+    help="The format of `--metrics`: `jsonl` appends a JSON object per build, "
+    "and `prometheus` writes a Prometheus textfile (e.g. for node_exporter).",
+)
+@click.option(
+    "--memory-report",
+    is_flag=True,
+    default=False,
+    help="Report the peak memory used by each stage of generating the "
+    "fonts. This slows down the build.",
+)
+@click.option(
+    "--cost-report",
+    "cost_report_out",
+    type=click.Path(dir_okay=False, file_okay=True, path_type=Path),
+    default=None,
+    help="Write a JSON report of how many bytes each icon adds to the fonts, "
+    "most expensive first.",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    envvar="FA_SUBSET_OFFLINE",
+    help="Never access the network; fail if the requested version of font "
+    "awesome is not already in the cache (see `fa-subset fetch`).",
+)
 @click.option(
     "--version", is_flag=True, default=False, help="Print the current version and exit"
 )
 def main(
-    input: Path | None,
+    input: Sequence[str],
     output: Path | None,
     css_output: Path | None,
     font_output: Path | None,
@@ -106,6 +369,20 @@ def main(
     font_awesome_url: str | None,
     font_awesome_version: str | None,
     flavor: Sequence[str],
+    optimize: str | None = None,
+    profile: str = "release",
+    reproducible: bool = False,
+    fingerprint: bool = False,
+    manifest: Path | None = None,
+    depfile: Path | None = None,
+    cache_dir: Path | None = None,
+    remote_cache: str | None = None,
+    metrics_out: Path | None = None,
+    metrics_format: str = "jsonl",
+    archive_format: str = "tar",
+    memory_report: bool = False,
+    cost_report_out: Path | None = None,
+    offline: bool = False,
     version: bool = False,
 ) -> None:
     """A CLI for creating subsets of the font awesome icon framework.
@@ -120,6 +397,14 @@ def main(
         print(__version__)
         sys.exit(0)
 
+    ctx = click.get_current_context()
+    if cache_dir is None:
+        cache_dir = cache.default_cache_dir()
+    ctx.ensure_object(dict).update(cache_dir=cache_dir, offline=offline)
+
+    if ctx.invoked_subcommand is not None:
+        return
+
     # Handle mutually exclusive options
     if (output is not None) and ((css_output is not None) or (font_output is not None)):
         _bad_options(
@@ -130,7 +415,14 @@ def main(
             "Both or neither of --css-output and --font-output must be specified, not just one"
         )
 
-    temp_path = Path(tempfile.gettempdir())
+    profile_settings = BUILD_PROFILES[profile]
+    if ctx.get_parameter_source("flavor") == click.core.ParameterSource.DEFAULT:
+        flavor = profile_settings["flavor"]
+    if ctx.get_parameter_source("optimize") == click.core.ParameterSource.DEFAULT:
+        optimize = profile_settings["optimize"]
+    subset_cache_dir = cache_dir / cache.SUBSETS if profile_settings["cache"] else None
+    source_date_epoch = _source_date_epoch()
+    reproducible = reproducible or source_date_epoch is not None
 
     if (
         sum(
@@ -145,28 +437,60 @@ def main(
             "--font-awesome-version, but specified {num_fa_specified}"
         )
 
+    # Files in the cache used by this run, which must not be pruned.
+    cache_paths_used: MutableSequence[Path] = []
     if font_awesome is None:
         from . import downloader
 
-        if font_awesome_version is not None:
-            font_awesome = downloader.download_version(font_awesome_version, temp_path)
-        elif font_awesome_url is not None:
-            font_awesome = downloader.download_url(font_awesome_url, temp_path)
-        else:
-            font_awesome = downloader.download_latest(temp_path)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            if font_awesome_version is not None:
+                font_awesome = downloader.download_version(
+                    font_awesome_version, cache_dir, offline=offline
+                )
+            elif font_awesome_url is not None:
+                font_awesome = downloader.download_url(
+                    font_awesome_url, cache_dir, offline=offline
+                )
+            else:
+                font_awesome = downloader.download_latest(cache_dir, offline=offline)
+        except FileNotFoundError as e:
+            _bad_options(str(e))
+        cache_paths_used.append(font_awesome)
     assert font_awesome is not None
 
     if font_awesome.suffix == ".zip":
         from . import zip_extractor
 
         fa_dir = zip_extractor.unzip(font_awesome)
+        if cache_paths_used:
+            cache_paths_used.append(fa_dir)
     else:
         fa_dir = font_awesome
 
-    if css_output is not None:
+    for path in cache_paths_used:
+        cache.touch(path)
+
+    if cache_paths_used:
+        # Keep other processes from evicting the release while we use it.
+        ctx.with_resource(cache.lock(font_awesome.with_suffix(""), shared=True))
+        fa_extractor.ensure_index(fa_dir)
+
+    stream_output = output == Path("-")
+    if stream_output:
+        if depfile is not None or manifest is not None:
+            _bad_options("May not specify --depfile or --manifest with --output -")
+        # Outputs are written into the archive, relative to its root.
+        css_loc: Path = Path("css")
+        fonts_loc: Path = Path("fonts")
+        if fingerprint:
+            manifest = Path("manifest.json")
+    elif output is not None and not output.is_dir():
+        _bad_options(f"--output must be a directory: {output}")
+    elif css_output is not None:
         assert font_output is not None
-        css_loc: Path = css_output
-        fonts_loc: Path = font_output
+        css_loc = css_output
+        fonts_loc = font_output
     else:
         if output is None:
             output = _get_default_output_loc()
@@ -176,44 +500,109 @@ def main(
     css_out = css_loc / "fontawesome-subset.css"
     font_out = fonts_loc / "fontawesome-subset"
 
-    if input is None:
+    if fingerprint and manifest is None:
+        manifest = (output if output is not None else css_loc) / "manifest.json"
+
+    glyphs: Iterable[str]
+    input_files: Sequence[Path] = ()
+    if not input:
         # If input is not specified, read from stdin
-        input_: Path | Iterable[str] = sys.stdin
+        glyphs = input_reader.read_txt(sys.stdin)
     else:
-        input_ = input
+        try:
+            input_files = list(input_reader.expand_inputs(input))
+        except FileNotFoundError as e:
+            _bad_options(str(e))
+        for input_file in input_files:
+            if not input_file.is_file():
+                _bad_options(f"Input file does not exist: {input_file}")
+        glyphs = input_reader.read_inputs(input_files)
+
+    size_report: MutableSequence[fa_extractor.FlavorSize] | None = (
+        [] if optimize is not None else None
+    )
+
+    stage_memory: MutableSequence[fa_extractor.StageMemory] | None = (
+        [] if memory_report else None
+    )
 
-    glyphs = input_reader.read_txt(input_)
+    icon_costs: MutableSequence[fa_extractor.IconCost] | None = (
+        [] if cost_report_out is not None else None
+    )
+
+    remote_cache_backend = None
+    if remote_cache is not None:
+        try:
+            remote_cache_backend = remote_cache_.backend_from_url(remote_cache)
+        except ValueError as e:
+            _bad_options(str(e))
+
+    dependencies: MutableSequence[Path] | None = None
+    if depfile is not None:
+        dependencies = list(input_files)
+
+    # Reproducible archives use SOURCE_DATE_EPOCH, or else a fixed timestamp.
+    archive_mtime = (source_date_epoch or 0) if reproducible else None
 
     directories_made: MutableSequence[Path] = []
-    assert output is not None
     try:
-        if not output.exists():
-            directories_made.append(output)
-            output.mkdir()
-
-        if not css_out.parent.exists():
-            for parent in css_out.absolute().parents:
-                if not parent.exists():
-                    directories_made.append(parent)
-                else:
-                    break
-            css_out.parent.mkdir(parents=True)
-
-        if not font_out.parent.exists():
-            for parent in font_out.absolute().parents:
-                if not parent.exists():
-                    directories_made.append(parent)
-                else:
-                    break
-            font_out.parent.mkdir(parents=True)
-
-        fa_extractor.generate_font_subset(
-            fa_dir=fa_dir,
-            css_out=css_out,
-            font_out=font_out,
-            glyphs=glyphs,
-            output_font_flavors=flavor,
-        )
+        with _output_writer(stream_output, archive_format, archive_mtime) as writer:
+            if not stream_output:
+                if output is not None and not output.exists():
+                    directories_made.append(output)
+                    output.mkdir()
+
+                if not css_out.parent.exists():
+                    for parent in css_out.absolute().parents:
+                        if not parent.exists():
+                            directories_made.append(parent)
+                        else:
+                            break
+                    css_out.parent.mkdir(parents=True)
+
+                if not font_out.parent.exists():
+                    for parent in font_out.absolute().parents:
+                        if not parent.exists():
+                            directories_made.append(parent)
+                        else:
+                            break
+                    font_out.parent.mkdir(parents=True)
+
+            try:
+                outputs = fa_extractor.generate_font_subset(
+                    fa_dir=fa_dir,
+                    css_out=css_out,
+                    font_out=font_out,
+                    glyphs=glyphs,
+                    output_font_flavors=flavor,
+                    optimize=optimize,
+                    size_report=size_report,
+                    cache_dir=subset_cache_dir,
+                    reproducible=reproducible,
+                    fingerprint=fingerprint,
+                    dependencies=dependencies,
+                    remote_cache=remote_cache_backend,
+                    memory_report=stage_memory,
+                    metrics_sink=(
+                        None
+                        if metrics_out is None
+                        else metrics_.sink(metrics_out, metrics_format)
+                    ),
+                    # Releases in the cache keep their superfonts for later runs.
+                    use_superfont=bool(cache_paths_used),
+                    writer=writer,
+                    cost_report=icon_costs,
+                )
+            except (icon_index.UnknownIconsError, fa_extractor.StyleError) as e:
+                _bad_options(str(e))
+
+            if manifest is not None:
+                fa_extractor.write_manifest(outputs, manifest, writer=writer)
+
+            if depfile is not None:
+                assert dependencies is not None
+                targets = [*outputs.values(), *filter(None, (manifest,))]
+                fa_extractor.write_depfile(targets, dependencies, depfile)
     except:
         for directory in directories_made:
             try:
@@ -222,6 +611,177 @@ def main(
                 pass
         raise
 
+    if size_report:
+        _print_size_report(size_report)
+
+    if stage_memory is not None:
+        _print_memory_report(stage_memory)
+
+    if cost_report_out is not None:
+        assert icon_costs is not None
+        fa_extractor.write_cost_report(icon_costs, cost_report_out)
+
+    max_size, max_age = cache.configured_limits()
+    cache.prune_if_due(
+        cache_dir, max_size=max_size, max_age=max_age, keep=cache_paths_used
+    )
+
+    if remote_cache_backend is not None:
+        remote_cache_.wait_for_uploads()
+
+
+@main.command("fetch")
+@click.argument("versions", nargs=-1, required=True)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="The number of releases to download at the same time.",
+)
+@click.pass_obj
+def fetch(obj: Mapping[str, Any], versions: Sequence[str], jobs: int) -> None:
+    """Download releases of font awesome into the cache.
+
+    Each release is verified, extracted and indexed, so that later runs (for
+    example with `--offline`) can use it straight away.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            version: executor.submit(
+                _fetch_release, obj["cache_dir"], version, obj["offline"]
+            )
+            for version in dict.fromkeys(versions)
+        }
+
+    failed = False
+    for version, future in futures.items():
+        try:
+            fa_dir = future.result()
+        except Exception as e:
+            click.echo(f"{version}: failed: {e}", err=True)
+            failed = True
+        else:
+            click.echo(f"{version}: {fa_dir}")
+
+    if failed:
+        sys.exit(1)
+
+
+def _echo_icon(match: icon_index.IconMatch) -> None:
+    line = f"{match.name}\t{match.codepoint}"
+    if match.alias_of is not None:
+        line += f"\talias of {match.alias_of}"
+    click.echo(line)
+
+
+@main.command("list")
+@_release_options
+@click.pass_obj
+def list_icons(
+    obj: Mapping[str, Any], font_awesome: Path | None, version: str | None
+) -> None:
+    """List every icon name and alias in a release, with its codepoint."""
+    index = fa_extractor.load_icon_index(_release_dir(obj, font_awesome, version))
+    for name in index.names:
+        _echo_icon(icon_index.IconMatch.of(index, name))
+
+
+@main.command("search")
+@click.argument("term")
+@_release_options
+@click.option(
+    "--limit",
+    "-n",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="The maximum number of icons to list.",
+)
+@click.pass_obj
+def search_icons(
+    obj: Mapping[str, Any],
+    term: str,
+    font_awesome: Path | None,
+    version: str | None,
+    limit: int,
+) -> None:
+    """Search a release for icons by name or alias.
+
+    Names starting with TERM are listed first, followed by similar names, so
+    misspellings still find the icon.
+    """
+    index = fa_extractor.load_icon_index(_release_dir(obj, font_awesome, version))
+    matches = icon_index.search(index, term, limit=limit)
+    if not matches:
+        _bad_options(f"No icons match {term}")
+    for match in matches:
+        _echo_icon(match)
+
+
+@main.group("cache")
+def cache_group() -> None:
+    """Manage the cache of downloaded releases and generated fonts."""
+
+
+@cache_group.command("list")
+@click.pass_obj
+def cache_list(obj: Mapping[str, Any]) -> None:
+    """List the cache entries, least recently used first."""
+    entries = cache.entries(obj["cache_dir"])
+    for entry in entries:
+        last_used = datetime.datetime.fromtimestamp(entry.last_used)
+        click.echo(
+            f"{entry.area}/{entry.name}\t{_format_size(entry.size)}\t"
+            f"{last_used.isoformat(sep=' ', timespec='seconds')}"
+        )
+    total_size = sum(entry.size for entry in entries)
+    click.echo(
+        f"{len(entries)} entries, {_format_size(total_size)} in {obj['cache_dir']}"
+    )
+
+
+@cache_group.command("prune")
+@click.option(
+    "--max-size",
+    type=str,
+    default=None,
+    callback=_parse_size,
+    help="Evict the least recently used entries until the cache is at most "
+    "this size, e.g. `500M` or `2G`. Defaults to FA_SUBSET_CACHE_MAX_SIZE, "
+    "or 1G.",
+)
+@click.option(
+    "--max-age",
+    type=float,
+    default=None,
+    help="Evict entries that have not been used for this many days. "
+    "Defaults to FA_SUBSET_CACHE_MAX_AGE, or 30.",
+)
+@click.pass_obj
+def cache_prune(
+    obj: Mapping[str, Any], max_size: int | None, max_age: float | None
+) -> None:
+    """Evict old and least recently used entries from the cache."""
+    default_max_size, default_max_age = cache.configured_limits()
+    removed = cache.prune(
+        obj["cache_dir"],
+        max_size=default_max_size if max_size is None else max_size,
+        max_age=default_max_age if max_age is None else max_age * 86400,
+    )
+    total_size = sum(entry.size for entry in removed)
+    click.echo(f"Removed {len(removed)} entries, {_format_size(total_size)}")
+
+
+@cache_group.command("clear")
+@click.pass_obj
+def cache_clear(obj: Mapping[str, Any]) -> None:
+    """Remove everything from the cache."""
+    removed = cache.clear(obj["cache_dir"])
+    total_size = sum(entry.size for entry in removed)
+    click.echo(f"Removed {len(removed)} entries, {_format_size(total_size)}")
+
 
 if __name__ == "__main__":  # pragma: nocover
     main()
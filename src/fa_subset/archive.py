@@ -0,0 +1,62 @@
+import contextlib
+import io
+import tarfile
+import time
+import zipfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import BinaryIO, Final
+
+FORMATS: Final[tuple[str, ...]] = ("tar", "zip")
+
+
+@contextlib.contextmanager
+def open_archive(
+    stream: BinaryIO, kind: str = "tar", *, mtime: float | None = None
+) -> Iterator[Callable[[Path, bytes], None]]:
+    """Writes an archive to a stream, which need not be seekable (e.g. stdout).
+
+    :param kind:
+        The format of the archive, one of :data:`FORMATS`.
+
+    :param mtime:
+        The modification time recorded for every file, in seconds since the
+        epoch. Defaults to the current time.
+
+    :return:
+        Returns a context manager yielding a function that adds a file, given
+        its relative path in the archive and its contents. Each file is
+        written to ``stream`` as soon as it is added, and the archive is
+        finished when the context exits.
+    """
+    if mtime is None:
+        mtime = time.time()
+
+    if kind == "tar":
+        # "w|" writes a stream without seeking back.
+        with tarfile.open(fileobj=stream, mode="w|") as tf:
+
+            def _add_tar(path: Path, data: bytes) -> None:
+                info = tarfile.TarInfo(path.as_posix())
+                info.size = len(data)
+                info.mtime = int(mtime)
+                info.mode = 0o644
+                tf.addfile(info, io.BytesIO(data))
+
+            yield _add_tar
+    elif kind == "zip":
+        # ZipFile falls back to data descriptors on unseekable streams.
+        with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+
+            def _add_zip(path: Path, data: bytes) -> None:
+                # Zip timestamps can't predate 1980.
+                date_time = time.gmtime(max(mtime, 315532800))[:6]
+                info = zipfile.ZipInfo(path.as_posix(), date_time=date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, data)
+
+            yield _add_zip
+    else:
+        raise ValueError(f"Unknown archive format: {kind}")
+    stream.flush()
@@ -0,0 +1,293 @@
+import collections
+import dataclasses
+import gc
+import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import tracemalloc
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from . import fa_extractor, remote_cache
+
+
+@dataclasses.dataclass(frozen=True)
+class BatchJob:
+    """The arguments to one :func:`fa_extractor.generate_font_subset` call.
+
+    :param options:
+        Keyword arguments passed on to
+        :func:`fa_extractor.generate_font_subset`, e.g. ``optimize``.
+    """
+
+    fa_dir: Path
+    css_out: Path
+    font_out: Path
+    glyphs: Sequence[str]
+    options: Mapping[str, Any] = dataclasses.field(default_factory=dict)
+
+    def run(self) -> Mapping[str, Path]:
+        return fa_extractor.generate_font_subset(
+            self.fa_dir, self.css_out, self.font_out, self.glyphs, **self.options
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class CallMemory:
+    """The memory still in use after one call, as measured by
+    :func:`measure_growth`.
+
+    ``traced`` is the memory allocated by Python according to
+    :mod:`tracemalloc`, and ``rss`` the resident set size of the process, if
+    it is known on this platform. The ``*_growth`` attributes are the change
+    since the previous call (or since before the first call).
+    """
+
+    call: int
+    traced: int
+    traced_growth: int
+    rss: int | None
+    rss_growth: int | None
+
+
+def current_rss() -> int | None:
+    """Returns the resident set size of this process in bytes, if known."""
+    if sys.platform == "linux":
+        try:
+            with open("/proc/self/statm") as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            return None
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    return None
+
+
+def release_caches() -> None:
+    """Frees the memory held by this process' caches between calls."""
+    fa_extractor.clear_caches()
+    gc.collect()
+
+
+def _over_budget(memory_budget: int | None, rss: int | None) -> bool:
+    # If the memory in use is unknown, assume the worst.
+    return memory_budget is not None and (rss is None or rss > memory_budget)
+
+
+def _worker_main(conn: multiprocessing.connection.Connection) -> None:
+    try:
+        while (job := conn.recv()) is not None:
+            try:
+                outputs = job.run()
+            except Exception as e:
+                conn.send((e, None))
+            else:
+                conn.send((outputs, current_rss()))
+    finally:
+        # Worker processes don't run exit handlers, which would otherwise wait
+        # for these.
+        remote_cache.wait_for_uploads()
+        conn.close()
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+    def run(self, job: BatchJob) -> tuple[Mapping[str, Path], int | None]:
+        self._conn.send(job)
+        try:
+            result, rss = self._conn.recv()
+        except EOFError:
+            raise RuntimeError(
+                f"Worker process exited with code {self._process.exitcode} "
+                f"while generating {job.font_out}"
+            ) from None
+
+        if isinstance(result, Exception):
+            raise result
+        return result, rss
+
+    def close(self) -> None:
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._process.join()
+        self._conn.close()
+
+
+def run(
+    jobs: Iterable[BatchJob],
+    *,
+    memory_budget: int | None = None,
+    isolate: bool = False,
+) -> Iterator[Mapping[str, Path]]:
+    """Runs many :func:`fa_extractor.generate_font_subset` calls in a row.
+
+    :param memory_budget:
+        The resident set size, in bytes, above which memory is reclaimed
+        between jobs. Without ``isolate``, this process' caches are released;
+        with it, the worker process is replaced with a fresh one.
+
+    :param isolate:
+        If true, the jobs are run in a worker process rather than in this
+        process, so that none of the memory they use is retained here. The
+        jobs' options must be picklable.
+
+    :return:
+        Returns an iterator over the outputs of each job, in order. Jobs are
+        run as the iterator is consumed, and an exception raised by a job is
+        raised from the iterator.
+    """
+    if not isolate:
+        for job in jobs:
+            outputs = job.run()
+            if _over_budget(memory_budget, current_rss()):
+                release_caches()
+            yield outputs
+        return
+
+    worker: _Worker | None = None
+    try:
+        for job in jobs:
+            if worker is None:
+                worker = _Worker()
+            outputs, rss = worker.run(job)
+            if _over_budget(memory_budget, rss):
+                worker.close()
+                worker = None
+            yield outputs
+    finally:
+        if worker is not None:
+            worker.close()
+
+
+def shared_glyphs(jobs: Sequence[BatchJob], *, min_share: float = 0.5) -> Sequence[str]:
+    """Finds the glyphs worth putting in a core font shared by the jobs.
+
+    These are the glyphs requested by at least ``min_share`` of the jobs, and
+    by at least two of them. Aliases are canonicalized first, and if an icon
+    is requested in several styles only the most common one is shared.
+    """
+    fa_dirs = {job.fa_dir for job in jobs}
+    if len(fa_dirs) > 1:
+        raise ValueError("Jobs sharing a core font must use the same release")
+    if not fa_dirs:
+        return []
+
+    fa_dir = fa_dirs.pop()
+    aliases = fa_extractor.load_aliases(fa_dir)
+    shims = fa_extractor.load_shims(fa_dir)
+    counts: collections.Counter[str] = collections.Counter()
+    for job in jobs:
+        glyphs, _ = fa_extractor.canonicalize_glyphs(job.glyphs, aliases, shims)
+        counts.update(glyphs)
+
+    min_jobs = max(2, math.ceil(min_share * len(jobs)))
+    by_icon: dict[str, str] = {}
+    for glyph, count in counts.items():
+        if count < min_jobs:
+            continue
+        _, icon = fa_extractor.parse_glyph(glyph)
+        if icon not in by_icon or count > counts[by_icon[icon]]:
+            by_icon[icon] = glyph
+    return list(by_icon.values())
+
+
+def run_shared(
+    jobs: Sequence[BatchJob],
+    core_font_out: Path,
+    core_url: str,
+    *,
+    min_share: float = 0.5,
+    core_options: Mapping[str, Any] | None = None,
+    **kwargs: Any,
+) -> tuple[fa_extractor.CoreFont | None, Iterator[Mapping[str, Path]]]:
+    """Like :func:`run`, but with the icons the jobs have in common moved to a
+    core font that they all refer to, leaving each job a smaller font of its
+    remaining icons.
+
+    The core font is generated straight away, from the glyphs chosen by
+    :func:`shared_glyphs`; the jobs are run as the returned iterator is
+    consumed.
+
+    :param core_font_out:
+        Where to write the core font, as for
+        :func:`fa_extractor.generate_subset_font`.
+
+    :param core_url:
+        The URL the directory containing ``core_font_out`` is served from.
+
+    :param core_options:
+        Keyword arguments passed on to :func:`fa_extractor.generate_core_font`,
+        e.g. ``optimize``.
+
+    :param kwargs:
+        Keyword arguments passed on to :func:`run`.
+
+    :return:
+        Returns the core font, or ``None`` if the jobs have no icons in common
+        (and the jobs are run unchanged), and the iterator of :func:`run`.
+    """
+    glyphs = shared_glyphs(jobs, min_share=min_share)
+    if not glyphs:
+        return None, run(jobs, **kwargs)
+
+    core = fa_extractor.generate_core_font(
+        jobs[0].fa_dir, core_font_out, glyphs, core_url, **(core_options or {})
+    )
+    core_jobs = [
+        dataclasses.replace(job, options={**job.options, "core": core}) for job in jobs
+    ]
+    return core, run(core_jobs, **kwargs)
+
+
+def measure_growth(job: BatchJob, calls: int) -> Sequence[CallMemory]:
+    """Runs ``job`` repeatedly, measuring the memory still in use after each call.
+
+    Garbage is collected after each call, so memory that keeps growing from
+    call to call is leaking. The first few calls typically grow while modules
+    are imported and caches warm up.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    try:
+        gc.collect()
+        previous_traced, _ = tracemalloc.get_traced_memory()
+        previous_rss = current_rss()
+
+        out = []
+        for call in range(calls):
+            job.run()
+            gc.collect()
+            traced, _ = tracemalloc.get_traced_memory()
+            rss = current_rss()
+            out.append(
+                CallMemory(
+                    call=call,
+                    traced=traced,
+                    traced_growth=traced - previous_traced,
+                    rss=rss,
+                    rss_growth=(
+                        None
+                        if rss is None or previous_rss is None
+                        else rss - previous_rss
+                    ),
+                )
+            )
+            previous_traced, previous_rss = traced, rss
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    return out
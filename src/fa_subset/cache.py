@@ -0,0 +1,373 @@
+import contextlib
+import dataclasses
+import functools
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Final
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+CACHE_DIR_ENV: Final[str] = "FA_SUBSET_CACHE_DIR"
+MAX_SIZE_ENV: Final[str] = "FA_SUBSET_CACHE_MAX_SIZE"
+MAX_AGE_ENV: Final[str] = "FA_SUBSET_CACHE_MAX_AGE"
+
+DEFAULT_MAX_SIZE: Final[int] = 1024**3
+DEFAULT_MAX_AGE_DAYS: Final[float] = 30.0
+
+# How often prune_if_due prunes the cache, in seconds. Measuring the cache
+# walks every entry in it, which is too slow to do on every run.
+PRUNE_INTERVAL: Final[float] = 3600.0
+
+# Hidden, so that it is not listed as a cache entry.
+_PRUNE_STAMP: Final[str] = ".last_prune"
+
+# Subdirectories of the cache directory holding the different kinds of entry.
+# Every file or directory directly inside one of them belongs to an entry, and
+# files and directories whose names only differ in their suffix (e.g. a
+# release zip and the directory it was extracted to) belong to the same entry.
+RELEASES: Final[str] = "fa_subset_fa"
+SUBSETS: Final[str] = "subsets"
+AREAS: Final[Sequence[str]] = (RELEASES, SUBSETS)
+
+_SIZE_UNITS: Final[Mapping[str, int]] = {
+    "": 1,
+    "K": 1024,
+    "M": 1024**2,
+    "G": 1024**3,
+    "T": 1024**4,
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheEntry:
+    area: str
+    name: str
+    paths: Sequence[Path]
+    size: int
+    last_used: float
+
+
+def default_cache_dir() -> Path:
+    """Returns the cache directory.
+
+    This is the value of the ``FA_SUBSET_CACHE_DIR`` environment variable if it
+    is set, otherwise ``fa-subset`` in the XDG cache directory.
+    """
+    if cache_dir := os.environ.get(CACHE_DIR_ENV):
+        return Path(cache_dir)
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        return Path(xdg_cache_home) / "fa-subset"
+    return Path.home() / ".cache" / "fa-subset"
+
+
+def parse_size(size: str) -> int:
+    """Parses a size in bytes, with an optional binary suffix (e.g. ``500M``)."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d*)?)\s*([KMGT]?)i?B?\s*", size, re.IGNORECASE)
+    if m is None:
+        raise ValueError(f"Invalid size: {size}")
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2).upper()])
+
+
+def configured_limits() -> tuple[int, float]:
+    """Returns the maximum cache size in bytes and entry age in seconds.
+
+    These can be set with the ``FA_SUBSET_CACHE_MAX_SIZE`` (e.g. ``2G``) and
+    ``FA_SUBSET_CACHE_MAX_AGE`` (in days) environment variables.
+    """
+    max_size = os.environ.get(MAX_SIZE_ENV)
+    max_age = os.environ.get(MAX_AGE_ENV)
+    return (
+        parse_size(max_size) if max_size else DEFAULT_MAX_SIZE,
+        float(max_age if max_age else DEFAULT_MAX_AGE_DAYS) * 86400,
+    )
+
+
+def _acquire(fd: int, shared: bool, blocking: bool) -> bool:
+    if sys.platform == "win32":
+        # Windows has no shared locks, so readers don't lock at all; they are
+        # still protected from seeing partial writes by the atomic publishing.
+        if shared:
+            return True
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+    else:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            return False
+        return True
+
+
+def _release(fd: int, shared: bool) -> None:
+    if sys.platform == "win32":
+        if not shared:
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def lock(path: Path, *, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+    """Holds an inter-process lock on ``path``, which need not exist.
+
+    Exclusive locks are taken to create or remove cache entries, and shared
+    locks to keep an entry from being evicted while it is in use.
+
+    :return:
+        Returns a context manager yielding whether the lock was acquired, which
+        is always true if ``blocking`` is true.
+    """
+    # The lock file is hidden so that it is not listed as a cache entry, and is
+    # never deleted, because another process may be about to lock it.
+    lock_file = path.parent / f".{path.name}.lock"
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        acquired = _acquire(fd, shared, blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _release(fd, shared)
+    finally:
+        os.close(fd)
+
+
+@functools.cache
+def _umask() -> int:
+    # The umask can only be read by setting it, which would briefly affect
+    # files created by other threads, so it is only read once.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+@contextlib.contextmanager
+def staging_dir(target: Path) -> Iterator[Path]:
+    """Yields a temporary directory, which is moved to ``target`` on success.
+
+    The move is atomic, so other processes see either no ``target`` or a
+    complete one. The caller must hold the :func:`lock` for ``target``, and
+    ``target`` must not exist yet.
+    """
+    staging = Path(tempfile.mkdtemp(dir=target.parent, prefix=f".{target.name}."))
+    try:
+        yield staging
+        # mkdtemp makes the directory private, but the cache may be shared.
+        os.chmod(staging, 0o777 & ~_umask())
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def write_atomic(target: Path, data: bytes) -> None:
+    """Writes ``data`` to ``target`` via a temporary file in the same directory."""
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp makes the file private, but the cache may be shared (e.g. a
+        # remote cache directory on a network file system).
+        os.chmod(tmp_name, 0o666 & ~_umask())
+        os.replace(tmp_name, target)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def touch(path: Path) -> None:
+    """Marks the cache entry containing ``path`` as recently used."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _disk_usage(path: Path) -> int:
+    if not path.is_dir():
+        return path.lstat().st_size
+
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def _entry_name(path: Path) -> str:
+    return path.stem if path.is_file() else path.name
+
+
+def entries(cache_dir: Path) -> Sequence[CacheEntry]:
+    """Lists the entries in the cache, least recently used first."""
+    out = []
+    for area in AREAS:
+        area_dir = cache_dir / area
+        if not area_dir.is_dir():
+            continue
+
+        grouped: dict[str, list[Path]] = {}
+        for path in area_dir.iterdir():
+            if path.name.startswith("."):
+                continue
+            grouped.setdefault(_entry_name(path), []).append(path)
+
+        for name, paths in grouped.items():
+            try:
+                size = sum(map(_disk_usage, paths))
+                last_used = max(path.lstat().st_mtime for path in paths)
+            except FileNotFoundError:
+                # Removed while we were looking at it.
+                continue
+            out.append(
+                CacheEntry(
+                    area=area,
+                    name=name,
+                    paths=tuple(sorted(paths)),
+                    size=size,
+                    last_used=last_used,
+                )
+            )
+
+    out.sort(key=lambda entry: entry.last_used)
+    return out
+
+
+def remove(entry: CacheEntry) -> bool:
+    """Removes an entry from the cache, unless another process is using it.
+
+    :return:
+        Returns whether the entry was removed.
+    """
+    with lock(entry.paths[0].parent / entry.name, blocking=False) as acquired:
+        if not acquired:
+            return False
+
+        for path in entry.paths:
+            # Move the entry out of the way first, so that other processes see
+            # it either complete or not at all.
+            trash = path.with_name(f".{path.name}.{os.getpid()}.removing")
+            try:
+                os.replace(path, trash)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                # e.g. files in use on Windows
+                return False
+
+            if trash.is_dir() and not trash.is_symlink():
+                shutil.rmtree(trash, ignore_errors=True)
+            else:
+                trash.unlink()
+    return True
+
+
+def prune(
+    cache_dir: Path,
+    *,
+    max_size: int | None = None,
+    max_age: float | None = None,
+    keep: Iterable[Path] = (),
+) -> Sequence[CacheEntry]:
+    """Evicts entries from the cache.
+
+    Entries not used for more than ``max_age`` seconds are removed first, then
+    the least recently used entries are removed until the total size of the
+    cache is at most ``max_size`` bytes.
+
+    :param keep:
+        Paths that must not be evicted, e.g. because they are in use. Entries
+        containing any of these paths are kept regardless of the limits, as
+        are entries locked by other processes.
+
+    :return:
+        Returns the entries that were removed.
+    """
+    keep_paths = [Path(os.path.abspath(path)) for path in keep]
+
+    def _is_kept(entry: CacheEntry) -> bool:
+        for path in entry.paths:
+            path = Path(os.path.abspath(path))
+            if any(path == k or path in k.parents for k in keep_paths):
+                return True
+        return False
+
+    now = time.time()
+    removed = []
+    remaining = []
+    for entry in entries(cache_dir):
+        if _is_kept(entry):
+            remaining.append(entry)
+        elif max_age is not None and now - entry.last_used > max_age:
+            removed.append(entry)
+        else:
+            remaining.append(entry)
+
+    if max_size is not None:
+        total_size = sum(entry.size for entry in remaining)
+        # Entries are sorted least recently used first.
+        for entry in remaining:
+            if total_size <= max_size:
+                break
+            if not _is_kept(entry):
+                removed.append(entry)
+                total_size -= entry.size
+
+    return [entry for entry in removed if remove(entry)]
+
+
+def prune_if_due(
+    cache_dir: Path,
+    *,
+    max_size: int | None = None,
+    max_age: float | None = None,
+    keep: Iterable[Path] = (),
+    interval: float = PRUNE_INTERVAL,
+) -> Sequence[CacheEntry]:
+    """Evicts entries from the cache as :func:`prune` does, unless the cache
+    was already pruned this way in the last ``interval`` seconds.
+
+    :return:
+        Returns the entries that were removed.
+    """
+    stamp = cache_dir / _PRUNE_STAMP
+    try:
+        if time.time() - stamp.stat().st_mtime < interval:
+            return []
+        # Claim this round before pruning, so that concurrent runs skip it.
+        os.utime(stamp)
+    except FileNotFoundError:
+        if not cache_dir.is_dir():
+            return []
+        stamp.touch()
+
+    return prune(cache_dir, max_size=max_size, max_age=max_age, keep=keep)
+
+
+def clear(cache_dir: Path) -> Sequence[CacheEntry]:
+    """Removes every entry from the cache that is not in use."""
+    return [entry for entry in entries(cache_dir) if remove(entry)]
@@ -0,0 +1,341 @@
+import hashlib
+import io
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import types
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any, BinaryIO, Final
+
+# Only import what the client needs here: the point of the daemon is to not
+# pay for importing fontTools (and everything else) on every run.
+from . import cache
+
+DAEMON_ENV: Final[str] = "FA_SUBSET_DAEMON"
+IDLE_TIMEOUT_ENV: Final[str] = "FA_SUBSET_DAEMON_IDLE_TIMEOUT"
+
+# How long the daemon waits for another request before exiting, in seconds.
+DEFAULT_IDLE_TIMEOUT: Final[float] = 300.0
+
+# How long a client waits for a daemon it started to accept connections.
+_START_TIMEOUT: Final[float] = 10.0
+
+_HEADER: Final[struct.Struct] = struct.Struct("!I")
+
+
+def _runtime_dir() -> Path | None:
+    # Requests carry the client's environment, so the socket must be in a
+    # directory only this user can get into.
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    runtime_dir = Path(base) / f"fa-subset-{os.getuid()}"
+    try:
+        runtime_dir.mkdir(mode=0o700, exist_ok=True)
+        st = runtime_dir.lstat()
+    except OSError:
+        return None
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or st.st_uid != os.getuid()
+        or stat.S_IMODE(st.st_mode) & 0o077
+    ):
+        return None
+    return runtime_dir
+
+
+def socket_path() -> Path | None:
+    """Returns the socket of the daemon for this user, Python and version of
+    ``fa_subset``, or ``None`` if there is nowhere safe to put it.
+
+    Installing another version of ``fa_subset`` changes the path, so clients
+    never talk to a daemon running outdated code.
+    """
+    runtime_dir = _runtime_dir()
+    if runtime_dir is None:
+        return None
+
+    package_dir = Path(__file__).parent
+    key_data = {
+        "python": sys.executable,
+        "package": os.fspath(package_dir),
+        "files": sorted(
+            (path.name, path.stat().st_mtime_ns) for path in package_dir.glob("*.py")
+        ),
+    }
+    key_json = json.dumps(key_data, sort_keys=True).encode("utf-8")
+    # Keep the path short: socket paths are limited to ~100 bytes.
+    return runtime_dir / f"{hashlib.sha256(key_json).hexdigest()[:16]}.sock"
+
+
+def _send(sock: socket.socket, message: Mapping[str, Any], data: bytes = b"") -> None:
+    header = json.dumps({**message, "size": len(data)}).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(header)) + header + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Connection closed by the other end")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv(sock: socket.socket) -> tuple[Mapping[str, Any], bytes]:
+    (header_size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    message = json.loads(_recv_exactly(sock, header_size))
+    return message, _recv_exactly(sock, message["size"])
+
+
+def _connect(path: Path) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.fspath(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _start(path: Path) -> socket.socket | None:
+    # The daemon outlives this process, so it gets its own session and no
+    # handles on this process's output.
+    subprocess.Popen(
+        [sys.executable, "-m", __name__, os.fspath(path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + _START_TIMEOUT
+    while time.monotonic() < deadline:
+        sock = _connect(path)
+        if sock is not None:
+            return sock
+        time.sleep(0.05)
+    return None
+
+
+def forward(
+    args: Sequence[str],
+    *,
+    path: Path | None = None,
+    stdin: BinaryIO | None = None,
+) -> int | None:
+    """Runs ``fa-subset`` with ``args`` in the daemon, starting one if needed.
+
+    The daemon runs the command in this process's working directory and
+    environment. It reads ``stdin`` (by default, this process's stdin) only
+    if the command does, and the command's output is written to this
+    process's stdout and stderr as it is produced.
+
+    :param path:
+        The socket of the daemon, by default :func:`socket_path`.
+
+    :return:
+        Returns the exit code of the command, or ``None`` if no daemon could
+        be reached, in which case the command should be run in-process.
+    """
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "fork"):
+        return None
+    if path is None:
+        path = socket_path()
+        if path is None:
+            return None
+
+    sock = _connect(path) or _start(path)
+    if sock is None:
+        return None
+
+    stdin_read = False
+    with sock:
+        try:
+            _send(
+                sock,
+                {
+                    "type": "run",
+                    "args": list(args),
+                    "cwd": os.getcwd(),
+                    "env": dict(os.environ),
+                },
+            )
+            while True:
+                message, data = _recv(sock)
+                if message["type"] == "stdin":
+                    stdin_read = True
+                    _send(sock, {"type": "stdin"}, (stdin or sys.stdin.buffer).read())
+                elif message["type"] == "stdout":
+                    sys.stdout.buffer.write(data)
+                    sys.stdout.flush()
+                elif message["type"] == "stderr":
+                    sys.stderr.buffer.write(data)
+                    sys.stderr.flush()
+                else:
+                    return int(message["exit_code"])
+        except (OSError, ValueError):
+            # The daemon went away. Unless it already consumed stdin, the
+            # command can still run in-process.
+            if stdin_read:
+                raise
+            return None
+
+
+class _ClientOutput(io.RawIOBase):
+    # The stdout or stderr of a command run by the daemon, which sends
+    # everything written to it on to the client.
+
+    def __init__(self, sock: socket.socket, kind: str) -> None:
+        self._sock = sock
+        self._kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, buffer: Any) -> int:
+        data = bytes(buffer)
+        _send(self._sock, {"type": self._kind}, data)
+        return len(data)
+
+
+def _client_output(sock: socket.socket, kind: str) -> io.TextIOWrapper:
+    # write_through keeps text in order with binary output to the buffer,
+    # which collects small writes (e.g. of an archive) into fewer messages;
+    # line_buffering still sends each line of text as soon as it's written.
+    return io.TextIOWrapper(
+        io.BufferedWriter(_ClientOutput(sock, kind)),
+        "utf-8",
+        line_buffering=True,
+        write_through=True,
+    )
+
+
+class _ClientStdin(io.RawIOBase):
+    # The stdin of a command run by the daemon, which asks the client for its
+    # stdin the first time it is read.
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._data: io.BytesIO | None = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if self._data is None:
+            _send(self._sock, {"type": "stdin"})
+            _, data = _recv(self._sock)
+            self._data = io.BytesIO(data)
+        return self._data.readinto(buffer)
+
+
+def _handle(sock: socket.socket, cli: types.ModuleType) -> None:
+    # Runs in a process forked for this request, so it can take on the
+    # client's working directory, environment and stdio without affecting
+    # other requests.
+    message, _ = _recv(sock)
+    os.chdir(message["cwd"])
+    os.environ.clear()
+    os.environ.update(message["env"])
+    sys.stdin = io.TextIOWrapper(io.BufferedReader(_ClientStdin(sock)), "utf-8")
+    sys.stdout = _client_output(sock, "stdout")
+    sys.stderr = _client_output(sock, "stderr")
+
+    try:
+        cli.main.main(message["args"], prog_name="fa-subset")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    else:
+        exit_code = 0
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    _send(sock, {"type": "exit", "exit_code": exit_code})
+
+
+def _serve_forked(conn: socket.socket, cli: types.ModuleType) -> None:
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        _handle(conn, cli)
+    except BaseException:
+        # The client went away, or the exit code couldn't be sent; either
+        # way there is no one left to report to.
+        pass
+    finally:
+        os._exit(0)
+
+
+def serve(path: Path, idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> None:
+    """Runs a daemon accepting commands from :func:`forward` on ``path``,
+    until no command arrives for ``idle_timeout`` seconds.
+
+    Each command runs in a process forked from the daemon, which has already
+    imported everything commands need, so commands run concurrently and
+    start up without importing anything. Only the imports are shared:
+    anything a command caches in memory (e.g. the layout of a release) is
+    lost when its process exits, and later commands read it from disk again.
+    Returns immediately if another daemon is already serving ``path``.
+    """
+    from . import __main__ as cli
+
+    with cache.lock(path, blocking=False) as acquired:
+        if not acquired:
+            return
+
+        # Forked processes are reaped automatically.
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+        # Any socket left here is from a daemon that didn't exit cleanly.
+        path.unlink(missing_ok=True)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(os.fspath(path))
+            try:
+                server.listen()
+                server.settimeout(idle_timeout)
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except TimeoutError:
+                        break
+                    with conn:
+                        conn.settimeout(None)
+                        if os.fork() == 0:
+                            server.close()
+                            _serve_forked(conn, cli)
+            finally:
+                path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    """The ``fa-subset`` command, which runs in a daemon (see :func:`forward`)
+    if the ``FA_SUBSET_DAEMON`` environment variable is set to ``1``."""
+    if os.environ.get(DAEMON_ENV) == "1":
+        exit_code = forward(sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    from . import __main__ as cli
+
+    cli.main()
+
+
+if __name__ == "__main__":  # pragma: nocover
+    serve(
+        Path(sys.argv[1]),
+        float(os.environ.get(IDLE_TIMEOUT_ENV, DEFAULT_IDLE_TIMEOUT)),
+    )
@@ -4,31 +4,54 @@ from typing import Final
 
 import requests
 
+from . import cache
+
 FA_VERSION_TEMPLATE: Final[
     str
 ] = "https://use.fontawesome.com/releases/v{version}/fontawesome-free-{version}-web.zip"
 LATEST_FA_VERSION: Final[str] = "6.2.1"
 
 
-def download_latest(out_dir: Path) -> Path:
-    return download_version(LATEST_FA_VERSION, out_dir)
+def download_latest(out_dir: Path, *, offline: bool = False) -> Path:
+    return download_version(LATEST_FA_VERSION, out_dir, offline=offline)
 
 
-def download_version(version: str, out_dir: Path) -> Path:
+def download_version(version: str, out_dir: Path, *, offline: bool = False) -> Path:
     font_awesome_url = FA_VERSION_TEMPLATE.format(version=version)
-    return download_url(font_awesome_url, out_dir)
+    return download_url(font_awesome_url, out_dir, offline=offline)
+
 
+def download_url(url: str, out_path: Path, *, offline: bool = False) -> Path:
+    """Downloads a Font Awesome release, unless it was downloaded already.
 
-def download_url(url: str, out_path: Path) -> Path:
+    :param offline:
+        If true, never access the network. A :exc:`FileNotFoundError` is
+        raised if the release has not been downloaded before.
+
+    :return:
+        Returns the path to the downloaded file.
+    """
     filename = Path(urllib.parse.urlparse(url).path).name
 
     font_awesome = out_path / f"fa_subset_fa/{filename}"
 
-    font_awesome.parent.mkdir(exist_ok=True)
+    if offline:
+        if not font_awesome.exists():
+            raise FileNotFoundError(
+                f"{url} has not been downloaded to {font_awesome.parent}, and "
+                "downloading is disabled"
+            )
+        return font_awesome
+
+    font_awesome.parent.mkdir(parents=True, exist_ok=True)
 
     if not font_awesome.exists():
-        r = requests.get(url)
-        r.raise_for_status()
-        font_awesome.write_bytes(r.content)
+        # Hold the lock while downloading so that concurrent processes wait for
+        # this download rather than duplicating it.
+        with cache.lock(font_awesome.with_suffix("")):
+            if not font_awesome.exists():
+                r = requests.get(url)
+                r.raise_for_status()
+                cache.write_atomic(font_awesome, r.content)
 
     return font_awesome
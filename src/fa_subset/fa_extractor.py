@@ -1,14 +1,37 @@
+import contextlib
 import dataclasses
 import functools
+import hashlib
+import io
+import json
+import mmap
 import os
 import re
 import tempfile
-from collections.abc import Mapping, Sequence
+import threading
+import time
+import tracemalloc
+from collections.abc import (
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableSequence,
+    Sequence,
+)
 from pathlib import Path
 from typing import Any, Final
 
 import fontTools.merge  # type: ignore
+import fontTools.misc.timeTools  # type: ignore
 import fontTools.subset  # type: ignore
+import fontTools.ttLib  # type: ignore
+
+from . import icon_index
+from . import metrics as metrics_
+from . import remote_cache as remote_cache_
+from . import subset_cache
+from . import superfont as superfont_
 
 FONT_NAMES: Final[Mapping[str, str]] = {
     "brands": "fa-brands-400",
@@ -19,6 +42,9 @@ FONT_NAMES: Final[Mapping[str, str]] = {
 
 FONT_FAMILY: Final[str] = "FontAwesomeSubset"
 
+# Number of hex digits of the content hash used in fingerprinted file names.
+FINGERPRINT_LENGTH: Final[int] = 8
+
 FONT_DEFINITION: Final[
     str
 ] = f"""@font-face {{{{
@@ -28,6 +54,34 @@ FONT_DEFINITION: Final[
 }}}}
 """
 
+# The number of releases whose layout is remembered by _fa_paths.
+FA_PATHS_CACHE_SIZE: Final[int] = 16
+
+# Used instead of FONT_DEFINITION when the icons are split between a shared
+# core font and a font of the remaining icons (see CoreFont). Browsers only
+# download the fonts covering the icons a page actually uses.
+FONT_RANGE_DEFINITION: Final[str] = f"""@font-face {{{{
+  font-family: '{FONT_FAMILY}';
+  src:
+{{flavors}};
+  unicode-range: {{unicode_range}};
+}}}}
+"""
+
+# Settings (as `fontTools.subset.Options` attributes) applied to the merged
+# font for each optimization profile. Glyphs are only ever addressed by
+# codepoint from the generated CSS, so hinting, layout features (e.g. the
+# ligatures that map icon names to glyphs) and most name records are dead
+# weight. The copyright record (name ID 0) is kept for licensing reasons.
+OPTIMIZE_PROFILES: Final[Mapping[str, Mapping[str, Any]]] = {
+    "size": {
+        "hinting": False,
+        "desubroutinize": True,
+        "name_IDs": [0, 1, 2, 4, 6],
+        "layout_features": [],
+    },
+}
+
 CSS_START: Final[
     str
 ] = """.fa,
@@ -51,34 +105,100 @@ CSS_BASE: Final[
     content: "\\{codepoint}"; }}
 """
 
+# Prepended to CSS_BASE for each alias of an icon that was requested.
+CSS_ALIAS: Final[str] = ".fa-{alias}:before,\n"
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(frozen=True)
 class _FAPaths:
+    # Immutable, so that threads can share them.
     fa_dir: Path
+    fa_css_dir: Path
 
-    @functools.cached_property
-    def fa_css_dir(self):
+    @classmethod
+    def find(cls, fa_dir: Path) -> "_FAPaths":
         # Right now the structure contains exactly one /css directory, hopefully
         # this doesn't change.
-        (fa_css_dir,) = self.fa_dir.glob("**/css")
-        return fa_css_dir
+        (fa_css_dir,) = fa_dir.glob("**/css")
+        return cls(fa_dir=fa_dir, fa_css_dir=fa_css_dir)
 
-    @functools.cached_property
+    @property
     def fa_css_file(self):
         return self.fa_css_dir / "all.css"
 
-    @functools.cached_property
+    @property
     def fa_base_dir(self):
         return self.fa_css_dir.parent
 
-    @functools.cached_property
+    @property
     def fa_font_dir(self):
         return self.fa_base_dir / "webfonts"
 
 
-@functools.lru_cache
+@dataclasses.dataclass(frozen=True)
+class FlavorSize:
+    """The size of one output font flavor before and after optimization."""
+
+    flavor: str
+    before: int
+    after: int
+
+
+@dataclasses.dataclass(frozen=True)
+class StageMemory:
+    """The peak memory allocated by Python during one stage of a build."""
+
+    stage: str
+    peak: int
+
+
+@dataclasses.dataclass(frozen=True)
+class IconCost:
+    """The bytes one icon adds to an output font."""
+
+    name: str
+    codepoint: str
+    # The glyphs drawn for the icon: its own, followed by any components it
+    # is built from.
+    glyphs: Sequence[str]
+    # The size of the glyph data, uncompressed.
+    size: int
+    # The estimated share of the woff2 font, see _icon_costs.
+    woff2_size: int
+
+
+class StyleError(ValueError):
+    """Raised when the styles requested for icons (see :func:`parse_glyph`)
+    can't be used, e.g. an unknown style, or a style without the icon."""
+
+
+@dataclasses.dataclass(frozen=True)
+class CoreFont:
+    """A subset font of the icons shared by many builds, which can be served
+    from one URL so that browsers download and cache it once for all of them.
+
+    Created by :func:`generate_core_font`.
+    """
+
+    # Maps each canonical glyph in the font (see canonicalize_glyphs) to its
+    # codepoint.
+    codepoints: Mapping[str, str]
+    # (file name, flavor) pairs, as returned by generate_subset_font.
+    font_flavors: Sequence[tuple[str, str]]
+    # The URL of the directory the font files are served from.
+    url: str
+
+
+# lru_cache is thread safe; bounding it keeps long-running processes that see
+# many releases from growing without limit.
+@functools.lru_cache(maxsize=FA_PATHS_CACHE_SIZE)
 def _fa_paths(fa_dir: Path) -> _FAPaths:
-    return _FAPaths(fa_dir)
+    return _FAPaths.find(fa_dir)
+
+
+def clear_caches() -> None:
+    """Forgets the layout of every Font Awesome directory seen so far."""
+    _fa_paths.cache_clear()
 
 
 def _make_kwargs(**kwargs) -> Mapping[str, Any]:
@@ -104,10 +224,62 @@ def _extract_font_awesome(icon: str, css: str) -> str:
     return codepoint
 
 
-def load_codepoints(css_file: Path, glyphs: Sequence[str]) -> Mapping[str, str]:
+def _lookup_codepoint(icon: str, index: Mapping[str, str]) -> str:
+    try:
+        return index[icon]
+    except KeyError:
+        raise ValueError(f"Unknown icon: {icon}") from None
+
+
+def parse_glyph(glyph: str) -> tuple[str | None, str]:
+    """Splits a glyph name into its style qualifier and icon name.
+
+    Glyphs may be qualified with the name of a font in :data:`FONT_NAMES`,
+    e.g. ``regular:user``, to pick the style used for that icon.
+
+    :return:
+        Returns a tuple of the style (or ``None`` if the glyph is not
+        qualified) and the icon name.
+    """
+    style, sep, icon = glyph.rpartition(":")
+    if not sep:
+        return None, glyph
+    if style not in FONT_NAMES:
+        raise StyleError(f"Unknown style: {style}")
+    return style, icon
+
+
+def _codepoint_lookup(
+    css_file: Path, index: Mapping[str, str] | None
+) -> Callable[[str], str]:
+    if index is not None:
+        # A prebuilt index (see icon_index) saves searching the CSS per glyph.
+        return functools.partial(_lookup_codepoint, index=index)
+
     with open(css_file, "r") as f:
         css = f.read()
-        codepoints = {icon: _extract_font_awesome(icon, css) for icon in glyphs}
+    return functools.partial(_extract_font_awesome, css=css)
+
+
+def load_codepoints(
+    css_file: Path,
+    glyphs: Sequence[str],
+    *,
+    index: Mapping[str, str] | None = None,
+) -> Mapping[str, str]:
+    lookup = _codepoint_lookup(css_file, index)
+    codepoints = {}
+    unknown: dict[str, Sequence[str]] = {}
+    for glyph in glyphs:
+        _, icon = parse_glyph(glyph)
+        try:
+            codepoints[icon] = lookup(icon)
+        except ValueError:
+            unknown[icon] = ()
+
+    if unknown:
+        # Report every unknown icon, not just the first.
+        raise icon_index.UnknownIconsError(unknown)
 
     if "rss" in codepoints:
         # Apparently uBlock is blocking .fa-rss (at least for me)
@@ -117,6 +289,186 @@ def load_codepoints(css_file: Path, glyphs: Sequence[str]) -> Mapping[str, str]:
     return codepoints
 
 
+def load_styles(
+    css_file: Path,
+    glyphs: Sequence[str],
+    *,
+    index: Mapping[str, str] | None = None,
+) -> Mapping[str, str]:
+    """Finds the style requested for each style-qualified glyph.
+
+    :return:
+        Returns a mapping of the codepoint of each qualified glyph (e.g.
+        ``solid:user``) to its style (e.g. ``solid``).
+    """
+    lookup = _codepoint_lookup(css_file, index)
+    styles: dict[str, str] = {}
+    for glyph in glyphs:
+        style, icon = parse_glyph(glyph)
+        if style is None:
+            continue
+        if styles.setdefault(lookup(icon), style) != style:
+            raise StyleError(f"Icon requested in more than one style: {icon}")
+    return styles
+
+
+def load_aliases(fa_dir: Path) -> Mapping[str, str]:
+    """Loads the alias table of a release, from its index if it has one.
+
+    :return:
+        Returns a mapping of every alias (e.g. ``home``) in the release to its
+        canonical icon name (e.g. ``house``).
+    """
+    css_file = _fa_paths(fa_dir).fa_css_file
+    aliases = icon_index.load_aliases(fa_dir, css_file)
+    if aliases is None:
+        aliases = icon_index.build_aliases(css_file)
+    return aliases
+
+
+def load_shims(fa_dir: Path) -> Mapping[str, str]:
+    """Loads the Font Awesome 4 shims of a release, from its index if it has
+    one.
+
+    :return:
+        Returns a mapping of Font Awesome 4 icon names (e.g. ``envelope-o``)
+        to the glyphs replacing them (e.g. ``regular:envelope``), see
+        :func:`icon_index.build_shims`.
+    """
+    css_file = _fa_paths(fa_dir).fa_css_file
+    index = icon_index.load_index(fa_dir, css_file)
+    if index is None:
+        return icon_index.build_shims(css_file)
+    return index.shims
+
+
+def canonicalize_glyphs(
+    glyphs: Iterable[str],
+    aliases: Mapping[str, str],
+    shims: Mapping[str, str] | None = None,
+) -> tuple[Sequence[str], Mapping[str, Sequence[str]]]:
+    """Replaces aliases with their canonical names and removes duplicates.
+
+    Style qualifiers (see :func:`parse_glyph`) are kept, and the first
+    occurrence of each glyph determines its position in the output.
+
+    :param aliases:
+        The alias table of the release, as returned by :func:`load_aliases`.
+
+    :param shims:
+        The Font Awesome 4 shims of the release, as returned by
+        :func:`load_shims`. Unqualified Font Awesome 4 names are replaced by
+        the (possibly qualified) glyphs replacing them, and treated as
+        aliases of those, unless the same icon is also requested in another
+        style.
+
+    :return:
+        Returns a tuple of the canonical glyphs and a mapping of each
+        canonical icon name to the aliases of it that were replaced.
+    """
+    parsed = []
+    for glyph in glyphs:
+        style, icon = parse_glyph(glyph)
+        parsed.append((style, aliases.get(icon, icon), icon))
+
+    shims = shims or {}
+    requested_styles: dict[str, set[str | None]] = {}
+    for style, canonical_icon, icon in parsed:
+        if style is None and canonical_icon in shims:
+            style, canonical_icon = parse_glyph(shims[canonical_icon])
+        requested_styles.setdefault(canonical_icon, set()).add(style)
+
+    canonical: dict[str, None] = {}
+    replaced: dict[str, dict[str, None]] = {}
+    for style, canonical_icon, icon in parsed:
+        if style is None and canonical_icon in shims:
+            shim_style, shim_icon = parse_glyph(shims[canonical_icon])
+            # Only one glyph per codepoint fits in the font.
+            if requested_styles[shim_icon] == {shim_style}:
+                style, canonical_icon = shim_style, shim_icon
+        if canonical_icon != icon:
+            replaced.setdefault(canonical_icon, {})[icon] = None
+        glyph = canonical_icon if style is None else f"{style}:{canonical_icon}"
+        canonical[glyph] = None
+
+    return list(canonical), {icon: list(names) for icon, names in replaced.items()}
+
+
+def ensure_index(fa_dir: Path) -> Mapping[str, str]:
+    """Loads the icon index for a release, building and storing it if needed.
+
+    :return:
+        Returns a mapping of every icon name in the release to its codepoint.
+    """
+    css_file = _fa_paths(fa_dir).fa_css_file
+    index = icon_index.load(fa_dir, css_file)
+    if index is None:
+        index = icon_index.write(fa_dir, css_file)
+    return index
+
+
+def load_icon_index(fa_dir: Path) -> icon_index.IconIndex:
+    """Loads the whole icon index for a release, e.g. to search it, building
+    and storing it if needed.
+
+    The index is only built in memory if it can't be stored, e.g. because
+    the release is in a read-only directory.
+    """
+    css_file = _fa_paths(fa_dir).fa_css_file
+    index = icon_index.load_index(fa_dir, css_file)
+    if index is None:
+        index = icon_index.build_index(css_file)
+        try:
+            icon_index.write(fa_dir, css_file, index)
+        except OSError:
+            pass
+    return index
+
+
+def _resolve_glyphs(fa_dir: Path, glyphs: Iterable[str]) -> tuple[
+    Sequence[str],
+    Mapping[str, Sequence[str]],
+    Mapping[str, str],
+    Mapping[str, str],
+    Mapping[str, Sequence[str]],
+]:
+    # Canonicalizes the glyphs and looks up their codepoints, returning the
+    # glyphs, the aliases replaced, the codepoints, the index used and the
+    # styles of the release's icons (see icon_index.build_styles).
+    css_file = _fa_paths(fa_dir).fa_css_file
+    search_index = icon_index.load_index(fa_dir, css_file)
+    if search_index is None:
+        # Releases outside the cache have no stored index. Building one in
+        # memory reads the CSS and metadata once for everything below.
+        search_index = icon_index.build_index(css_file)
+    glyphs, aliases = canonicalize_glyphs(
+        glyphs, search_index.aliases, search_index.shims
+    )
+    # Report all unknown icons up front, with suggestions.
+    icon_index.check(search_index, [parse_glyph(glyph)[1] for glyph in glyphs])
+    index = search_index.codepoints
+    codepoints = load_codepoints(css_file, glyphs, index=index)
+    return glyphs, aliases, codepoints, index, search_index.styles
+
+
+def _skip_v4compat(
+    input_fonts: Sequence[Path],
+    codepoints: Iterable[str],
+    styles: Mapping[str, str],
+    icon_styles: Mapping[str, Sequence[str]],
+) -> Sequence[Path]:
+    # The v4 compatibility font is only needed for codepoints that no other
+    # font has, which the release's metadata tells without loading any fonts.
+    # Most builds have none, and so one font fewer to load, subset and merge.
+    if "v4compat" in styles.values():
+        return input_fonts
+    included = {_font_style(font_in) for font_in in input_fonts}
+    for codepoint in codepoints:
+        if not included.intersection(icon_styles.get(codepoint.lower(), ())):
+            return input_fonts
+    return [font_in for font_in in input_fonts if _font_style(font_in) != "v4compat"]
+
+
 def find_input_fonts(
     fa_dir: Path,
     *,
@@ -128,93 +480,941 @@ def find_input_fonts(
     return [fa_paths.fa_font_dir / font_fname for font_fname in font_names]
 
 
-def generate_subset_font(
+def _optimization_options(optimize: str) -> fontTools.subset.Options:
+    try:
+        settings = OPTIMIZE_PROFILES[optimize]
+    except KeyError:
+        raise ValueError(f"Unknown optimization profile: {optimize}") from None
+    return fontTools.subset.Options(**settings)
+
+
+def _optimize_font(
+    font: fontTools.ttLib.TTFont, options: fontTools.subset.Options
+) -> None:
+    # The merged font only contains the glyphs we want, so re-subsetting it to
+    # its own character map is the cheapest place to apply the optimizations.
+    subsetter = fontTools.subset.Subsetter(options=options)
+    subsetter.populate(unicodes=font.getBestCmap().keys())
+    subsetter.subset(font)
+
+
+@contextlib.contextmanager
+def _open_font(
+    path: Path, options: fontTools.subset.Options | None = None
+) -> Iterator[fontTools.ttLib.TTFont]:
+    # Reading the font through a memory map, lazily, means that only the
+    # tables (and, for glyf, the glyphs) actually used are read and
+    # decompiled, and the rest of the file never has to be held in memory.
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if options is None:
+            font = fontTools.ttLib.TTFont(m, lazy=True)
+        else:
+            # Glyph names aren't needed to subset by codepoint, and are
+            # expensive to load.
+            font = fontTools.subset.load_font(
+                m, options, dontLoadGlyphNames=True, lazy=True
+            )
+        with font:
+            yield font
+
+
+_tracemalloc_lock = threading.RLock()
+
+
+@contextlib.contextmanager
+def _measure_memory(
+    stage: str, memory_report: MutableSequence[StageMemory] | None
+) -> Iterator[None]:
+    if memory_report is None:
+        yield
+        return
+
+    # tracemalloc is process-wide, so measured stages in different threads
+    # take turns rather than resetting each other's peaks.
+    with _tracemalloc_lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            yield
+            _, peak = tracemalloc.get_traced_memory()
+            memory_report.append(StageMemory(stage=stage, peak=peak - baseline))
+        finally:
+            if started:
+                tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def _stage(
+    name: str,
+    memory_report: MutableSequence[StageMemory] | None,
+    metrics: metrics_.BuildMetrics | None,
+    *,
+    detail: str | None = None,
+) -> Iterator[None]:
+    start = time.perf_counter()
+    with _measure_memory(name if detail is None else f"{name} {detail}", memory_report):
+        yield
+    if metrics is not None:
+        metrics.stage_seconds[name] += time.perf_counter() - start
+
+
+def _reproducible_timestamp(input_fonts: Sequence[Path]) -> int:
+    # https://reproducible-builds.org/specs/source-date-epoch/
+    source_date_epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if source_date_epoch is not None:
+        try:
+            return int(source_date_epoch) - fontTools.misc.timeTools.epoch_diff
+        except ValueError:
+            raise ValueError(
+                f"SOURCE_DATE_EPOCH must be an integer, not {source_date_epoch!r}"
+            ) from None
+
+    # Otherwise the output is as new as the newest of its inputs.
+    timestamps = []
+    for font_in in input_fonts:
+        with _open_font(font_in) as font:
+            timestamps.append(font["head"].modified)
+    return max(timestamps)
+
+
+def _pin_timestamps(font: fontTools.ttLib.TTFont, timestamp: int) -> None:
+    font["head"].created = timestamp
+    font["head"].modified = timestamp
+    font.recalcTimestamp = False
+
+
+def _fingerprinted(path: Path, data: bytes) -> Path:
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+
+def _font_bytes(font: fontTools.ttLib.TTFont, flavor: str) -> bytes:
+    # TTFont.save takes the flavor from the font, so set it for the duration
+    # of the save only; the caller's font is left as it was.
+    original_flavor = font.flavor
+    font.flavor = flavor if flavor in {"woff", "woff2"} else None
+    try:
+        buf = io.BytesIO()
+        font.save(buf)
+    finally:
+        font.flavor = original_flavor
+    return buf.getvalue()
+
+
+# Writes one output file, given its path and contents.
+OutputWriter = Callable[[Path, bytes], None]
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """The default :data:`OutputWriter`, which writes files to disk."""
+    path.write_bytes(data)
+
+
+def _font_style(font_in: Path) -> str | None:
+    for style, font_name in FONT_NAMES.items():
+        if font_in.stem == font_name:
+            return style
+    return None
+
+
+def _assign_codepoints(
     input_fonts: Sequence[Path],
-    codepoints: Mapping[str, str],
-    output_loc: Path,
-    flavors: Sequence[str] = ("woff2", "woff"),
-) -> Sequence[tuple[str, str]]:
-    codepoints_str = ",".join(("U+" + cp) for cp in codepoints.values())
+    codepoints: Iterable[str],
+    styles: Mapping[str, str],
+    cmaps: Mapping[str, Mapping[int, Any]] | None = None,
+) -> Sequence[tuple[Path, Sequence[str]]]:
+    # Many codepoints are in more than one font (e.g. solid and regular), and
+    # only one glyph per codepoint survives the merge, so each codepoint is
+    # only subset from one font: the one for its requested style if it has
+    # one, otherwise the first font that has it.
+    unassigned = {cp.lower() for cp in codepoints if cp.lower() not in styles}
+    unused_styles = set(styles.values())
+
+    assignments = []
+    for font_in in input_fonts:
+        if cmaps is not None:
+            cmap = cmaps[font_in.name]
+        else:
+            with _open_font(font_in) as font:
+                cmap = font.getBestCmap()
+
+        style = _font_style(font_in)
+        assigned = set()
+        for cp, cp_style in styles.items():
+            if cp_style != style:
+                continue
+            if int(cp, 16) not in cmap:
+                raise StyleError(f"No glyph for U+{cp.upper()} in the {style} style")
+            assigned.add(cp)
+        unused_styles.discard(style)
+
+        assigned.update(cp for cp in unassigned if int(cp, 16) in cmap)
+        unassigned -= assigned
+        assignments.append((font_in, sorted(assigned)))
+
+    if unused_styles:
+        raise StyleError(f"Style not included: {', '.join(sorted(unused_styles))}")
+
+    # Fonts without any of the codepoints are left out of the merge entirely,
+    # but there must be at least one font to merge.
+    used = [assignment for assignment in assignments if assignment[1]]
+    return used or assignments[:1]
+
 
+def _subset_font(font_in: Path, codepoints: Sequence[str], font_out: Path) -> None:
+    # Equivalent to `fonttools subset --unicodes=...`, but reading the input
+    # font lazily from a memory map.
+    options = fontTools.subset.Options()
+    with _open_font(font_in, options) as font:
+        options.flavor = font.flavor
+        subsetter = fontTools.subset.Subsetter(options=options)
+        subsetter.populate(unicodes=[int(cp, 16) for cp in codepoints])
+        subsetter.subset(font)
+        fontTools.subset.save_font(font, os.fspath(font_out), options)
+
+
+def _subset_source_font(
+    font_in: Path,
+    codepoints: Sequence[str],
+    font_out: Path,
+    cache_dir: Path | None,
+    memory_report: MutableSequence[StageMemory] | None,
+    metrics: metrics_.BuildMetrics | None,
+) -> None:
+    def _subset() -> None:
+        with _stage("subset", memory_report, metrics, detail=font_in.name):
+            _subset_font(font_in, codepoints, font_out)
+        if metrics is not None:
+            metrics.fonts_touched += 1
+
+    if cache_dir is None:
+        _subset()
+        return
+
+    # The intermediate subset only depends on the codepoints assigned to this
+    # font, so e.g. adding a solid icon leaves the subsets of the other fonts
+    # valid.
+    flavor = font_in.suffix[1:]
+    key = subset_cache.subset_key([font_in], codepoints, [flavor], stage="source")
+
+    def _build() -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+        _subset()
+        return {flavor: font_out.read_bytes()}, {}
+
+    fonts, _ = subset_cache.load_or_build(cache_dir, key, (flavor,), _build)
+    if not font_out.exists():
+        font_out.write_bytes(fonts[flavor])
+        if metrics is not None:
+            metrics.record_cache("source", hit=True)
+    elif metrics is not None:
+        metrics.record_cache("source", hit=False)
+
+
+def _merge_source_subsets(
+    assignments: Sequence[tuple[Path, Sequence[str]]],
+    cache_dir: Path | None,
+    memory_report: MutableSequence[StageMemory] | None,
+    metrics: metrics_.BuildMetrics | None,
+) -> fontTools.ttLib.TTFont:
     with tempfile.TemporaryDirectory() as tdir_s:
         tdir = Path(tdir_s)
         # Create subsets of all the input fonts
         font_outputs = []
-        for font_in in input_fonts:
-            font_path = os.fspath(font_in)
+        for font_in, font_codepoints in assignments:
             out_name = font_in.stem + ".sub" + font_in.suffix
             font_out = tdir / out_name
 
-            fontTools.subset.main(
-                args=(
-                    font_path,
-                    f"--output-file={font_out}",
-                    f"--unicodes={codepoints_str}",
-                )
+            _subset_source_font(
+                font_in, font_codepoints, font_out, cache_dir, memory_report, metrics
             )
 
             font_outputs.append(font_out)
 
         # Merge them into a single font output
-        merger = fontTools.merge.Merger()
-        font = merger.merge(font_outputs)
-        flavors_out = []
-        for flavor in flavors:
-            if flavor in {"woff", "woff2"}:
-                font.flavor = flavor
-            out_path = output_loc.with_suffix(f".{flavor}")
-            flavors_out.append((out_path.name, flavor))
-            font.save(out_path)
+        with _stage("merge", memory_report, metrics):
+            merger = fontTools.merge.Merger()
+            return merger.merge(font_outputs)
+
+
+def _subset_superfont(
+    font: fontTools.ttLib.TTFont,
+    superfont: superfont_.Superfont,
+    assignments: Sequence[tuple[Path, Sequence[str]]],
+    options: fontTools.subset.Options,
+) -> None:
+    # Point each codepoint at the glyph from the font it was assigned to,
+    # which may not be the one the superfont maps it to by default.
+    glyphs = {
+        int(cp, 16): font.getGlyphName(superfont.cmaps[font_in.name][int(cp, 16)])
+        for font_in, font_codepoints in assignments
+        for cp in font_codepoints
+    }
+    for table in font["cmap"].tables:
+        if table.isUnicode():
+            for cp, glyph in glyphs.items():
+                if table.format != 4 or cp <= 0xFFFF:
+                    table.cmap[cp] = glyph
+
+    subsetter = fontTools.subset.Subsetter(options=options)
+    subsetter.populate(unicodes=glyphs.keys())
+    subsetter.subset(font)
+
 
-        return flavors_out
+def _build_subset_fonts(
+    input_fonts: Sequence[Path],
+    codepoints: Mapping[str, str],
+    flavors: Sequence[str],
+    optimize_options: fontTools.subset.Options | None,
+    measure_before: bool,
+    timestamp: int | None,
+    styles: Mapping[str, str],
+    cache_dir: Path | None = None,
+    memory_report: MutableSequence[StageMemory] | None = None,
+    metrics: metrics_.BuildMetrics | None = None,
+    superfont: superfont_.Superfont | None = None,
+) -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+    assignments = _assign_codepoints(
+        input_fonts,
+        codepoints.values(),
+        styles,
+        None if superfont is None else superfont.cmaps,
+    )
+
+    with contextlib.ExitStack() as stack:
+        if superfont is None:
+            font = stack.enter_context(
+                _merge_source_subsets(assignments, cache_dir, memory_report, metrics)
+            )
+        else:
+            # A single subset of the pre-merged fonts replaces subsetting each
+            # input font and merging the results.
+            options = fontTools.subset.Options()
+            font = stack.enter_context(_open_font(superfont.path, options))
+            with _stage("subset", memory_report, metrics, detail="superfont"):
+                _subset_superfont(font, superfont, assignments, options)
+            if metrics is not None:
+                metrics.fonts_touched += 1
+
+        if timestamp is not None:
+            _pin_timestamps(font, timestamp)
+
+        sizes_before = {}
+        if optimize_options is not None:
+            with _stage("optimize", memory_report, metrics):
+                if measure_before:
+                    sizes_before = {
+                        flavor: len(_font_bytes(font, flavor)) for flavor in flavors
+                    }
+                _optimize_font(font, optimize_options)
+
+        with _stage("encode", memory_report, metrics):
+            fonts = {flavor: _font_bytes(font, flavor) for flavor in flavors}
+    return fonts, sizes_before
+
+
+def _glyph_closure(glyf: Any, glyph_name: str) -> Sequence[str]:
+    closure = [glyph_name]
+    for name in closure:
+        glyph = glyf[name]
+        if glyph.isComposite():
+            closure.extend(
+                component
+                for component in glyph.getComponentNames(glyf)
+                if component not in closure
+            )
+    return closure
+
+
+def _icon_costs(
+    fonts: Mapping[str, bytes], codepoints: Mapping[str, str]
+) -> Sequence[IconCost]:
+    # Any flavor will do, since they all hold the same glyphs.
+    font_data = fonts.get("ttf", next(iter(fonts.values())))
+    with fontTools.ttLib.TTFont(io.BytesIO(font_data), lazy=True) as font:
+        if "glyf" not in font:
+            raise ValueError("Cost reports need fonts with TrueType outlines")
+        glyf = font["glyf"]
+        glyph_sizes = {
+            name: len(glyf[name].compile(glyf)) for name in font.getGlyphOrder()
+        }
+
+        # woff2 compresses all the tables in one stream, so compressed bytes
+        # can't be attributed to glyphs exactly. Instead, each glyph gets the
+        # same share of the woff2 font as of the uncompressed font. This only
+        # needs the font to be encoded once (if at all), not once per icon.
+        ttf_size = len(fonts.get("ttf") or _font_bytes(font, "ttf"))
+        woff2_size = len(fonts.get("woff2") or _font_bytes(font, "woff2"))
+
+        cmap = font.getBestCmap()
+        costs = []
+        for name, codepoint in codepoints.items():
+            glyphs = _glyph_closure(glyf, cmap[int(codepoint, 16)])
+            size = sum(glyph_sizes[glyph] for glyph in glyphs)
+            costs.append(
+                IconCost(
+                    name=name,
+                    codepoint=codepoint,
+                    glyphs=glyphs,
+                    size=size,
+                    woff2_size=round(size * woff2_size / ttf_size),
+                )
+            )
+
+    costs.sort(key=lambda cost: (-cost.woff2_size, cost.name))
+    return costs
+
+
+def generate_subset_font(
+    input_fonts: Sequence[Path],
+    codepoints: Mapping[str, str],
+    output_loc: Path,
+    flavors: Sequence[str] = ("woff2", "woff"),
+    *,
+    optimize: str | None = None,
+    size_report: MutableSequence[FlavorSize] | None = None,
+    cache_dir: Path | None = None,
+    reproducible: bool = False,
+    fingerprint: bool = False,
+    remote_cache: remote_cache_.Backend | None = None,
+    memory_report: MutableSequence[StageMemory] | None = None,
+    styles: Mapping[str, str] | None = None,
+    metrics: metrics_.BuildMetrics | None = None,
+    superfont: superfont_.Superfont | None = None,
+    writer: OutputWriter = write_file,
+    cost_report: MutableSequence[IconCost] | None = None,
+) -> Sequence[tuple[str, str]]:
+    """Subsets and merges the input fonts, writing one output per flavor.
+
+    Each codepoint is only taken from one input font: the font for its style
+    in ``styles`` if it has one, otherwise the first input font containing it.
+
+    This may be called from several threads at once, as long as they write
+    to different outputs; every font is loaded afresh for each call.
+
+    :param optimize:
+        The name of an optimization profile from :data:`OPTIMIZE_PROFILES`
+        to apply to the output, or ``None`` to keep fontTools' defaults.
+
+    :param size_report:
+        If passed, a :class:`FlavorSize` is appended for each flavor written,
+        recording the output size with and without the optimizations applied.
+
+    :param cache_dir:
+        If passed, generated fonts are cached in this directory, keyed by the
+        contents of the input fonts, the codepoints and the options, and
+        reused on subsequent calls with the same inputs. The intermediate
+        subset of each input font is cached too, so that after a change to
+        the codepoints only the input fonts affected by it are subset again.
+
+    :param remote_cache:
+        If passed, generated fonts are looked up in this shared cache before
+        being built, and fonts that had to be built are uploaded to it in the
+        background. This is checked after ``cache_dir``.
+
+    :param reproducible:
+        If true, the output is byte-for-byte identical across runs with the
+        same inputs. Timestamps in the output are set from the
+        ``SOURCE_DATE_EPOCH`` environment variable if it is set, otherwise
+        from the most recent timestamp of the input fonts.
+
+    :param fingerprint:
+        If true, a hash of each output font's contents is inserted into its
+        file name, e.g. ``fontawesome-subset.0123abcd.woff2``.
+
+    :param memory_report:
+        If passed, a :class:`StageMemory` is appended for each stage of the
+        build (subsetting each input font, merging, optimizing and encoding),
+        recording the peak memory allocated during it. Stages skipped because
+        their results were cached are not reported. Measuring memory uses
+        :mod:`tracemalloc`, which slows the build down, and measured stages
+        in different threads run one at a time.
+
+    :param styles:
+        A mapping of codepoints to the style (a key of :data:`FONT_NAMES`)
+        they must be taken from, as returned by :func:`load_styles`.
+
+    :param metrics:
+        If passed, the stage durations, cache lookups and output sizes of the
+        build are recorded in it.
+
+    :param superfont:
+        If passed, the output is subset from this pre-merged copy of the
+        input fonts (see :func:`superfont.ensure`) in one go, rather than
+        subsetting each input font and merging the subsets.
+
+    :param writer:
+        Called to write each output font instead of writing it to disk, e.g.
+        to stream the outputs into an archive (see :func:`archive.open_archive`).
+
+    :param cost_report:
+        If passed, an :class:`IconCost` is appended for each icon in
+        ``codepoints``, most expensive first. The costs are computed from the
+        finished font, so they are reported for cached fonts too.
+
+    :return:
+        Returns a sequence of ``(file name, flavor)`` pairs.
+    """
+    styles = {cp.lower(): style for cp, style in (styles or {}).items()}
+    optimize_options = None if optimize is None else _optimization_options(optimize)
+    # Cached entries always record the sizes, since later calls may want them.
+    measure_before = (
+        size_report is not None or cache_dir is not None or remote_cache is not None
+    )
+    timestamp = _reproducible_timestamp(input_fonts) if reproducible else None
+
+    cache_key = None
+    if cache_dir is not None or remote_cache is not None:
+        cache_key = subset_cache.subset_key(
+            input_fonts,
+            codepoints.values(),
+            flavors,
+            optimize=optimize,
+            timestamp=timestamp,
+            styles=sorted(styles.items()),
+            superfont=superfont is not None,
+        )
+
+    built = False
+
+    def _build() -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+        nonlocal built
+        built = True
+
+        if remote_cache is not None:
+            assert cache_key is not None
+            cached = remote_cache_.load(remote_cache, cache_key, flavors)
+            if metrics is not None:
+                metrics.record_cache("remote", hit=cached is not None)
+            if cached is not None:
+                return cached
+
+        fonts, sizes_before = _build_subset_fonts(
+            input_fonts,
+            codepoints,
+            flavors,
+            optimize_options,
+            measure_before,
+            timestamp,
+            styles,
+            cache_dir,
+            memory_report,
+            metrics,
+            superfont,
+        )
+
+        if remote_cache is not None:
+            assert cache_key is not None
+            remote_cache_.store_async(remote_cache, cache_key, fonts, sizes_before)
+        return fonts, sizes_before
+
+    if cache_dir is not None:
+        assert cache_key is not None
+        fonts, sizes_before = subset_cache.load_or_build(
+            cache_dir, cache_key, flavors, _build
+        )
+        if metrics is not None:
+            metrics.record_cache("subset", hit=not built)
+    else:
+        fonts, sizes_before = _build()
+
+    if cost_report is not None:
+        with _stage("cost report", memory_report, metrics):
+            cost_report.extend(_icon_costs(fonts, codepoints))
+
+    flavors_out = []
+    for flavor in flavors:
+        font_data = fonts[flavor]
+        out_path = output_loc.with_suffix(f".{flavor}")
+        if fingerprint:
+            out_path = _fingerprinted(out_path, font_data)
+        flavors_out.append((out_path.name, flavor))
+        writer(out_path, font_data)
+        if metrics is not None:
+            metrics.output_bytes[flavor] = len(font_data)
+
+        if size_report is not None:
+            size_report.append(
+                FlavorSize(
+                    flavor=flavor,
+                    before=sizes_before.get(flavor, len(font_data)),
+                    after=len(font_data),
+                )
+            )
+
+    return flavors_out
+
+
+def generate_core_font(
+    fa_dir: Path,
+    font_out: Path,
+    glyphs: Iterable[str],
+    url: str,
+    *,
+    output_font_flavors: Sequence[str] | None = None,
+    input_flavor: str | None = None,
+    include_fonts: Sequence[str] | None = None,
+    optimize: str | None = None,
+    cache_dir: Path | None = None,
+    reproducible: bool = False,
+    fingerprint: bool = False,
+    remote_cache: remote_cache_.Backend | None = None,
+    use_superfont: bool = False,
+) -> CoreFont:
+    """Generates a font of icons shared by several builds.
+
+    Pass the result as ``core`` to :func:`generate_font_subset` for each
+    build; see :func:`batch.shared_glyphs` for picking the icons.
+
+    :param url:
+        The URL the directory containing ``font_out`` is served from, which
+        the CSS of every build refers to.
+    """
+    fa_paths = _fa_paths(fa_dir)
+    input_fonts = find_input_fonts(
+        fa_dir, **_make_kwargs(input_flavor=input_flavor, include=include_fonts)
+    )
+    if use_superfont:
+        input_fonts = superfont_.available(input_fonts)
+    glyphs, _, codepoints, index, icon_styles = _resolve_glyphs(fa_dir, glyphs)
+    styles = load_styles(fa_paths.fa_css_file, glyphs, index=index)
+    font_flavors = generate_subset_font(
+        (
+            input_fonts
+            if use_superfont
+            else _skip_v4compat(input_fonts, codepoints.values(), styles, icon_styles)
+        ),
+        codepoints,
+        font_out,
+        optimize=optimize,
+        cache_dir=cache_dir,
+        reproducible=reproducible,
+        fingerprint=fingerprint,
+        remote_cache=remote_cache,
+        styles=styles,
+        superfont=superfont_.ensure(fa_dir, input_fonts) if use_superfont else None,
+        **_make_kwargs(flavors=output_font_flavors),
+    )
+
+    lookup = _codepoint_lookup(fa_paths.fa_css_file, index)
+    return CoreFont(
+        codepoints={glyph: lookup(parse_glyph(glyph)[1]) for glyph in glyphs},
+        font_flavors=font_flavors,
+        url=url,
+    )
+
+
+def _unicode_range(codepoints: Iterable[str]) -> str:
+    values = sorted({int(codepoint, 16) for codepoint in codepoints})
+    ranges: list[list[int]] = []
+    for value in values:
+        if ranges and ranges[-1][1] == value - 1:
+            ranges[-1][1] = value
+        else:
+            ranges.append([value, value])
+    return ", ".join(
+        f"U+{start:X}" if start == end else f"U+{start:X}-{end:X}"
+        for start, end in ranges
+    )
+
+
+def _font_sources(font_flavors: Iterable[tuple[str | Path, str]]) -> str:
+    return ",\n".join(
+        [
+            f"    url('{font_loc}') format('{flavor}')"
+            for font_loc, flavor in font_flavors
+        ]
+    )
 
 
 def generate_css(
     codepoints: Mapping[str, str],
     font_flavors: Sequence[tuple[str, str]],
     font_locs: Path = Path("../fonts/"),
+    *,
+    aliases: Mapping[str, Sequence[str]] | None = None,
+    core: CoreFont | None = None,
+    subset_codepoints: Iterable[str] | None = None,
 ) -> str:
+    """Generates the CSS for the subset font.
+
+    :param aliases:
+        A mapping of icon names to other names (e.g. aliases replaced by
+        :func:`canonicalize_glyphs`) that should select the same icon.
+
+    :param core:
+        A shared font holding some of the icons, see :class:`CoreFont`. The
+        font described by ``font_flavors`` then only holds the
+        ``subset_codepoints``, and takes precedence over the core font for
+        them.
+    """
     font_flavors_in = [
         (font_locs / output_name, flavor) for output_name, flavor in font_flavors
     ]
 
-    font_inputs = ",\n".join(
-        [
-            f"    url('{font_loc}') format('{flavor}')"
-            for font_loc, flavor in font_flavors_in
+    if core is None:
+        css = [FONT_DEFINITION.format(flavors=_font_sources(font_flavors_in))]
+    else:
+        core_url = core.url.rstrip("/")
+        css = [
+            FONT_RANGE_DEFINITION.format(
+                flavors=_font_sources(
+                    (f"{core_url}/{output_name}", flavor)
+                    for output_name, flavor in core.font_flavors
+                ),
+                unicode_range=_unicode_range(core.codepoints.values()),
+            )
         ]
-    )
-
-    css = [FONT_DEFINITION.format(flavors=font_inputs), CSS_START]
+        # Later rules win where the ranges overlap, e.g. for an icon that is
+        # in the core font in a different style.
+        if font_flavors_in:
+            css.append(
+                FONT_RANGE_DEFINITION.format(
+                    flavors=_font_sources(font_flavors_in),
+                    unicode_range=_unicode_range(subset_codepoints or ()),
+                )
+            )
+    css.append(CSS_START)
 
+    aliases = aliases or {}
     css += [
-        CSS_BASE.format(icon=icon, codepoint=codepoint)
+        "".join(CSS_ALIAS.format(alias=alias) for alias in aliases.get(icon, ()))
+        + CSS_BASE.format(icon=icon, codepoint=codepoint)
         for icon, codepoint in codepoints.items()
     ]
 
     return "\n".join(css)
 
 
+def write_manifest(
+    outputs: Mapping[str, Path],
+    manifest_out: Path,
+    *,
+    writer: OutputWriter = write_file,
+) -> None:
+    """Writes a JSON manifest mapping logical file names to output files.
+
+    :param outputs:
+        A mapping of logical file names (e.g. ``fontawesome-subset.css``) to
+        the files actually written, as returned by
+        :func:`generate_font_subset`.
+
+    :param manifest_out:
+        Where to write the manifest. Paths in the manifest are relative to the
+        directory containing it.
+
+    :param writer:
+        Called to write the manifest instead of writing it to disk, as for
+        :func:`generate_font_subset`.
+    """
+    manifest_dir = manifest_out.absolute().parent
+    manifest = {
+        name: Path(os.path.relpath(path.absolute(), manifest_dir)).as_posix()
+        for name, path in outputs.items()
+    }
+    manifest_json = json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+    writer(manifest_out, manifest_json.encode("utf-8"))
+
+
+def write_cost_report(
+    costs: Iterable[IconCost],
+    report_out: Path,
+    *,
+    writer: OutputWriter = write_file,
+) -> None:
+    """Writes the costs of icons, as collected by :func:`generate_font_subset`,
+    as a JSON list."""
+    report = [dataclasses.asdict(cost) for cost in costs]
+    report_json = json.dumps(report, indent=2) + "\n"
+    writer(report_out, report_json.encode("utf-8"))
+
+
+def _escape_depfile_path(path: Path) -> str:
+    return (
+        os.fspath(path).replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+    )
+
+
+def write_depfile(
+    targets: Iterable[Path], prerequisites: Iterable[Path], depfile_out: Path
+) -> None:
+    """Writes a Makefile-style dependency file, as used by make and ninja.
+
+    :param targets:
+        The files generated, e.g. the values returned by
+        :func:`generate_font_subset`.
+
+    :param prerequisites:
+        The files the targets were generated from. Each also gets an empty
+        rule, like ``gcc -MP`` writes, so that make rebuilds the targets
+        rather than failing if one is removed (e.g. pruned from the cache).
+    """
+    escaped = [_escape_depfile_path(path) for path in prerequisites]
+    lines = [" ".join(map(_escape_depfile_path, targets)) + ":"]
+    lines += [f"  {path}" for path in escaped]
+    rules = [" \\\n".join(lines), *(f"{path}:" for path in escaped)]
+    depfile_out.write_text("\n\n".join(rules) + "\n")
+
+
 def generate_font_subset(
     fa_dir: Path,
     css_out: Path,
     font_out: Path,
-    glyphs: Sequence[str],
+    glyphs: Iterable[str],
     *,
     output_font_flavors: Sequence[str] | None = None,
     input_flavor: str | None = None,
     include_fonts: Sequence[str] | None = None,
-) -> None:
+    optimize: str | None = None,
+    size_report: MutableSequence[FlavorSize] | None = None,
+    cache_dir: Path | None = None,
+    reproducible: bool = False,
+    fingerprint: bool = False,
+    dependencies: MutableSequence[Path] | None = None,
+    remote_cache: remote_cache_.Backend | None = None,
+    memory_report: MutableSequence[StageMemory] | None = None,
+    metrics_sink: metrics_.MetricsSink | None = None,
+    core: CoreFont | None = None,
+    use_superfont: bool = False,
+    writer: OutputWriter = write_file,
+    cost_report: MutableSequence[IconCost] | None = None,
+) -> Mapping[str, Path]:
+    """Generates the subset fonts and the CSS to use them.
+
+    Like :func:`generate_subset_font`, this is safe to call from several
+    threads at once with different outputs.
+
+    :param glyphs:
+        The names of the icons to include, each optionally qualified with the
+        style to use for it (see :func:`parse_glyph`), e.g. ``regular:user``.
+        Aliases are replaced by their canonical names and duplicates are
+        dropped (see :func:`canonicalize_glyphs`); the generated CSS still
+        defines the aliases that were requested.
+
+    :param dependencies:
+        If passed, the paths of every Font Awesome file read to generate the
+        outputs are appended to it.
+
+    :param metrics_sink:
+        If passed, the :class:`metrics.BuildMetrics` of this call are emitted
+        to it once the outputs have been written.
+
+    :param core:
+        If passed, the icons in this shared font are taken from it rather than
+        included in the generated font, which then only holds the remaining
+        icons (and is not written at all if there are none). The CSS refers
+        to both fonts.
+
+    :param use_superfont:
+        If true, the input fonts are merged into a superfont once, which is
+        stored in ``fa_dir`` and reused by later calls, so that each call only
+        subsets one font (see :func:`superfont.ensure`).
+
+    :param writer:
+        Called with the path and contents of each output file as soon as it
+        is generated, instead of writing it to disk, e.g. to stream the
+        outputs into an archive (see :func:`archive.open_archive`).
+
+    :param cost_report:
+        If passed, an :class:`IconCost` is appended for each icon in the
+        generated font (see :func:`generate_subset_font`), which can be
+        written out with :func:`write_cost_report`.
+
+    :return:
+        Returns a mapping of the logical name of each output file (e.g.
+        ``fontawesome-subset.woff2``) to the path it was written to, which
+        differs from the logical name when ``fingerprint`` is true.
+    """
+    metrics = None if metrics_sink is None else metrics_.BuildMetrics()
+    start = time.perf_counter()
 
     fa_paths = _fa_paths(fa_dir)
     input_fonts = find_input_fonts(
         fa_dir, **_make_kwargs(input_flavor=input_flavor, include=include_fonts)
     )
 
-    codepoints = load_codepoints(fa_paths.fa_css_file, glyphs)
-    font_flavors = generate_subset_font(
-        input_fonts, codepoints, font_out, **_make_kwargs(flavors=output_font_flavors)
-    )
+    with _stage("codepoints", None, metrics):
+        glyphs, aliases, codepoints, index, icon_styles = _resolve_glyphs(
+            fa_dir, glyphs
+        )
+        if "rss" in aliases and "rss-mod" in codepoints:
+            # Follow the renaming in load_codepoints.
+            aliases = {**aliases, "rss-mod": aliases["rss"]}
+        # Icons in the core font are left out of this build's own font.
+        subset_glyphs = [
+            glyph for glyph in glyphs if core is None or glyph not in core.codepoints
+        ]
+        subset_codepoints = (
+            codepoints
+            if core is None
+            else load_codepoints(fa_paths.fa_css_file, subset_glyphs, index=index)
+        )
+        styles = load_styles(fa_paths.fa_css_file, subset_glyphs, index=index)
+        if use_superfont:
+            # The superfont has every font of the release merged already, so
+            # leaving one out would only mean merging another superfont.
+            input_fonts = superfont_.available(input_fonts)
+        else:
+            input_fonts = _skip_v4compat(
+                input_fonts, subset_codepoints.values(), styles, icon_styles
+            )
+
+    if dependencies is not None:
+        dependencies.append(fa_paths.fa_css_file)
+        for metadata_file in (
+            icon_index.metadata_file(fa_paths.fa_css_file),
+            icon_index.shims_file(fa_paths.fa_css_file),
+        ):
+            if metadata_file.exists():
+                dependencies.append(metadata_file)
+        dependencies.extend(input_fonts)
+
+    font_flavors: Sequence[tuple[str, str]] = []
+    if subset_codepoints:
+        font_flavors = generate_subset_font(
+            input_fonts,
+            subset_codepoints,
+            font_out,
+            optimize=optimize,
+            size_report=size_report,
+            cache_dir=cache_dir,
+            reproducible=reproducible,
+            fingerprint=fingerprint,
+            remote_cache=remote_cache,
+            memory_report=memory_report,
+            styles=styles,
+            metrics=metrics,
+            superfont=(
+                superfont_.ensure(fa_dir, input_fonts) if use_superfont else None
+            ),
+            writer=writer,
+            cost_report=cost_report,
+            **_make_kwargs(flavors=output_font_flavors),
+        )
+
+    outputs = {
+        font_out.with_suffix(f".{flavor}").name: font_out.parent / output_name
+        for output_name, flavor in font_flavors
+    }
+
+    css = generate_css(
+        codepoints,
+        font_flavors,
+        aliases=aliases,
+        core=core,
+        subset_codepoints=None if core is None else subset_codepoints.values(),
+    ).encode("utf-8")
+    css_path = _fingerprinted(css_out, css) if fingerprint else css_out
+    writer(css_path, css)
+    outputs[css_out.name] = css_path
+
+    if metrics_sink is not None:
+        assert metrics is not None
+        metrics.glyphs = len(codepoints)
+        metrics.duration = time.perf_counter() - start
+        metrics.peak_rss = metrics_.peak_rss()
+        metrics_sink.emit(metrics)
 
-    css = generate_css(codepoints, font_flavors)
-    css_out.write_text(css)
+    return outputs
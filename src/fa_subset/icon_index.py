@@ -0,0 +1,368 @@
+import bisect
+import collections
+import dataclasses
+import functools
+import json
+import os
+import re
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import Any, Final
+
+from . import cache
+
+# The index is stored inside the extracted release, so it is evicted from the
+# cache along with it.
+INDEX_FILE: Final[str] = "fa_subset_index.json"
+
+# Bump this whenever the contents of the index change.
+INDEX_FORMAT: Final[int] = 4
+
+# Icon metadata shipped with Font Awesome releases, relative to the directory
+# containing `css/`.
+METADATA_FILE: Final[Path] = Path("metadata") / "icons.json"
+SHIMS_FILE: Final[Path] = Path("metadata") / "shims.json"
+
+# Maps the prefixes used in the shim metadata to styles (see
+# fa_extractor.FONT_NAMES).
+_SHIM_STYLES: Final[Mapping[str, str]] = {
+    "fas": "solid",
+    "far": "regular",
+    "fab": "brands",
+}
+
+_ICON_RE: Final[re.Pattern] = re.compile(
+    r"\.fa-(?P<icon>[\w-]+):+before {\s+content: ['\"]+(?P<codepoint>[^'\"]+)"
+)
+
+# Fuzzy matches must contain at least this fraction of the trigrams of the
+# search term (see _similar).
+MIN_SIMILARITY: Final[float] = 0.5
+
+
+@dataclasses.dataclass(frozen=True)
+class IconIndex:
+    """Everything stored in the index of a release, see :func:`load_index`."""
+
+    codepoints: Mapping[str, str]
+    aliases: Mapping[str, str]
+    # See build_shims and build_styles.
+    shims: Mapping[str, str]
+    styles: Mapping[str, Sequence[str]]
+    # Maps each trigram (see trigrams) to the names containing it.
+    trigrams: Mapping[str, Sequence[str]]
+
+    @functools.cached_property
+    def names(self) -> Sequence[str]:
+        """Every icon name and alias in the release, sorted."""
+        return sorted(self.codepoints.keys() | self.aliases.keys())
+
+    def codepoint(self, name: str) -> str | None:
+        """Returns the codepoint of an icon or alias, if it is in the release."""
+        codepoint = self.codepoints.get(name)
+        if codepoint is None and name in self.aliases:
+            codepoint = self.codepoints.get(self.aliases[name])
+        return codepoint
+
+
+@dataclasses.dataclass(frozen=True)
+class IconMatch:
+    name: str
+    codepoint: str | None
+    # The canonical name of the icon, if ``name`` is an alias.
+    alias_of: str | None
+
+    @classmethod
+    def of(cls, index: IconIndex, name: str) -> "IconMatch":
+        return cls(
+            name=name, codepoint=index.codepoint(name), alias_of=index.aliases.get(name)
+        )
+
+
+class UnknownIconsError(ValueError):
+    """Raised when icons are not in a release, listing all of them at once.
+
+    :ivar suggestions:
+        A mapping of each unknown name to similar names in the release, which
+        may be empty.
+    """
+
+    def __init__(self, suggestions: Mapping[str, Sequence[str]]) -> None:
+        self.suggestions = suggestions
+        names = [
+            f"{name} (did you mean: {', '.join(similar)}?)" if similar else name
+            for name, similar in suggestions.items()
+        ]
+        plural = "s" if len(names) > 1 else ""
+        super().__init__(f"Unknown icon{plural}: {', '.join(names)}")
+
+    def __reduce__(self):
+        # Exceptions are pickled as their args by default, e.g. when they are
+        # sent back from batch workers.
+        return type(self), (self.suggestions,)
+
+
+def build(css_file: Path) -> Mapping[str, str]:
+    """Maps every icon name in a Font Awesome CSS file to its codepoint."""
+    css = css_file.read_text()
+
+    codepoints: dict[str, str] = {}
+    for m in _ICON_RE.finditer(css):
+        codepoint = m.group("codepoint")
+        if codepoint.startswith("\\"):
+            codepoint = codepoint[1:]
+        # The first definition wins, as with fa_extractor.load_codepoints.
+        codepoints.setdefault(m.group("icon"), codepoint)
+
+    return codepoints
+
+
+def metadata_file(css_file: Path) -> Path:
+    """Returns the path of the icon metadata of the release ``css_file`` is in."""
+    return css_file.parent.parent / METADATA_FILE
+
+
+def shims_file(css_file: Path) -> Path:
+    """Returns the path of the shim metadata of the release ``css_file`` is in."""
+    return css_file.parent.parent / SHIMS_FILE
+
+
+def _read_metadata(path: Path) -> Mapping[str, Any]:
+    try:
+        with open(path, "rb") as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        return {}
+    # Releases before 6 store shims as a list, which isn't supported.
+    return metadata if isinstance(metadata, dict) else {}
+
+
+# The build_* functions below each read the metadata they need; build_index
+# reads it once and hands it to these instead. The metadata of a release is
+# several MB of JSON.
+
+
+def _aliases(metadata: Mapping[str, Any]) -> Mapping[str, str]:
+    aliases: dict[str, str] = {}
+    for icon, icon_metadata in metadata.items():
+        for alias in icon_metadata.get("aliases", {}).get("names", ()):
+            aliases.setdefault(alias, icon)
+    return aliases
+
+
+def _styles(metadata: Mapping[str, Any]) -> Mapping[str, Sequence[str]]:
+    # Only the free styles are in the free release.
+    return {
+        icon_metadata["unicode"].lower(): icon_metadata["free"]
+        for icon_metadata in metadata.values()
+        if icon_metadata.get("free")
+    }
+
+
+def _shims(
+    metadata: Mapping[str, Any], shims_metadata: Mapping[str, Any]
+) -> Mapping[str, str]:
+    shims: dict[str, str] = {}
+    for name, shim in shims_metadata.items():
+        icon = shim.get("name", name)
+        style = _SHIM_STYLES.get(shim.get("prefix", ""))
+        icon_metadata = metadata.get(icon)
+        if icon_metadata is None or (
+            style is not None and style not in icon_metadata.get("free", ())
+        ):
+            continue
+        glyph = icon if style is None else f"{style}:{icon}"
+        if glyph != name:
+            shims[name] = glyph
+    return shims
+
+
+def build_aliases(css_file: Path) -> Mapping[str, str]:
+    """Maps every alias in a Font Awesome release to its canonical icon name.
+
+    Aliases (e.g. ``home`` for ``house``) are read from the release's icon
+    metadata. Releases without metadata have no aliases.
+    """
+    return _aliases(_read_metadata(metadata_file(css_file)))
+
+
+def build_styles(css_file: Path) -> Mapping[str, Sequence[str]]:
+    """Maps the codepoint of every icon in a Font Awesome release's metadata
+    to the styles (see :data:`fa_extractor.FONT_NAMES`) the release has it
+    in. Releases without metadata have no styles.
+    """
+    return _styles(_read_metadata(metadata_file(css_file)))
+
+
+def build_shims(css_file: Path) -> Mapping[str, str]:
+    """Maps the names of Font Awesome 4 icons to the glyphs replacing them in
+    a release, e.g. ``envelope-o`` to ``regular:envelope``.
+
+    Shims are read from the release's shim metadata, and only kept if the
+    release has the icon they point to in the style they point to.
+    Releases without shim metadata have no shims.
+    """
+    return _shims(
+        _read_metadata(metadata_file(css_file)), _read_metadata(shims_file(css_file))
+    )
+
+
+def trigrams(name: str) -> frozenset[str]:
+    """Returns the trigrams of a name, padded as in PostgreSQL's pg_trgm so
+    that matching starts count for more."""
+    padded = f"  {name.lower()} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def build_trigrams(names: Iterable[str]) -> Mapping[str, Sequence[str]]:
+    """Maps every trigram of ``names`` to the names containing it."""
+    postings: dict[str, list[str]] = {}
+    for name in sorted(set(names)):
+        for trigram in trigrams(name):
+            postings.setdefault(trigram, []).append(name)
+    return postings
+
+
+def build_index(css_file: Path) -> IconIndex:
+    """Builds the whole index for a release, without storing it."""
+    codepoints = build(css_file)
+    metadata = _read_metadata(metadata_file(css_file))
+    aliases = _aliases(metadata)
+    return IconIndex(
+        codepoints=codepoints,
+        aliases=aliases,
+        shims=_shims(metadata, _read_metadata(shims_file(css_file))),
+        styles=_styles(metadata),
+        trigrams=build_trigrams(codepoints.keys() | aliases.keys()),
+    )
+
+
+def _css_stamp(css_file: Path) -> tuple[int, int]:
+    stat = css_file.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write(
+    fa_dir: Path, css_file: Path, index: IconIndex | None = None
+) -> Mapping[str, str]:
+    """Builds the index for a release and stores it in ``fa_dir``.
+
+    :param index:
+        The index to store, if it has been built already.
+    """
+    if index is None:
+        index = build_index(css_file)
+    data = {
+        "format": INDEX_FORMAT,
+        "css": [os.path.relpath(css_file, fa_dir), *_css_stamp(css_file)],
+        "codepoints": index.codepoints,
+        "aliases": index.aliases,
+        "shims": index.shims,
+        "styles": index.styles,
+        "trigrams": index.trigrams,
+    }
+    cache.write_atomic(fa_dir / INDEX_FILE, json.dumps(data).encode("utf-8"))
+    return index.codepoints
+
+
+def _load(fa_dir: Path, css_file: Path) -> Mapping[str, Any] | None:
+    try:
+        index = json.loads((fa_dir / INDEX_FILE).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+    css_info = [os.path.relpath(css_file, fa_dir), *_css_stamp(css_file)]
+    if index.get("format") != INDEX_FORMAT or index.get("css") != css_info:
+        return None
+
+    return index
+
+
+def load(fa_dir: Path, css_file: Path) -> Mapping[str, str] | None:
+    """Loads the index for a release, if there is an up-to-date one."""
+    index = _load(fa_dir, css_file)
+    return None if index is None else index["codepoints"]
+
+
+def load_aliases(fa_dir: Path, css_file: Path) -> Mapping[str, str] | None:
+    """Loads the aliases stored in the index for a release (see
+    :func:`build_aliases`), if there is an up-to-date index."""
+    index = _load(fa_dir, css_file)
+    return None if index is None else index["aliases"]
+
+
+def load_index(fa_dir: Path, css_file: Path) -> IconIndex | None:
+    """Loads the whole index for a release, if there is an up-to-date one."""
+    index = _load(fa_dir, css_file)
+    if index is None:
+        return None
+    return IconIndex(
+        codepoints=index["codepoints"],
+        aliases=index["aliases"],
+        shims=index["shims"],
+        styles=index["styles"],
+        trigrams=index["trigrams"],
+    )
+
+
+def _prefixed(index: IconIndex, prefix: str) -> Sequence[str]:
+    names = index.names
+    matches = []
+    for i in range(bisect.bisect_left(names, prefix), len(names)):
+        if not names[i].startswith(prefix):
+            break
+        matches.append(names[i])
+    # Shortest (i.e. closest) first; the sort is stable, so names of the same
+    # length stay in alphabetical order.
+    matches.sort(key=len)
+    return matches
+
+
+def _similar(index: IconIndex, term: str) -> Sequence[str]:
+    term_trigrams = trigrams(term)
+    shared: collections.Counter[str] = collections.Counter()
+    for trigram in term_trigrams:
+        shared.update(index.trigrams.get(trigram, ()))
+
+    scored = []
+    for name, count in shared.items():
+        # How much of the term is in the name, then how much of the name is
+        # the term, so that shorter names win ties.
+        coverage = count / len(term_trigrams)
+        jaccard = count / (len(term_trigrams) + len(trigrams(name)) - count)
+        if coverage >= MIN_SIMILARITY:
+            scored.append((-coverage, -jaccard, name))
+    return [name for *_, name in sorted(scored)]
+
+
+def search(
+    index: IconIndex, term: str, *, limit: int | None = None
+) -> Sequence[IconMatch]:
+    """Finds the icons whose names or aliases match a search term.
+
+    Names starting with ``term`` come first, shortest first, followed by
+    names that are merely similar to it (e.g. misspellings), most similar
+    first.
+    """
+    term = term.strip().lower()
+    names = dict.fromkeys(_prefixed(index, term))
+    if term:
+        names.update(dict.fromkeys(_similar(index, term)))
+    return [IconMatch.of(index, name) for name in list(names)[:limit]]
+
+
+def suggest(index: IconIndex, name: str, *, limit: int = 3) -> Sequence[str]:
+    """Returns names in the release similar to ``name``, most similar first."""
+    similar = [other for other in _similar(index, name.lower()) if other != name]
+    return similar[:limit]
+
+
+def check(index: IconIndex, names: Iterable[str]) -> None:
+    """Checks that every name is an icon or alias in the release.
+
+    :raise UnknownIconsError:
+        Raises an error listing every unknown name, with suggestions.
+    """
+    unknown = [name for name in dict.fromkeys(names) if index.codepoint(name) is None]
+    if unknown:
+        raise UnknownIconsError({name: suggest(index, name) for name in unknown})
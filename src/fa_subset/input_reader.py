@@ -1,7 +1,17 @@
 import functools
+import glob
 import io
-from collections.abc import Iterable, Sequence
+import json
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from pathlib import Path
+from typing import Any, Final
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
 
 
 def _read_txt(glyph_file: Iterable[str]) -> Sequence[str]:
@@ -45,3 +55,71 @@ def _(glyph_file: io.TextIOBase) -> Sequence[str]:
 def _(glyph_file: Path) -> Sequence[str]:
     with open(glyph_file) as f:
         return read_txt(f)
+
+
+def _icon_list(data: Any, source: Path) -> Sequence[str]:
+    # Structured manifests are either a list of names, or a table/object with
+    # an "icons" list (leaving room for other keys).
+    icons = data.get("icons") if isinstance(data, dict) else data
+    if not isinstance(icons, list) or not all(isinstance(i, str) for i in icons):
+        raise ValueError(f"{source}: expected a list of icon names")
+    return icons
+
+
+def _read_json(path: Path) -> Iterable[str]:
+    with open(path, "rb") as f:
+        return _icon_list(json.load(f), path)
+
+
+def _read_toml(path: Path) -> Iterable[str]:
+    with open(path, "rb") as f:
+        return _icon_list(tomllib.load(f), path)
+
+
+def _read_text(path: Path) -> Iterable[str]:
+    with open(path) as f:
+        yield from _read_txt(f)
+
+
+READERS: Final[Mapping[str, Callable[[Path], Iterable[str]]]] = {
+    ".json": _read_json,
+    ".toml": _read_toml,
+}
+
+
+def read_file(path: Path) -> Iterator[str]:
+    """Reads glyph names from a file, in a format chosen by its extension.
+
+    ``.json`` files must contain a list of names, or an object with an
+    ``icons`` list; ``.toml`` files must have a top-level ``icons`` list. Any
+    other file is read as text, as with :func:`read_txt`.
+    """
+    yield from READERS.get(path.suffix.lower(), _read_text)(path)
+
+
+def expand_inputs(inputs: Iterable[str | os.PathLike[str]]) -> Iterator[Path]:
+    """Expands glob patterns (e.g. ``teams/*/icons.toml``) in a list of inputs.
+
+    Patterns are expanded in sorted order, and ``**`` matches any number of
+    directories. Other inputs are passed through unchanged.
+    """
+    for input_ in inputs:
+        pattern = os.fspath(input_)
+        if not glob.has_magic(pattern):
+            yield Path(pattern)
+            continue
+
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"No files match {pattern}")
+        yield from map(Path, matches)
+
+
+def read_inputs(inputs: Iterable[str | os.PathLike[str]]) -> Iterator[str]:
+    """Reads the glyph names from several files and glob patterns, in order.
+
+    Each file is read lazily (see :func:`read_file`), so this can stream
+    through large numbers of manifests.
+    """
+    for path in expand_inputs(inputs):
+        yield from read_file(path)
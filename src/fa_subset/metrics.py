@@ -0,0 +1,240 @@
+import abc
+import collections
+import dataclasses
+import json
+import re
+import sys
+import threading
+import time
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Final
+
+from . import cache
+
+if sys.platform != "win32":
+    import resource
+
+FORMATS: Final[Sequence[str]] = ("jsonl", "prometheus")
+
+
+@dataclasses.dataclass
+class BuildMetrics:
+    """Metrics collected during one :func:`fa_extractor.generate_font_subset` call.
+
+    ``fonts_touched`` counts the input fonts that were actually subset, so it
+    is 0 if the fonts came from a cache. ``stage_seconds`` maps each stage of
+    the build (e.g. ``subset`` or ``merge``) to the time spent in it, and the
+    cache counters are keyed by cache: ``subset`` for merged subsets in the
+    local cache, ``source`` for per-font intermediate subsets and ``remote``
+    for the remote cache.
+    """
+
+    timestamp: float = dataclasses.field(default_factory=time.time)
+    duration: float = 0.0
+    glyphs: int = 0
+    fonts_touched: int = 0
+    stage_seconds: dict[str, float] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(float)
+    )
+    output_bytes: dict[str, int] = dataclasses.field(default_factory=dict)
+    cache_hits: dict[str, int] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(int)
+    )
+    cache_misses: dict[str, int] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(int)
+    )
+    peak_rss: int | None = None
+
+    def record_cache(self, cache_name: str, hit: bool) -> None:
+        counts = self.cache_hits if hit else self.cache_misses
+        counts[cache_name] += 1
+
+    def to_json(self) -> Mapping[str, object]:
+        return {
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            "glyphs": self.glyphs,
+            "fonts_touched": self.fonts_touched,
+            "stage_seconds": dict(self.stage_seconds),
+            "output_bytes": self.output_bytes,
+            "cache_hits": dict(self.cache_hits),
+            "cache_misses": dict(self.cache_misses),
+            "peak_rss": self.peak_rss,
+        }
+
+
+def peak_rss() -> int | None:
+    """Returns the peak resident set size of this process in bytes, if known."""
+    if sys.platform == "win32":
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports this in KiB, macOS in bytes.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class MetricsSink(abc.ABC):
+    """A destination for the metrics of each build."""
+
+    @abc.abstractmethod
+    def emit(self, metrics: BuildMetrics) -> None:
+        """Records the metrics of one build."""
+
+
+class JSONLinesSink(MetricsSink):
+    """Appends the metrics of each build to a file as one JSON object per line.
+
+    Lines are written with a single append, so several processes can share a
+    file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def emit(self, metrics: BuildMetrics) -> None:
+        line = json.dumps(metrics.to_json(), sort_keys=True) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+# The type and help text of each metric written by PrometheusTextfileSink.
+_PROMETHEUS_METRICS: Final[Mapping[str, tuple[str, str]]] = {
+    "builds_total": ("counter", "Number of builds."),
+    "cache_hits_total": ("counter", "Number of cache hits, by cache."),
+    "cache_misses_total": ("counter", "Number of cache misses, by cache."),
+    "last_build_timestamp_seconds": ("gauge", "When the last build started."),
+    "last_build_duration_seconds": ("gauge", "Duration of the last build."),
+    "last_build_glyphs": ("gauge", "Number of glyphs in the last build."),
+    "last_build_fonts_touched": ("gauge", "Input fonts subset by the last build."),
+    "last_build_stage_duration_seconds": (
+        "gauge",
+        "Time spent in each stage of the last build.",
+    ),
+    "last_build_output_bytes": (
+        "gauge",
+        "Size of each output font flavor of the last build.",
+    ),
+    "peak_rss_bytes": ("gauge", "Peak resident set size of the process."),
+}
+
+_Sample = tuple[str, Mapping[str, str], float]
+
+# Matches the counter samples written by PrometheusTextfileSink, which are
+# read back to add each build to them.
+_COUNTER_RE: Final[re.Pattern] = re.compile(
+    r'fa_subset_(?P<name>\w+_total)(?:\{cache="(?P<cache>(?:[^"\\]|\\.)*)"\})? '
+    r"(?P<value>\S+)"
+)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _unescape_label(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+class PrometheusTextfileSink(MetricsSink):
+    """Writes metrics in the Prometheus text format, e.g. for node_exporter's
+    textfile collector.
+
+    The file is replaced atomically after each build. Counters (the
+    ``*_total`` metrics) accumulate over every build written to the file,
+    including those of other sinks and processes (e.g. earlier runs of the
+    CLI), and gauges describe the most recent build.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._builds = 0
+        self._cache_hits: collections.Counter[str] = collections.Counter()
+        self._cache_misses: collections.Counter[str] = collections.Counter()
+        self._last: BuildMetrics | None = None
+
+    def _read_counters(self) -> None:
+        # Picks up the counters as the file has them, or starts from zero.
+        self._builds = 0
+        self._cache_hits.clear()
+        self._cache_misses.clear()
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        counters = {
+            "cache_hits_total": self._cache_hits,
+            "cache_misses_total": self._cache_misses,
+        }
+        for line in text.splitlines():
+            m = _COUNTER_RE.fullmatch(line)
+            if m is None:
+                continue
+            try:
+                value = int(float(m.group("value")))
+            except ValueError:
+                continue
+            if m.group("name") == "builds_total":
+                self._builds = value
+            elif m.group("name") in counters and m.group("cache") is not None:
+                counters[m.group("name")][_unescape_label(m.group("cache"))] = value
+
+    def _samples(self) -> Iterator[_Sample]:
+        yield "builds_total", {}, self._builds
+        for cache_name, hits in sorted(self._cache_hits.items()):
+            yield "cache_hits_total", {"cache": cache_name}, hits
+        for cache_name, misses in sorted(self._cache_misses.items()):
+            yield "cache_misses_total", {"cache": cache_name}, misses
+
+        last = self._last
+        if last is None:
+            return
+        yield "last_build_timestamp_seconds", {}, last.timestamp
+        yield "last_build_duration_seconds", {}, last.duration
+        yield "last_build_glyphs", {}, last.glyphs
+        yield "last_build_fonts_touched", {}, last.fonts_touched
+        for stage, seconds in sorted(last.stage_seconds.items()):
+            yield "last_build_stage_duration_seconds", {"stage": stage}, seconds
+        for flavor, size in sorted(last.output_bytes.items()):
+            yield "last_build_output_bytes", {"flavor": flavor}, size
+        if last.peak_rss is not None:
+            yield "peak_rss_bytes", {}, last.peak_rss
+
+    def _render(self) -> str:
+        lines = []
+        described = set()
+        for name, labels, value in self._samples():
+            if name not in described:
+                described.add(name)
+                metric_type, help_text = _PROMETHEUS_METRICS[name]
+                lines.append(f"# HELP fa_subset_{name} {help_text}")
+                lines.append(f"# TYPE fa_subset_{name} {metric_type}")
+
+            label_str = ",".join(
+                f'{key}="{_escape_label(label)}"' for key, label in labels.items()
+            )
+            if label_str:
+                label_str = f"{{{label_str}}}"
+            lines.append(f"fa_subset_{name}{label_str} {value}")
+        return "\n".join(lines) + "\n"
+
+    def emit(self, metrics: BuildMetrics) -> None:
+        # The file lock keeps concurrent processes from losing each other's
+        # builds between reading the counters and replacing the file.
+        with self._lock, cache.lock(self.path):
+            self._read_counters()
+            self._builds += 1
+            self._cache_hits.update(metrics.cache_hits)
+            self._cache_misses.update(metrics.cache_misses)
+            self._last = metrics
+            cache.write_atomic(self.path, self._render().encode("utf-8"))
+
+
+def sink(path: Path, metrics_format: str = "jsonl") -> MetricsSink:
+    """Creates a sink writing to ``path`` in one of :data:`FORMATS`."""
+    if metrics_format == "jsonl":
+        return JSONLinesSink(path)
+    if metrics_format == "prometheus":
+        return PrometheusTextfileSink(path)
+    raise ValueError(f"Unknown metrics format: {metrics_format}")
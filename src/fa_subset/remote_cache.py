@@ -0,0 +1,195 @@
+import abc
+import concurrent.futures
+import io
+import json
+import logging
+import os
+import threading
+import urllib.parse
+import zipfile
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Final
+
+import requests
+
+from . import cache
+
+REMOTE_CACHE_ENV: Final[str] = "FA_SUBSET_REMOTE_CACHE"
+
+_SIZES_FILE: Final[str] = "sizes.json"
+
+logger = logging.getLogger(__name__)
+
+
+class Backend(abc.ABC):
+    """A key-value store shared between machines, used to cache subsets.
+
+    Keys are the hex digests calculated by :func:`subset_cache.subset_key`,
+    and values are opaque blobs. Backends must be safe to call from multiple
+    threads.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> bytes | None:
+        """Returns the value stored for ``key``, or ``None`` if there is none."""
+
+    @abc.abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Stores ``data`` for ``key``."""
+
+
+class DirectoryBackend(Backend):
+    """Stores entries in a directory, e.g. on a network file system."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        # Spread entries over subdirectories to keep directories small.
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Entries are immutable, so concurrent writers can just race to
+        # atomically replace each other's (identical) file.
+        cache.write_atomic(path, data)
+
+
+class HTTPBackend(Backend):
+    """Stores entries on a web server, with ``GET`` and ``PUT {url}/{key}``."""
+
+    def __init__(self, url: str, *, timeout: float = 30.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def _session(self) -> requests.Session:
+        # Sessions aren't thread safe, so use one per thread.
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def get(self, key: str) -> bytes | None:
+        r = self._session.get(f"{self.url}/{key}", timeout=self.timeout)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.content
+
+    def put(self, key: str, data: bytes) -> None:
+        r = self._session.put(f"{self.url}/{key}", data=data, timeout=self.timeout)
+        r.raise_for_status()
+
+
+def backend_from_url(url: str) -> Backend:
+    """Creates a backend from a URL.
+
+    ``http://`` and ``https://`` URLs use :class:`HTTPBackend`; ``file://``
+    URLs and plain paths use :class:`DirectoryBackend`.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme in {"http", "https"}:
+        return HTTPBackend(url)
+    if parsed.scheme == "file":
+        return DirectoryBackend(Path(urllib.parse.unquote(parsed.path)))
+    if parsed.scheme and len(parsed.scheme) > 1:
+        raise ValueError(f"Unsupported remote cache URL: {url}")
+    # Plain paths, including Windows drive letters
+    return DirectoryBackend(Path(url))
+
+
+def _pack(fonts: Mapping[str, bytes], sizes_before: Mapping[str, int]) -> bytes:
+    buf = io.BytesIO()
+    # Fonts are mostly compressed already, so don't bother compressing again.
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for flavor, data in sorted(fonts.items()):
+            zf.writestr(flavor, data)
+        zf.writestr(_SIZES_FILE, json.dumps(sizes_before))
+    return buf.getvalue()
+
+
+def _unpack(
+    data: bytes, flavors: Sequence[str]
+) -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+    with zipfile.ZipFile(io.BytesIO(data), "r") as zf:
+        fonts = {flavor: zf.read(flavor) for flavor in flavors}
+        sizes_before = json.loads(zf.read(_SIZES_FILE))
+    return fonts, sizes_before
+
+
+def load(
+    backend: Backend, key: str, flavors: Sequence[str]
+) -> tuple[Mapping[str, bytes], Mapping[str, int]] | None:
+    """Loads a subset from a remote cache.
+
+    Failures are logged and treated as cache misses, so that an unavailable
+    remote cache never breaks a build.
+
+    :return:
+        Returns a tuple of the font data and unoptimized font sizes for each
+        flavor, or ``None`` if the subset is not in the cache.
+    """
+    try:
+        data = backend.get(key)
+        if data is None:
+            return None
+        return _unpack(data, flavors)
+    except Exception:
+        logger.warning("Failed to load %s from the remote cache", key, exc_info=True)
+        return None
+
+
+_upload_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_upload_futures: set[concurrent.futures.Future] = set()
+_upload_lock = threading.Lock()
+
+
+def _upload(backend: Backend, key: str, data: bytes) -> None:
+    try:
+        backend.put(key, data)
+    except Exception:
+        logger.warning("Failed to store %s in the remote cache", key, exc_info=True)
+
+
+def store_async(
+    backend: Backend,
+    key: str,
+    fonts: Mapping[str, bytes],
+    sizes_before: Mapping[str, int],
+) -> concurrent.futures.Future:
+    """Uploads a subset to a remote cache in the background.
+
+    Pending uploads are completed before the interpreter exits; use
+    :func:`wait_for_uploads` to wait for them explicitly. Failures are logged
+    rather than raised.
+    """
+    global _upload_executor
+
+    data = _pack(fonts, sizes_before)
+    with _upload_lock:
+        if _upload_executor is None:
+            _upload_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1),
+                thread_name_prefix="fa_subset_upload",
+            )
+        future = _upload_executor.submit(_upload, backend, key, data)
+        _upload_futures.add(future)
+    future.add_done_callback(_upload_futures.discard)
+    return future
+
+
+def wait_for_uploads() -> None:
+    """Blocks until all uploads started by :func:`store_async` have finished."""
+    with _upload_lock:
+        futures = list(_upload_futures)
+    concurrent.futures.wait(futures)
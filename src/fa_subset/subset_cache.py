@@ -0,0 +1,121 @@
+import hashlib
+import json
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import Any, Final
+
+import fontTools  # type: ignore
+
+from . import cache
+
+# Bump this whenever the layout of the cache or the way subsets are generated
+# changes in a way that should invalidate existing entries.
+CACHE_FORMAT: Final[int] = 2
+
+_SIZES_FILE: Final[str] = "sizes.json"
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def subset_key(
+    input_fonts: Iterable[Path],
+    codepoints: Iterable[str],
+    flavors: Iterable[str],
+    **options: Any,
+) -> str:
+    """Calculates the cache key for a subset font.
+
+    The key depends on the contents (not the location) of the input fonts, so
+    the same release extracted into different directories shares entries.
+
+    :param options:
+        Any other JSON-serializable settings that affect the generated fonts.
+    """
+    key_data = {
+        "format": CACHE_FORMAT,
+        "fonttools": fontTools.version,
+        "fonts": [(path.name, _file_digest(path)) for path in input_fonts],
+        "codepoints": sorted({codepoint.lower() for codepoint in codepoints}),
+        "flavors": sorted(set(flavors)),
+        "options": options,
+    }
+    key_json = json.dumps(key_data, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(key_json).hexdigest()
+
+
+def load(
+    cache_dir: Path, key: str, flavors: Sequence[str]
+) -> tuple[Mapping[str, bytes], Mapping[str, int]] | None:
+    """Loads a cached subset.
+
+    :return:
+        Returns a tuple of the font data and unoptimized font sizes for each
+        flavor, or ``None`` if any of ``flavors`` is not in the cache.
+    """
+    entry_dir = cache_dir / key
+    try:
+        fonts = {flavor: (entry_dir / flavor).read_bytes() for flavor in flavors}
+        sizes_before = json.loads((entry_dir / _SIZES_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+    cache.touch(entry_dir)
+    return fonts, sizes_before
+
+
+def _publish(
+    entry_dir: Path, fonts: Mapping[str, bytes], sizes_before: Mapping[str, int]
+) -> None:
+    # Must be called with the entry locked.
+    if entry_dir.exists():
+        return
+
+    with cache.staging_dir(entry_dir) as staging:
+        for flavor, data in fonts.items():
+            (staging / flavor).write_bytes(data)
+        (staging / _SIZES_FILE).write_text(json.dumps(sizes_before))
+
+
+def store(
+    cache_dir: Path,
+    key: str,
+    fonts: Mapping[str, bytes],
+    sizes_before: Mapping[str, int],
+) -> None:
+    """Stores a subset in the cache, unless it is already there.
+
+    The entry is published atomically, so concurrent calls to :func:`load`
+    never see a partially written entry.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with cache.lock(cache_dir / key):
+        _publish(cache_dir / key, fonts, sizes_before)
+
+
+def load_or_build(
+    cache_dir: Path,
+    key: str,
+    flavors: Sequence[str],
+    build: Callable[[], tuple[Mapping[str, bytes], Mapping[str, int]]],
+) -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+    """Loads a subset from the cache, calling ``build`` to create it if needed.
+
+    Concurrent calls with the same key (in this or other processes) wait for
+    the first one to finish, rather than all building the same subset.
+    """
+    cached = load(cache_dir, key, flavors)
+    if cached is not None:
+        return cached
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with cache.lock(cache_dir / key):
+        cached = load(cache_dir, key, flavors)
+        if cached is not None:
+            return cached
+
+        fonts, sizes_before = build()
+        _publish(cache_dir / key, fonts, sizes_before)
+
+    return fonts, sizes_before
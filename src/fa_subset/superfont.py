@@ -0,0 +1,147 @@
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Final
+
+import fontTools  # type: ignore
+import fontTools.merge  # type: ignore
+import fontTools.ttLib  # type: ignore
+
+from . import cache
+
+# Superfonts are stored inside the extracted release, like the icon index, so
+# they are evicted from the cache along with it.
+SUPERFONT_DIR: Final[str] = "fa_subset_superfonts"
+
+# Bump this whenever the way superfonts are built changes.
+SUPERFONT_FORMAT: Final[int] = 1
+
+_FONT_FILE: Final[str] = "superfont.ttf"
+_CMAPS_FILE: Final[str] = "cmaps.json"
+
+
+@dataclasses.dataclass(frozen=True)
+class Superfont:
+    """Every glyph of a set of input fonts, merged into one font once so that
+    builds only need to subset a single font.
+
+    The superfont's own character map maps each codepoint to the glyph from
+    the first input font that has it; ``cmaps`` records where every input
+    font's glyphs ended up, so that a build can pick another font's glyph.
+    """
+
+    path: Path
+    # Maps the file name of each input font to its character map, as
+    # codepoint -> glyph ID in the superfont.
+    cmaps: Mapping[str, Mapping[int, int]]
+
+
+def available(input_fonts: Sequence[Path]) -> Sequence[Path]:
+    """Returns the fonts of ``input_fonts`` that the release has, which are
+    the ones to merge into its superfont.
+
+    For example, releases before 6 have no v4 compatibility font.
+    """
+    return [font_in for font_in in input_fonts if font_in.exists()]
+
+
+def _entry_dir(fa_dir: Path, input_fonts: Sequence[Path]) -> Path:
+    key_data = {
+        "format": SUPERFONT_FORMAT,
+        "fonttools": fontTools.version,
+        # Like the icon index, trust the size and modification time rather
+        # than hashing every font on every build.
+        "fonts": [
+            (path.name, path.stat().st_size, path.stat().st_mtime_ns)
+            for path in input_fonts
+        ],
+    }
+    key_json = json.dumps(key_data, sort_keys=True).encode("utf-8")
+    return fa_dir / SUPERFONT_DIR / hashlib.sha256(key_json).hexdigest()
+
+
+def _load(entry_dir: Path) -> Superfont | None:
+    try:
+        cmaps = json.loads((entry_dir / _CMAPS_FILE).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+    return Superfont(
+        path=entry_dir / _FONT_FILE,
+        cmaps={
+            name: {int(cp, 16): gid for cp, gid in cmap.items()}
+            for name, cmap in cmaps.items()
+        },
+    )
+
+
+def load(fa_dir: Path, input_fonts: Sequence[Path]) -> Superfont | None:
+    """Loads the superfont of ``input_fonts``, if it has been built."""
+    return _load(_entry_dir(fa_dir, input_fonts))
+
+
+def _merge(input_fonts: Sequence[Path], out_dir: Path) -> None:
+    cmaps: dict[str, dict[str, int]] = {}
+    claimed: set[int] = set()
+    offset = 0
+    with tempfile.TemporaryDirectory() as tdir_s:
+        tdir = Path(tdir_s)
+        font_files = []
+        for i, font_in in enumerate(input_fonts):
+            with fontTools.ttLib.TTFont(font_in) as font:
+                glyph_ids = font.getReverseGlyphMap()
+                cmap = font.getBestCmap()
+                # The merged font keeps every glyph of every input font, in
+                # order, so glyph IDs are just offset.
+                cmaps[font_in.name] = {
+                    f"{cp:x}": offset + glyph_ids[glyph] for cp, glyph in cmap.items()
+                }
+                offset += len(font.getGlyphOrder())
+
+                # Leave codepoints an earlier font already has out of this
+                # font's character map. Otherwise the merger adds `locl`
+                # substitutions between the duplicates, which would drag the
+                # glyphs of every style into each subset.
+                for table in font["cmap"].tables:
+                    if table.isUnicode():
+                        for cp in claimed.intersection(table.cmap):
+                            del table.cmap[cp]
+                claimed.update(cmap)
+
+                font_file = tdir / f"{i}.ttf"
+                font.flavor = None
+                font.save(font_file)
+            font_files.append(os.fspath(font_file))
+
+        with fontTools.merge.Merger().merge(font_files) as merged:
+            assert len(merged.getGlyphOrder()) == offset
+            merged.save(out_dir / _FONT_FILE)
+
+    (out_dir / _CMAPS_FILE).write_text(json.dumps(cmaps))
+
+
+def ensure(fa_dir: Path, input_fonts: Sequence[Path]) -> Superfont:
+    """Loads the superfont of ``input_fonts``, building and storing it in
+    ``fa_dir`` if needed.
+
+    Concurrent calls (in this or other processes) wait for the first one to
+    build it.
+    """
+    entry_dir = _entry_dir(fa_dir, input_fonts)
+    superfont = _load(entry_dir)
+    if superfont is not None:
+        return superfont
+
+    entry_dir.parent.mkdir(parents=True, exist_ok=True)
+    with cache.lock(entry_dir):
+        if not entry_dir.exists():
+            with cache.staging_dir(entry_dir) as staging:
+                _merge(input_fonts, staging)
+
+    superfont = _load(entry_dir)
+    assert superfont is not None
+    return superfont
@@ -1,11 +1,40 @@
 import zipfile
 from pathlib import Path
 
+from . import cache
+
+
+def verify(source: Path) -> None:
+    """Checks that ``source`` is an intact Font Awesome release zip.
+
+    :raises ValueError:
+        Raised if any member of the zip is corrupt, or it doesn't contain the
+        CSS and fonts we need.
+    """
+    try:
+        with zipfile.ZipFile(source, "r") as zf:
+            bad_member = zf.testzip()
+            names = zf.namelist()
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"{source} is not a valid zip file") from e
+
+    if bad_member is not None:
+        raise ValueError(f"{source} is corrupt: bad CRC for {bad_member}")
+
+    if not any(name.endswith("/css/all.css") for name in names) or not any(
+        "/webfonts/" in name for name in names
+    ):
+        raise ValueError(f"{source} does not look like a Font Awesome release")
+
 
 def unzip(source: Path) -> Path:
     fa_dir: Path = source.with_suffix("")
     if not fa_dir.exists():
-        with zipfile.ZipFile(source, "r") as zf:
-            fa_dir.mkdir()
-            zf.extractall(fa_dir)
+        with cache.lock(fa_dir):
+            if not fa_dir.exists():
+                # Extract to a staging directory first, so that concurrent
+                # processes never see a partially extracted release.
+                with zipfile.ZipFile(source, "r") as zf:
+                    with cache.staging_dir(fa_dir) as staging:
+                        zf.extractall(staging)
     return fa_dir
@@ -1,9 +1,13 @@
+import http.server
 import shutil
-from collections.abc import Iterable
+import threading
+from collections.abc import Iterable, MutableMapping
 from pathlib import Path
 
 import pytest
 
+from fa_subset import cache, zip_extractor
+
 DATA_DIR = Path(__file__).parent / "data"
 
 
@@ -18,3 +22,75 @@ def tmp_fa_zip(tmp_path: Path, fa_zip: Path) -> Iterable[Path]:
 
     shutil.copyfile(fa_zip, out_file)
     yield out_file
+
+
+@pytest.fixture(scope="module")
+def fa_dir(tmp_path_factory, fa_zip: Path) -> Iterable[Path]:
+    tmp_path: Path = tmp_path_factory.mktemp("fa_dir")
+
+    tmp_fa_zip = tmp_path / fa_zip.name
+    shutil.copy(fa_zip, tmp_fa_zip)
+    yield zip_extractor.unzip(tmp_fa_zip)
+
+
+@pytest.fixture
+def tmp_fa_dir(tmp_fa_zip: Path) -> Path:
+    # A release of its own, for tests that write into it.
+    return zip_extractor.unzip(tmp_fa_zip)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch) -> Path:
+    # Keep tests from reading or polluting the user's cache.
+    cache_dir: Path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(cache_dir))
+    return cache_dir
+
+
+class FakeServer:
+    """A local stand-in for a web server, serving files from ``self.files``."""
+
+    def __init__(self) -> None:
+        self.files: MutableMapping[str, bytes] = {}
+        self.requests: list[tuple[str, str]] = []
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests.append(("GET", self.path))
+                data = server.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_PUT(self) -> None:
+                server.requests.append(("PUT", self.path))
+                length = int(self.headers["Content-Length"])
+                server.files[self.path] = self.rfile.read(length)
+                self.send_response(201)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def fake_server() -> Iterable[FakeServer]:
+    server = FakeServer()
+    yield server
+    server.close()
@@ -0,0 +1,66 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from fa_subset import archive
+
+FILES = {Path("css/a.css"): b"a {}", Path("fonts/a.woff2"): b"\x00\x01"}
+
+
+class _Unseekable(io.BytesIO):
+    def seekable(self) -> bool:
+        return False
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("seek")
+
+    def tell(self):
+        raise io.UnsupportedOperation("tell")
+
+
+def test_tar() -> None:
+    stream = _Unseekable()
+    with archive.open_archive(stream, "tar", mtime=1700000000) as add:
+        for path, data in FILES.items():
+            add(path, data)
+
+    with tarfile.open(fileobj=io.BytesIO(stream.getvalue())) as tf:
+        assert tf.getnames() == ["css/a.css", "fonts/a.woff2"]
+        for path, data in FILES.items():
+            member = tf.getmember(path.as_posix())
+            assert member.mtime == 1700000000
+            assert tf.extractfile(member).read() == data
+
+
+def test_zip() -> None:
+    stream = _Unseekable()
+    with archive.open_archive(stream, "zip", mtime=0) as add:
+        for path, data in FILES.items():
+            add(path, data)
+
+    with zipfile.ZipFile(io.BytesIO(stream.getvalue())) as zf:
+        assert zf.namelist() == ["css/a.css", "fonts/a.woff2"]
+        for path, data in FILES.items():
+            info = zf.getinfo(path.as_posix())
+            assert info.date_time == (1980, 1, 1, 0, 0, 0)
+            assert zf.read(info) == data
+
+
+def test_reproducible() -> None:
+    archives = []
+    for _ in range(2):
+        stream = io.BytesIO()
+        with archive.open_archive(stream, "tar", mtime=0) as add:
+            for path, data in FILES.items():
+                add(path, data)
+        archives.append(stream.getvalue())
+    assert archives[0] == archives[1]
+
+
+def test_unknown_format() -> None:
+    with pytest.raises(ValueError, match="Unknown archive format: rar"):
+        with archive.open_archive(io.BytesIO(), "rar"):
+            pass
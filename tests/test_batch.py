@@ -0,0 +1,176 @@
+import sys
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from fa_subset import batch
+
+
+def _make_jobs(fa_dir: Path, tmp_path: Path) -> list[batch.BatchJob]:
+    jobs = []
+    for name, glyphs in (
+        ("a", ["user"]),
+        ("b", ["user", "rss"]),
+        ("c", ["github", "arrow-right"]),
+    ):
+        out_dir = tmp_path / name
+        out_dir.mkdir()
+        jobs.append(
+            batch.BatchJob(
+                fa_dir=fa_dir,
+                css_out=out_dir / "fontawesome-subset.css",
+                font_out=out_dir / "fontawesome-subset",
+                glyphs=glyphs,
+                options={"output_font_flavors": ["woff2"]},
+            )
+        )
+    return jobs
+
+
+@pytest.mark.parametrize("isolate", (False, True))
+def test_run(fa_dir: Path, tmp_path: Path, isolate: bool) -> None:
+    jobs = _make_jobs(fa_dir, tmp_path)
+
+    results = list(batch.run(jobs, isolate=isolate))
+
+    assert len(results) == len(jobs)
+    for job, outputs in zip(jobs, results):
+        assert outputs == {
+            "fontawesome-subset.woff2": job.font_out.with_suffix(".woff2"),
+            "fontawesome-subset.css": job.css_out,
+        }
+        for path in outputs.values():
+            assert path.exists()
+
+
+@pytest.mark.parametrize("rss, expected_calls", ((100, 0), (2000, 3), (None, 3)))
+def test_run_memory_budget(
+    fa_dir: Path, tmp_path: Path, rss: int | None, expected_calls: int
+) -> None:
+    jobs = _make_jobs(fa_dir, tmp_path)
+
+    with (
+        mock.patch.object(batch, "current_rss", return_value=rss),
+        mock.patch.object(batch, "release_caches") as release_caches,
+    ):
+        list(batch.run(jobs, memory_budget=1000))
+
+    assert release_caches.call_count == expected_calls
+
+
+def test_run_isolated_recycles_workers(fa_dir: Path, tmp_path: Path) -> None:
+    jobs = _make_jobs(fa_dir, tmp_path)
+
+    with mock.patch.object(batch, "_Worker", wraps=batch._Worker) as worker:
+        list(batch.run(jobs, memory_budget=1, isolate=True))
+    assert worker.call_count == len(jobs)
+
+    with mock.patch.object(batch, "_Worker", wraps=batch._Worker) as worker:
+        list(batch.run(jobs, isolate=True))
+    assert worker.call_count == 1
+
+
+@pytest.mark.parametrize("isolate", (False, True))
+def test_run_error(fa_dir: Path, tmp_path: Path, isolate: bool) -> None:
+    jobs = _make_jobs(fa_dir, tmp_path)
+    jobs[1] = batch.BatchJob(
+        fa_dir=fa_dir,
+        css_out=jobs[1].css_out,
+        font_out=jobs[1].font_out,
+        glyphs=["not-an-icon"],
+    )
+
+    results = batch.run(jobs, isolate=isolate)
+    assert next(results)
+    with pytest.raises(ValueError, match="Unknown icon: not-an-icon"):
+        next(results)
+
+
+def test_shared_glyphs(fa_dir: Path, tmp_path: Path) -> None:
+    jobs = [
+        batch.BatchJob(fa_dir, tmp_path / "a.css", tmp_path / "a", glyphs)
+        for glyphs in (
+            ["user", "home", "github"],
+            ["house", "user", "rss"],
+            ["regular:user", "github", "arrow-left"],
+            ["regular:user", "star"],
+        )
+    ]
+
+    # Aliases count towards their icon, and only one style of each icon is
+    # shared.
+    assert batch.shared_glyphs(jobs) == ["user", "house", "github"]
+    assert batch.shared_glyphs(jobs, min_share=0.75) == []
+    assert batch.shared_glyphs(jobs[:1], min_share=0.0) == []
+
+
+def test_shared_glyphs_different_releases(fa_dir: Path, tmp_path: Path) -> None:
+    jobs = [
+        batch.BatchJob(fa_dir, tmp_path / "a.css", tmp_path / "a", ["user"]),
+        batch.BatchJob(tmp_path, tmp_path / "b.css", tmp_path / "b", ["user"]),
+    ]
+
+    with pytest.raises(ValueError, match="same release"):
+        batch.shared_glyphs(jobs)
+
+
+def test_run_shared(fa_dir: Path, tmp_path: Path) -> None:
+    jobs = _make_jobs(fa_dir, tmp_path)
+    core_dir = tmp_path / "core"
+    core_dir.mkdir()
+
+    core, results = batch.run_shared(
+        jobs,
+        core_dir / "fontawesome-core",
+        "https://static.example.com/fa",
+        core_options={"output_font_flavors": ["woff2"]},
+    )
+
+    assert core is not None
+    assert core.codepoints == {"user": "f007"}
+    assert (core_dir / "fontawesome-core.woff2").exists()
+    a, b, c = list(results)
+    # Every icon of the first job is in the core font.
+    assert a == {"fontawesome-subset.css": jobs[0].css_out}
+    assert b == {
+        "fontawesome-subset.woff2": jobs[1].font_out.with_suffix(".woff2"),
+        "fontawesome-subset.css": jobs[1].css_out,
+    }
+    # The last job has none of the core font's icons.
+    assert c == {
+        "fontawesome-subset.woff2": jobs[2].font_out.with_suffix(".woff2"),
+        "fontawesome-subset.css": jobs[2].css_out,
+    }
+    core_url = "https://static.example.com/fa/fontawesome-core.woff2"
+    assert core_url in jobs[0].css_out.read_text()
+    assert core_url in jobs[1].css_out.read_text()
+    assert core_url in jobs[2].css_out.read_text()
+
+
+def test_run_shared_nothing_in_common(fa_dir: Path, tmp_path: Path) -> None:
+    jobs = _make_jobs(fa_dir, tmp_path)
+
+    core, results = batch.run_shared(
+        jobs, tmp_path / "fontawesome-core", "/fa", min_share=1.0
+    )
+
+    assert core is None
+    assert len(list(results)) == len(jobs)
+    assert not list(tmp_path.glob("fontawesome-core.*"))
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="RSS is only known on Linux")
+def test_current_rss() -> None:
+    rss = batch.current_rss()
+    assert rss is not None and rss > 0
+
+
+def test_measure_growth(fa_dir: Path, tmp_path: Path) -> None:
+    job, *_ = _make_jobs(fa_dir, tmp_path)
+
+    calls = batch.measure_growth(job, 12)
+
+    assert [call.call for call in calls] == list(range(12))
+    # Once warmed up, repeated calls must not keep accumulating memory.
+    assert sum(call.traced_growth for call in calls[6:]) < 64 * 1024
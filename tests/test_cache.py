@@ -0,0 +1,240 @@
+import os
+import stat
+import sys
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+import pytest
+
+from fa_subset import cache
+
+
+def _umask() -> int:
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def _make_entry(
+    cache_dir: Path, area: str, name: str, size: int, age: float
+) -> Sequence[Path]:
+    area_dir = cache_dir / area
+    area_dir.mkdir(parents=True, exist_ok=True)
+
+    zip_path = area_dir / f"{name}.zip"
+    zip_path.write_bytes(b"\0" * size)
+    extracted = area_dir / name
+    extracted.mkdir()
+    (extracted / "all.css").write_bytes(b"\0" * size)
+
+    timestamp = time.time() - age
+    for path in (zip_path, extracted):
+        os.utime(path, (timestamp, timestamp))
+    return zip_path, extracted
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    (
+        ("1024", 1024),
+        ("2K", 2048),
+        ("1.5M", 1536 * 1024),
+        ("2G", 2 * 1024**3),
+        ("3GiB", 3 * 1024**3),
+        ("10kb", 10240),
+    ),
+)
+def test_parse_size(size: str, expected: int) -> None:
+    assert cache.parse_size(size) == expected
+
+
+@pytest.mark.parametrize("size", ("", "G", "-1M", "12Q"))
+def test_parse_size_invalid(size: str) -> None:
+    with pytest.raises(ValueError):
+        cache.parse_size(size)
+
+
+def test_default_cache_dir(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path / "override"))
+    assert cache.default_cache_dir() == tmp_path / "override"
+
+    monkeypatch.delenv(cache.CACHE_DIR_ENV)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert cache.default_cache_dir() == tmp_path / "xdg" / "fa-subset"
+
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    assert cache.default_cache_dir() == Path.home() / ".cache" / "fa-subset"
+
+
+def test_configured_limits(monkeypatch) -> None:
+    monkeypatch.delenv(cache.MAX_SIZE_ENV, raising=False)
+    monkeypatch.delenv(cache.MAX_AGE_ENV, raising=False)
+    assert cache.configured_limits() == (
+        cache.DEFAULT_MAX_SIZE,
+        cache.DEFAULT_MAX_AGE_DAYS * 86400,
+    )
+
+    monkeypatch.setenv(cache.MAX_SIZE_ENV, "5M")
+    monkeypatch.setenv(cache.MAX_AGE_ENV, "2")
+    assert cache.configured_limits() == (5 * 1024**2, 2 * 86400)
+
+
+def test_entries(tmp_path: Path) -> None:
+    _make_entry(tmp_path, cache.RELEASES, "fontawesome-free-6.2.1-web", 100, 10)
+    _make_entry(tmp_path, cache.RELEASES, "fontawesome-free-6.2.0-web", 100, 20)
+    _make_entry(tmp_path, cache.SUBSETS, "0123abcd", 50, 5)
+
+    entries = cache.entries(tmp_path)
+
+    assert [(entry.area, entry.name) for entry in entries] == [
+        (cache.RELEASES, "fontawesome-free-6.2.0-web"),
+        (cache.RELEASES, "fontawesome-free-6.2.1-web"),
+        (cache.SUBSETS, "0123abcd"),
+    ]
+    assert [entry.size for entry in entries] == [200, 200, 100]
+    assert all(len(entry.paths) == 2 for entry in entries)
+
+
+def test_prune_max_age(tmp_path: Path) -> None:
+    old = _make_entry(tmp_path, cache.RELEASES, "old", 10, 100)
+    new = _make_entry(tmp_path, cache.RELEASES, "new", 10, 1)
+
+    removed = cache.prune(tmp_path, max_age=50)
+
+    assert [entry.name for entry in removed] == ["old"]
+    assert not any(path.exists() for path in old)
+    assert all(path.exists() for path in new)
+
+
+def test_prune_max_size(tmp_path: Path) -> None:
+    _make_entry(tmp_path, cache.RELEASES, "oldest", 100, 30)
+    _make_entry(tmp_path, cache.RELEASES, "older", 100, 20)
+    _make_entry(tmp_path, cache.SUBSETS, "newest", 100, 10)
+
+    removed = cache.prune(tmp_path, max_size=450)
+
+    assert [entry.name for entry in removed] == ["oldest"]
+    assert [entry.name for entry in cache.entries(tmp_path)] == ["older", "newest"]
+
+
+def test_prune_keep(tmp_path: Path) -> None:
+    oldest = _make_entry(tmp_path, cache.RELEASES, "oldest", 100, 30)
+    _make_entry(tmp_path, cache.RELEASES, "older", 100, 20)
+
+    removed = cache.prune(tmp_path, max_size=0, max_age=0, keep=[oldest[1]])
+
+    assert [entry.name for entry in removed] == ["older"]
+    assert [entry.name for entry in cache.entries(tmp_path)] == ["oldest"]
+
+
+def test_prune_if_due(tmp_path: Path) -> None:
+    _make_entry(tmp_path, cache.RELEASES, "a", 10, 20)
+    _make_entry(tmp_path, cache.RELEASES, "b", 10, 30)
+
+    removed = cache.prune_if_due(tmp_path, max_age=25)
+    assert [entry.name for entry in removed] == ["b"]
+
+    # Pruned too recently
+    removed = cache.prune_if_due(tmp_path, max_age=0)
+    assert removed == []
+    assert [entry.name for entry in cache.entries(tmp_path)] == ["a"]
+
+    removed = cache.prune_if_due(tmp_path, max_age=0, interval=0)
+    assert [entry.name for entry in removed] == ["a"]
+
+
+def test_prune_if_due_no_cache(tmp_path: Path) -> None:
+    assert cache.prune_if_due(tmp_path / "missing", max_age=0) == []
+    assert not (tmp_path / "missing").exists()
+
+
+def test_touch(tmp_path: Path) -> None:
+    _make_entry(tmp_path, cache.RELEASES, "a", 10, 20)
+    b = _make_entry(tmp_path, cache.RELEASES, "b", 10, 30)
+    assert [entry.name for entry in cache.entries(tmp_path)] == ["b", "a"]
+
+    cache.touch(b[0])
+    cache.touch(tmp_path / "does-not-exist")
+
+    assert [entry.name for entry in cache.entries(tmp_path)] == ["a", "b"]
+    removed = cache.prune(tmp_path, max_size=20)
+    assert [entry.name for entry in removed] == ["a"]
+
+
+def test_clear(tmp_path: Path) -> None:
+    _make_entry(tmp_path, cache.RELEASES, "a", 10, 30)
+    _make_entry(tmp_path, cache.SUBSETS, "b", 10, 20)
+
+    removed = cache.clear(tmp_path)
+
+    assert {entry.name for entry in removed} == {"a", "b"}
+    assert cache.entries(tmp_path) == []
+
+
+def test_lock_exclusive(tmp_path: Path) -> None:
+    target = tmp_path / "entry"
+    with cache.lock(target) as acquired:
+        assert acquired
+        with cache.lock(target, blocking=False) as acquired_again:
+            assert not acquired_again
+
+    with cache.lock(target, blocking=False) as acquired:
+        assert acquired
+
+
+def test_remove_skips_entries_in_use(tmp_path: Path) -> None:
+    paths = _make_entry(tmp_path, cache.RELEASES, "in-use", 10, 100)
+
+    with cache.lock(paths[1], shared=True):
+        assert cache.prune(tmp_path, max_age=0) == []
+        assert cache.clear(tmp_path) == []
+    assert all(path.exists() for path in paths)
+
+    assert [entry.name for entry in cache.prune(tmp_path, max_age=0)] == ["in-use"]
+
+
+def test_staging_dir(tmp_path: Path) -> None:
+    target = tmp_path / "target"
+    with cache.staging_dir(target) as staging:
+        (staging / "file.txt").write_text("contents")
+        assert not target.exists()
+
+    assert (target / "file.txt").read_text() == "contents"
+    assert list(tmp_path.iterdir()) == [target]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Modes are POSIX only")
+def test_staging_dir_mode(tmp_path: Path) -> None:
+    target = tmp_path / "target"
+    with cache.staging_dir(target):
+        pass
+
+    assert stat.S_IMODE(target.stat().st_mode) == 0o777 & ~_umask()
+
+
+def test_staging_dir_failure(tmp_path: Path) -> None:
+    target = tmp_path / "target"
+    with pytest.raises(RuntimeError):
+        with cache.staging_dir(target) as staging:
+            (staging / "file.txt").write_text("contents")
+            raise RuntimeError("Failed!")
+
+    assert not any(tmp_path.iterdir())
+
+
+def test_write_atomic(tmp_path: Path) -> None:
+    target = tmp_path / "target.zip"
+    cache.write_atomic(target, b"Contents")
+    cache.write_atomic(target, b"New contents")
+
+    assert target.read_bytes() == b"New contents"
+    assert list(tmp_path.iterdir()) == [target]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Modes are POSIX only")
+def test_write_atomic_mode(tmp_path: Path) -> None:
+    target = tmp_path / "target.zip"
+    cache.write_atomic(target, b"Contents")
+
+    assert stat.S_IMODE(target.stat().st_mode) == 0o666 & ~_umask()
@@ -1,7 +1,14 @@
 import contextlib
+import io
+import json
 import os
+import re
+import tarfile
+import urllib.parse
+import zipfile
 from collections.abc import Iterable, MutableSequence, Sequence
 from pathlib import Path
+from typing import Any
 from unittest import mock
 
 import pytest
@@ -9,7 +16,7 @@ from click.testing import CliRunner
 
 import fa_subset
 from fa_subset import __main__ as famain
-from fa_subset import downloader
+from fa_subset import cache, downloader, icon_index, superfont
 
 
 def _get_latest_version() -> str:
@@ -160,7 +167,9 @@ def test_too_many_output_flags(flags: Sequence[str], tmp_path: Path) -> None:
         ("--font-awesome-version", downloader.LATEST_FA_VERSION),
     ),
 )
-def test_cli_download(flags: Sequence[str], tmp_path: Path, mocked_requests) -> None:
+def test_cli_download(
+    flags: Sequence[str], tmp_path: Path, cache_dir: Path, mocked_requests
+) -> None:
     expected_output = tmp_path / "fontawesome-subset"
     expected_css_out = expected_output / "css" / "fontawesome-subset.css"
     expected_fonts = {
@@ -171,16 +180,13 @@ def test_cli_download(flags: Sequence[str], tmp_path: Path, mocked_requests) ->
     glyph_path = tmp_path / "glyphs.txt"
     glyph_path.write_text("user\nrss\ngithub")
 
-    with mock.patch.object(famain.tempfile, "gettempdir") as gettempdir_p:
-        fake_temp_dir = tmp_path / "fake_temp_dir"
-        gettempdir_p.return_value = os.fspath(fake_temp_dir)
-        fake_temp_dir.mkdir()
-        with in_cwd(tmp_path):
-            runner = CliRunner()
-            result = runner.invoke(famain.main, (*flags, "-i", os.fspath(glyph_path)))
+    with in_cwd(tmp_path):
+        runner = CliRunner()
+        result = runner.invoke(famain.main, (*flags, "-i", os.fspath(glyph_path)))
 
     assert result.exit_code == 0
     mocked_requests.get.assert_called_once_with(_get_latest_version())
+    assert (cache_dir / "fa_subset_fa" / Path(_get_latest_version()).name).exists()
 
     for file in {expected_css_out} | expected_fonts:
         assert file.exists()
@@ -212,3 +218,665 @@ def test_version():
 
     assert result.exit_code == 0
     assert result.output == fa_subset.__version__ + "\n"
+
+
+def test_cli_optimize_size(mocked_requests, tmp_path: Path) -> None:
+    expected_output = tmp_path / "fontawesome-subset"
+    expected_output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", os.fspath(expected_output), "--optimize", "size"),
+        input="user\nrss\ngithub",
+    )
+
+    assert result.exit_code == 0
+    for flavor in ("woff", "woff2"):
+        font_file = expected_output / "fonts" / f"fontawesome-subset.{flavor}"
+        assert f"{flavor}: " in result.output
+        assert f"-> {os.path.getsize(font_file)} bytes" in result.output
+
+
+def test_cli_profile_dev(mocked_requests, tmp_path: Path, cache_dir: Path) -> None:
+    expected_output = tmp_path / "fontawesome-subset"
+    expected_output.mkdir()
+
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", os.fspath(expected_output), "--profile", "dev"),
+        input="user\nrss\ngithub",
+    )
+
+    assert result.exit_code == 0
+    fonts = {path.name for path in (expected_output / "fonts").iterdir()}
+    assert fonts == {"fontawesome-subset.ttf"}
+    assert any((cache_dir / "subsets").iterdir())
+
+
+def test_cli_invalid_source_date_epoch(
+    mocked_requests, tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "yesterday")
+    runner = CliRunner()
+    result = runner.invoke(famain.main, ("--output", os.fspath(tmp_path)), input="user")
+
+    assert result.exit_code == 1
+    assert result.output == "SOURCE_DATE_EPOCH must be an integer, not 'yesterday'\n"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cli_fingerprint(mocked_requests, tmp_path: Path) -> None:
+    expected_output = tmp_path / "fontawesome-subset"
+    expected_output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", os.fspath(expected_output), "--fingerprint"),
+        input="user\nrss\ngithub",
+    )
+
+    assert result.exit_code == 0
+    manifest = json.loads((expected_output / "manifest.json").read_text())
+    assert set(manifest) == {
+        "fontawesome-subset.css",
+        "fontawesome-subset.woff",
+        "fontawesome-subset.woff2",
+    }
+    for logical_name, file_name in manifest.items():
+        assert (expected_output / file_name).exists()
+        assert file_name != logical_name
+
+
+def test_cli_separate_outputs(mocked_requests, tmp_path: Path) -> None:
+    css_output = tmp_path / "css"
+    css_output.mkdir()
+    font_output = tmp_path / "fonts"
+    font_output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        (
+            "--css-output",
+            os.fspath(css_output),
+            "--font-output",
+            os.fspath(font_output),
+            "--fingerprint",
+        ),
+        input="user\nrss\ngithub",
+    )
+
+    assert result.exit_code == 0
+    manifest = json.loads((css_output / "manifest.json").read_text())
+    assert manifest["fontawesome-subset.woff2"].startswith("../fonts/")
+    for file_name in manifest.values():
+        assert (css_output / file_name).exists()
+
+
+@pytest.mark.parametrize("archive_format", ["tar", "zip"])
+def test_cli_stream_output(
+    mocked_requests, tmp_path: Path, archive_format: str
+) -> None:
+    runner = CliRunner()
+    with in_cwd(tmp_path):
+        result = runner.invoke(
+            famain.main,
+            ("--output", "-", "--archive-format", archive_format, "--fingerprint"),
+            input="user\nrss\ngithub",
+        )
+
+    assert result.exit_code == 0, result.output
+    assert list(tmp_path.iterdir()) == []
+    stream = io.BytesIO(result.stdout_bytes)
+    if archive_format == "tar":
+        with tarfile.open(fileobj=stream) as tf:
+            files = {name: tf.extractfile(name).read() for name in tf.getnames()}
+    else:
+        with zipfile.ZipFile(stream) as zf:
+            files = {name: zf.read(name) for name in zf.namelist()}
+
+    manifest = json.loads(files.pop("manifest.json"))
+    assert set(manifest) == {
+        "fontawesome-subset.css",
+        "fontawesome-subset.woff",
+        "fontawesome-subset.woff2",
+    }
+    assert set(manifest.values()) == set(files)
+    assert manifest["fontawesome-subset.css"].startswith("css/")
+    assert manifest["fontawesome-subset.woff2"].startswith("fonts/")
+    css = files[manifest["fontawesome-subset.css"]].decode("utf-8")
+    assert "../" + manifest["fontawesome-subset.woff2"] in css
+
+
+def test_cli_stream_output_depfile(mocked_requests, tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", "-", "--depfile", os.fspath(tmp_path / "out.d")),
+        input="user",
+    )
+
+    assert result.exit_code == 1
+    assert "--output -" in result.stderr
+    assert not (tmp_path / "out.d").exists()
+
+
+@pytest.mark.parametrize(
+    ("glyphs", "message"),
+    (
+        ("bogus:user", "Unknown style: bogus"),
+        ("solid:user\nregular:user", "Icon requested in more than one style: user"),
+        ("brands:user", "No glyph for U+F007 in the brands style"),
+    ),
+)
+def test_cli_style_errors(
+    tmp_fa_zip: Path, tmp_path: Path, glyphs: str, message: str
+) -> None:
+    output = tmp_path / "out"
+    output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--font-awesome", os.fspath(tmp_fa_zip), "--output", os.fspath(output)),
+        input=glyphs,
+    )
+
+    assert result.exit_code == 1
+    assert result.stderr == f"{message}\n"
+    assert not list(output.iterdir())
+
+
+def test_cli_stream_output_unknown_icons(tmp_fa_zip: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--font-awesome", os.fspath(tmp_fa_zip), "--output", "-"),
+        input="usr\nuser",
+    )
+
+    assert result.exit_code == 1
+    assert result.stderr == "Unknown icon: usr (did you mean: user?)\n"
+    # Errors never end up in the archive.
+    assert result.stdout_bytes == b""
+
+
+def test_cli_depfile(tmp_fa_zip: Path, tmp_path: Path) -> None:
+    expected_output = tmp_path / "fontawesome-subset"
+    expected_output.mkdir()
+    glyph_path = tmp_path / "glyphs.txt"
+    glyph_path.write_text("user\nrss\ngithub")
+    depfile = tmp_path / "fa-subset.d"
+
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        (
+            "--font-awesome",
+            os.fspath(tmp_fa_zip),
+            "--output",
+            os.fspath(expected_output),
+            "--depfile",
+            os.fspath(depfile),
+            "-i",
+            os.fspath(glyph_path),
+        ),
+    )
+
+    assert result.exit_code == 0
+    rule = depfile.read_text().split("\n\n")[0]
+    targets, prerequisites = rule.replace("\\\n", "").split(":")
+    assert set(targets.split()) == {
+        os.fspath(expected_output / "css" / "fontawesome-subset.css"),
+        os.fspath(expected_output / "fonts" / "fontawesome-subset.woff"),
+        os.fspath(expected_output / "fonts" / "fontawesome-subset.woff2"),
+    }
+
+    prerequisites_paths = [Path(path) for path in prerequisites.split()]
+    assert prerequisites_paths[0] == glyph_path
+    assert {path.name for path in prerequisites_paths[1:]} == {
+        "all.css",
+        "icons.json",
+        "shims.json",
+        # None of the icons need the v4 compatibility font.
+        "fa-brands-400.ttf",
+        "fa-regular-400.ttf",
+        "fa-solid-900.ttf",
+    }
+    for path in prerequisites_paths:
+        assert path.exists()
+
+
+def test_cli_cache(mocked_requests, tmp_path: Path, cache_dir: Path) -> None:
+    expected_output = tmp_path / "fontawesome-subset"
+    expected_output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", os.fspath(expected_output), "--profile", "dev"),
+        input="user\nrss\ngithub",
+    )
+    assert result.exit_code == 0
+
+    result = runner.invoke(famain.main, ("cache", "list"))
+    assert result.exit_code == 0
+    assert "fa_subset_fa/fontawesome-free-6.2.1-web\t" in result.output
+    assert "subsets/" in result.output
+    # The release (including its superfont) and the subset; the subset is
+    # made from the superfont, so there are no intermediate subsets.
+    assert "2 entries" in result.output
+
+    result = runner.invoke(famain.main, ("cache", "prune", "--max-size", "1"))
+    assert result.exit_code == 0
+    assert "Removed 2 entries" in result.output
+
+    result = runner.invoke(famain.main, ("cache", "prune", "--max-size", "1Q"))
+    assert result.exit_code != 0
+    assert "--max-size" in result.output
+
+
+def test_cli_cache_clear(mocked_requests, tmp_path: Path, cache_dir: Path) -> None:
+    other_cache_dir = tmp_path / "other_cache"
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--cache-dir", os.fspath(other_cache_dir), "--output", os.fspath(tmp_path)),
+        input="user",
+    )
+    assert result.exit_code == 0
+    assert any(other_cache_dir.iterdir())
+    assert not any(cache_dir.iterdir())
+
+    result = runner.invoke(
+        famain.main, ("--cache-dir", os.fspath(other_cache_dir), "cache", "clear")
+    )
+    assert result.exit_code == 0
+    assert "Removed 1 entries" in result.output
+    assert not cache.entries(other_cache_dir)
+
+
+def test_cli_prunes_cache(
+    mocked_requests, tmp_path: Path, cache_dir: Path, monkeypatch
+) -> None:
+    stale = cache_dir / "subsets" / "stale"
+    stale.mkdir(parents=True)
+    os.utime(stale, (0, 0))
+    monkeypatch.setenv("FA_SUBSET_CACHE_MAX_SIZE", "1")
+
+    runner = CliRunner()
+    result = runner.invoke(famain.main, ("--output", os.fspath(tmp_path)), input="user")
+
+    assert result.exit_code == 0
+    assert not stale.exists()
+    # The release used by this run is kept, even though it's over the limit
+    assert (cache_dir / "fa_subset_fa" / "fontawesome-free-6.2.1-web").exists()
+
+    # The cache was just pruned, so the next run leaves it alone.
+    stale.mkdir()
+    os.utime(stale, (0, 0))
+    result = runner.invoke(famain.main, ("--output", os.fspath(tmp_path)), input="user")
+    assert result.exit_code == 0
+    assert stale.exists()
+
+
+@pytest.fixture
+def fake_releases(fake_server, fa_zip: Path) -> Iterable[Any]:
+    template = (
+        fake_server.url + "/releases/v{version}/fontawesome-free-{version}-web.zip"
+    )
+    for version in ("6.1.0", "6.2.0", "6.2.1"):
+        fake_server.files[
+            urllib.parse.urlparse(template.format(version=version)).path
+        ] = fa_zip.read_bytes()
+
+    with mock.patch.object(downloader, "FA_VERSION_TEMPLATE", template):
+        yield fake_server
+
+
+def test_cli_fetch(fake_releases, tmp_path: Path, cache_dir: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(famain.main, ("fetch", "6.1.0", "6.2.0", "6.2.1"))
+
+    assert result.exit_code == 0
+    assert len(fake_releases.requests) == 3
+    for version in ("6.1.0", "6.2.0", "6.2.1"):
+        fa_dir = cache_dir / "fa_subset_fa" / f"fontawesome-free-{version}-web"
+        assert f"{version}: {fa_dir}" in result.output
+        assert (fa_dir / icon_index.INDEX_FILE).exists()
+        assert (fa_dir / superfont.SUPERFONT_DIR).is_dir()
+
+    # Fetching again doesn't download anything
+    result = runner.invoke(famain.main, ("fetch", "6.2.0"))
+    assert result.exit_code == 0
+    assert len(fake_releases.requests) == 3
+
+    # Offline runs can use the fetched releases
+    result = runner.invoke(
+        famain.main,
+        (
+            "--offline",
+            "--font-awesome-version",
+            "6.2.0",
+            "--output",
+            os.fspath(tmp_path),
+        ),
+        input="user\nrss\ngithub",
+    )
+    assert result.exit_code == 0
+    assert (tmp_path / "fonts" / "fontawesome-subset.woff2").exists()
+    assert len(fake_releases.requests) == 3
+
+
+def test_cli_fetch_without_v4compat(
+    fake_releases, fa_zip: Path, tmp_path: Path, cache_dir: Path
+) -> None:
+    # Like releases before 6, which have no v4 compatibility font.
+    release = io.BytesIO()
+    with zipfile.ZipFile(fa_zip) as zf_in, zipfile.ZipFile(release, "w") as zf_out:
+        for info in zf_in.infolist():
+            if "fa-v4compatibility" not in info.filename:
+                zf_out.writestr(info, zf_in.read(info))
+    fake_releases.files["/releases/v5.15.4/fontawesome-free-5.15.4-web.zip"] = (
+        release.getvalue()
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(famain.main, ("fetch", "5.15.4"))
+
+    assert result.exit_code == 0, result.output
+    fa_dir = cache_dir / "fa_subset_fa" / "fontawesome-free-5.15.4-web"
+    assert f"5.15.4: {fa_dir}" in result.output
+    assert (fa_dir / icon_index.INDEX_FILE).exists()
+    assert (fa_dir / superfont.SUPERFONT_DIR).is_dir()
+
+    # Builds use the superfont of the fonts the release has.
+    output = tmp_path / "output"
+    output.mkdir()
+    with mock.patch.object(superfont, "_merge") as merge:
+        result = runner.invoke(
+            famain.main,
+            (
+                "--offline",
+                "--font-awesome-version",
+                "5.15.4",
+                "--output",
+                os.fspath(output),
+            ),
+            input="user\nrss\ngithub",
+        )
+    assert result.exit_code == 0, result.output
+    merge.assert_not_called()
+    assert (output / "fonts" / "fontawesome-subset.woff2").exists()
+
+
+def test_cli_fetch_new_cache_dir(fake_releases, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "new" / "cache"
+
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main, ("--cache-dir", os.fspath(cache_dir), "fetch", "6.2.1")
+    )
+
+    assert result.exit_code == 0, result.output
+    assert (cache_dir / "fa_subset_fa" / "fontawesome-free-6.2.1-web").is_dir()
+
+
+def test_cli_fetch_failure(fake_releases, cache_dir: Path) -> None:
+    fake_releases.files["/releases/v6.0.0/fontawesome-free-6.0.0-web.zip"] = (
+        b"Not a zip file"
+    )
+
+    runner = CliRunner()
+    result = runner.invoke(famain.main, ("fetch", "6.0.0", "5.15.4", "6.2.1"))
+
+    assert result.exit_code != 0
+    assert "6.0.0: failed" in result.output
+    assert "5.15.4: failed" in result.output
+    assert "6.2.1: " in result.output
+    assert not (cache_dir / "fa_subset_fa" / "fontawesome-free-6.0.0-web.zip").exists()
+
+
+def test_cli_offline(fake_releases, tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--offline", "--output", os.fspath(tmp_path)),
+        input="user\nrss\ngithub",
+    )
+
+    assert result.exit_code != 0
+    assert "downloading is disabled" in result.output
+    assert not fake_releases.requests
+
+
+def test_cli_remote_cache(mocked_requests, fake_server, tmp_path: Path) -> None:
+    remote_cache_url = fake_server.url + "/cache"
+    runner = CliRunner()
+
+    for i in range(2):
+        output = tmp_path / f"run{i}"
+        output.mkdir()
+        result = runner.invoke(
+            famain.main,
+            ("--output", os.fspath(output), "--remote-cache", remote_cache_url),
+            input="user\nrss\ngithub",
+        )
+        assert result.exit_code == 0
+
+    methods = [method for method, _ in fake_server.requests]
+    assert methods == ["GET", "PUT", "GET"]
+    for flavor in ("woff", "woff2"):
+        font_path = Path("fonts") / f"fontawesome-subset.{flavor}"
+        assert (tmp_path / "run0" / font_path).read_bytes() == (
+            tmp_path / "run1" / font_path
+        ).read_bytes()
+
+
+def test_cli_memory_report(mocked_requests, tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", os.fspath(tmp_path), "--memory-report"),
+        input="user\nrss\ngithub",
+    )
+    assert result.exit_code == 0
+    # Releases from the cache are subset from their superfont in one go.
+    assert "subset superfont: " in result.output
+    assert "merge: " not in result.output
+    assert "encode: " in result.output
+
+
+def test_cli_cost_report(mocked_requests, tmp_path: Path) -> None:
+    output = tmp_path / "output"
+    output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        (
+            "--output",
+            os.fspath(output),
+            "--cost-report",
+            os.fspath(tmp_path / "costs.json"),
+        ),
+        input="user\nrss\ngithub",
+    )
+    assert result.exit_code == 0
+
+    costs = json.loads((tmp_path / "costs.json").read_text())
+    assert {cost["name"] for cost in costs} == {"user", "rss-mod", "github"}
+    sizes = [cost["woff2_size"] for cost in costs]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_cli_metrics_prometheus_counters(mocked_requests, tmp_path: Path) -> None:
+    metrics_file = tmp_path / "fa_subset.prom"
+    runner = CliRunner()
+    for _ in range(2):
+        result = runner.invoke(
+            famain.main,
+            (
+                "--output",
+                os.fspath(tmp_path),
+                "--profile",
+                "dev",
+                "--metrics",
+                os.fspath(metrics_file),
+                "--metrics-format",
+                "prometheus",
+            ),
+            input="user",
+        )
+        assert result.exit_code == 0
+
+    lines = metrics_file.read_text().splitlines()
+    assert "fa_subset_builds_total 2" in lines
+    assert 'fa_subset_cache_misses_total{cache="subset"} 1' in lines
+    assert 'fa_subset_cache_hits_total{cache="subset"} 1' in lines
+
+
+@pytest.mark.parametrize("metrics_format", ("jsonl", "prometheus"))
+def test_cli_metrics(mocked_requests, tmp_path: Path, metrics_format: str) -> None:
+    output = tmp_path / "output"
+    output.mkdir()
+    metrics_file = tmp_path / "metrics"
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        (
+            "--output",
+            os.fspath(output),
+            "--metrics",
+            os.fspath(metrics_file),
+            "--metrics-format",
+            metrics_format,
+        ),
+        input="user\nrss\ngithub",
+    )
+    assert result.exit_code == 0
+
+    woff2_size = (output / "fonts" / "fontawesome-subset.woff2").stat().st_size
+    if metrics_format == "jsonl":
+        build_metrics = json.loads(metrics_file.read_text())
+        assert build_metrics["glyphs"] == 3
+        assert build_metrics["output_bytes"]["woff2"] == woff2_size
+    else:
+        lines = metrics_file.read_text().splitlines()
+        assert "fa_subset_last_build_glyphs 3" in lines
+        assert (
+            f'fa_subset_last_build_output_bytes{{flavor="woff2"}} {woff2_size}' in lines
+        )
+
+
+def test_cli_multiple_inputs(mocked_requests, tmp_path: Path) -> None:
+    output = tmp_path / "output"
+    output.mkdir()
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    (manifests / "a.json").write_text('{"icons": ["user", "home"]}')
+    (manifests / "b.toml").write_text('icons = ["house", "github"]\n')
+    glyph_path = tmp_path / "glyphs.txt"
+    glyph_path.write_text("user\nrss\n")
+    depfile = tmp_path / "fa-subset.d"
+
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        (
+            "--output",
+            os.fspath(output),
+            "-i",
+            os.fspath(glyph_path),
+            "-i",
+            os.fspath(manifests / "*"),
+            "--depfile",
+            os.fspath(depfile),
+        ),
+    )
+    assert result.exit_code == 0
+
+    css = (output / "css" / "fontawesome-subset.css").read_text()
+    assert re.findall(r"\.fa-([\w-]+):before", css) == [
+        "user",
+        "home",
+        "house",
+        "github",
+        "rss-mod",
+    ]
+    rule = depfile.read_text().split("\n\n")[0]
+    prerequisites = rule.replace("\\\n", "").split(":")[1].split()
+    assert prerequisites[:3] == [
+        os.fspath(glyph_path),
+        os.fspath(manifests / "a.json"),
+        os.fspath(manifests / "b.toml"),
+    ]
+
+
+@pytest.mark.parametrize("missing", ("missing.txt", "*.missing"))
+def test_cli_missing_input(mocked_requests, tmp_path: Path, missing: str) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--output", os.fspath(tmp_path), "-i", os.fspath(tmp_path / missing)),
+    )
+    assert result.exit_code == 1
+    assert os.fspath(tmp_path / missing) in result.output
+
+
+def test_cli_list(tmp_fa_zip: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main, ("list", "--font-awesome", os.fspath(tmp_fa_zip))
+    )
+
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines == sorted(lines)
+    assert "house\tf015" in lines
+    assert "home\tf015\talias of house" in lines
+
+
+def test_cli_search(fake_releases) -> None:
+    runner = CliRunner()
+    result = runner.invoke(famain.main, ("fetch", "6.2.0"))
+    assert result.exit_code == 0
+
+    result = runner.invoke(
+        famain.main, ("--offline", "search", "hom", "--font-awesome-version", "6.2.0")
+    )
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "home\tf015\talias of house",
+        "home-alt\tf015\talias of house",
+        "house\tf015",
+    ]
+
+    result = runner.invoke(
+        famain.main,
+        ("--offline", "search", "arow", "-n", "1", "--font-awesome-version", "6.2.0"),
+    )
+    assert result.exit_code == 0
+    assert result.output == "arrow-left\tf060\n"
+
+    result = runner.invoke(
+        famain.main, ("--offline", "search", "xyzzy", "--font-awesome-version", "6.2.0")
+    )
+    assert result.exit_code == 1
+    assert "No icons match xyzzy" in result.output
+    assert len(fake_releases.requests) == 1
+
+
+def test_cli_unknown_icons(tmp_fa_zip: Path, tmp_path: Path) -> None:
+    output = tmp_path / "out"
+    output.mkdir()
+    runner = CliRunner()
+    result = runner.invoke(
+        famain.main,
+        ("--font-awesome", os.fspath(tmp_fa_zip), "--output", os.fspath(output)),
+        input="usr\nhouse\nenvelop\nxyzzy",
+    )
+
+    assert result.exit_code == 1
+    assert result.output == (
+        "Unknown icons: usr (did you mean: user?), "
+        "envelop (did you mean: envelope, envelope-o?), xyzzy\n"
+    )
+    assert not list(output.iterdir())
@@ -0,0 +1,188 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import tarfile
+import time
+import types
+from collections.abc import Iterable
+from pathlib import Path
+
+import pytest
+
+from fa_subset import daemon
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork"), reason="The daemon needs Unix sockets and fork"
+)
+
+
+def _wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def socket_path(tmp_path_factory) -> Path:
+    # Socket paths are limited to ~100 bytes, which tmp_path may exceed.
+    return tmp_path_factory.mktemp("d") / "d.sock"
+
+
+@pytest.fixture
+def running_daemon(socket_path: Path) -> Iterable[subprocess.Popen]:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "fa_subset.daemon", os.fspath(socket_path)],
+        env={**os.environ, daemon.IDLE_TIMEOUT_ENV: "30"},
+    )
+    assert _wait_for(socket_path.exists)
+    yield process
+    process.terminate()
+    process.wait()
+
+
+def test_forward(
+    running_daemon, socket_path: Path, tmp_fa_zip: Path, tmp_path: Path, monkeypatch
+) -> None:
+    output = tmp_path / "output"
+    output.mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    exit_code = daemon.forward(
+        ["--font-awesome", os.fspath(tmp_fa_zip), "--output", "output"],
+        path=socket_path,
+        stdin=io.BytesIO(b"user\nrss\ngithub"),
+    )
+
+    assert exit_code == 0
+    # Relative paths are resolved in the client's working directory.
+    assert (output / "css" / "fontawesome-subset.css").exists()
+    assert (output / "fonts" / "fontawesome-subset.woff2").exists()
+
+
+def test_forward_output(
+    running_daemon, socket_path: Path, tmp_fa_zip: Path, capfdbinary
+) -> None:
+    exit_code = daemon.forward(
+        ["--font-awesome", os.fspath(tmp_fa_zip), "--output", "-", "--memory-report"],
+        path=socket_path,
+        stdin=io.BytesIO(b"user"),
+    )
+
+    assert exit_code == 0
+    captured = capfdbinary.readouterr()
+    with tarfile.open(fileobj=io.BytesIO(captured.out)) as tf:
+        assert "css/fontawesome-subset.css" in tf.getnames()
+    assert b"encode: " in captured.err
+
+
+def test_forward_exit_code(
+    running_daemon, socket_path: Path, tmp_fa_zip: Path, capfdbinary
+) -> None:
+    exit_code = daemon.forward(
+        ["--font-awesome", os.fspath(tmp_fa_zip), "--output", "-"],
+        path=socket_path,
+        stdin=io.BytesIO(b"usr"),
+    )
+
+    assert exit_code == 1
+    captured = capfdbinary.readouterr()
+    assert b"Unknown icon: usr" in captured.err
+    assert captured.out == b""
+
+
+def test_forward_environment(
+    running_daemon, socket_path: Path, tmp_path: Path, monkeypatch, capfdbinary
+) -> None:
+    monkeypatch.setenv("FA_SUBSET_CACHE_DIR", os.fspath(tmp_path / "cache"))
+
+    exit_code = daemon.forward(["cache", "list"], path=socket_path)
+
+    assert exit_code == 0
+    assert os.fspath(tmp_path / "cache") in capfdbinary.readouterr().out.decode()
+
+
+def test_forward_no_stdin(running_daemon, socket_path: Path, capfdbinary) -> None:
+    class _Unreadable(io.BytesIO):
+        def read(self, *args) -> bytes:
+            raise AssertionError("stdin was read")
+
+    exit_code = daemon.forward(
+        ["cache", "clear"], path=socket_path, stdin=_Unreadable()
+    )
+
+    assert exit_code == 0
+
+
+def test_handle_streams_output(tmp_path: Path) -> None:
+    def main(args: list[str], prog_name: str) -> None:
+        print("started")
+        print(f"read {sys.stdin.read()}", file=sys.stderr)
+        sys.stdout.buffer.write(b"\x00")
+
+    cli = types.SimpleNamespace(main=types.SimpleNamespace(main=main))
+    server, client = socket.socketpair()
+    pid = os.fork()
+    if pid == 0:
+        client.close()
+        daemon._serve_forked(server, cli)
+    server.close()
+
+    messages = []
+    with client:
+        daemon._send(
+            client, {"type": "run", "args": [], "cwd": os.fspath(tmp_path), "env": {}}
+        )
+        while True:
+            message, data = daemon._recv(client)
+            messages.append((message["type"], data))
+            if message["type"] == "stdin":
+                daemon._send(client, {"type": "stdin"}, b"input")
+            elif message["type"] == "exit":
+                break
+    os.waitpid(pid, 0)
+
+    # Output is sent as it is written, not once the command finishes.
+    assert messages == [
+        ("stdout", b"started\n"),
+        ("stdin", b""),
+        ("stderr", b"read input\n"),
+        ("stdout", b"\x00"),
+        ("exit", b""),
+    ]
+
+
+def test_forward_starts_daemon(
+    socket_path: Path, tmp_fa_zip: Path, monkeypatch, capfdbinary
+) -> None:
+    monkeypatch.setenv(daemon.IDLE_TIMEOUT_ENV, "0.5")
+
+    exit_code = daemon.forward(
+        ["list", "--font-awesome", os.fspath(tmp_fa_zip)], path=socket_path
+    )
+
+    assert exit_code == 0
+    assert b"github\tf09b\n" in capfdbinary.readouterr().out
+    # The daemon exits, removing its socket, once it has been idle.
+    assert _wait_for(lambda: not socket_path.exists())
+
+
+def test_serve_once(running_daemon, socket_path: Path) -> None:
+    # A second daemon on the same socket exits straight away.
+    daemon.serve(socket_path, idle_timeout=30)
+
+    assert socket_path.exists()
+    assert running_daemon.poll() is None
+
+
+def test_socket_path() -> None:
+    path = daemon.socket_path()
+
+    assert path is not None
+    assert len(os.fspath(path)) < 100
+    assert path == daemon.socket_path()
+    assert path.parent.stat().st_mode & 0o077 == 0
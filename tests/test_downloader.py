@@ -1,4 +1,6 @@
+import concurrent.futures
 import pathlib
+import time
 from unittest import mock
 
 import pytest
@@ -47,6 +49,12 @@ def test_download_url(mocked_requests, tmp_path: pathlib.Path) -> None:
     assert out_path.read_bytes() == b"Fake content!"
 
 
+def test_download_url_new_dir(mocked_requests, tmp_path: pathlib.Path) -> None:
+    out_path = downloader.download_version("6.2.0", tmp_path / "new" / "cache")
+
+    assert out_path.read_bytes() == b"Fake content!"
+
+
 def test_download_url_exists(mocked_requests, tmp_path: pathlib.Path) -> None:
     expected_out_path = tmp_path / "fa_subset_fa/fontawesome-free-6.2.1-web.zip"
 
@@ -62,3 +70,38 @@ def test_download_url_exists(mocked_requests, tmp_path: pathlib.Path) -> None:
     mocked_requests.get.assert_not_called()
 
     assert out_path.read_bytes() == b"Different content"
+
+
+def test_download_url_concurrent(tmp_path: pathlib.Path) -> None:
+    url = "https://use.fontawesome.com/releases/v6.2.1/fontawesome-free-6.2.1-web.zip"
+
+    def slow_get(url: str) -> mock.Mock:
+        time.sleep(0.1)
+        response = mock.Mock()
+        response.content = b"Fake content!"
+        return response
+
+    with mock.patch.object(downloader, "requests") as mocked_requests:
+        mocked_requests.get.side_effect = slow_get
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            out_paths = set(
+                executor.map(lambda _: downloader.download_url(url, tmp_path), range(8))
+            )
+
+    mocked_requests.get.assert_called_once_with(url)
+    (out_path,) = out_paths
+    assert out_path.read_bytes() == b"Fake content!"
+
+
+def test_download_url_offline(mocked_requests, tmp_path: pathlib.Path) -> None:
+    url = "https://use.fontawesome.com/releases/v6.2.1/fontawesome-free-6.2.1-web.zip"
+
+    with pytest.raises(FileNotFoundError):
+        downloader.download_url(url, tmp_path, offline=True)
+
+    expected_out_path = tmp_path / "fa_subset_fa/fontawesome-free-6.2.1-web.zip"
+    expected_out_path.parent.mkdir()
+    expected_out_path.write_bytes(b"Cached content")
+
+    assert downloader.download_url(url, tmp_path, offline=True) == expected_out_path
+    mocked_requests.get.assert_not_called()
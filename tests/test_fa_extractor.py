@@ -1,22 +1,28 @@
 import collections
+import concurrent.futures
+import io
+import json
 import os
 import shutil
-from collections.abc import Iterable, Mapping, Sequence, Set
+import subprocess
+from collections.abc import Mapping, Sequence, Set
 from pathlib import Path
+from unittest import mock
 
+import fontTools.merge
 import pytest
-from fontTools import ttLib
+from fontTools import fontBuilder, ttLib
+from fontTools.misc import timeTools
+from fontTools.pens import ttGlyphPen
 
-from fa_subset import fa_extractor, zip_extractor
-
-
-@pytest.fixture(scope="module")
-def fa_dir(tmp_path_factory, fa_zip: Path) -> Iterable[Path]:
-    tmp_path: Path = tmp_path_factory.mktemp("fa_dir")
-
-    tmp_fa_zip = tmp_path / fa_zip.name
-    shutil.copy(fa_zip, tmp_fa_zip)
-    yield zip_extractor.unzip(tmp_fa_zip)
+from fa_subset import (
+    fa_extractor,
+    icon_index,
+    input_reader,
+    metrics,
+    remote_cache,
+    superfont,
+)
 
 
 def test_find_input_fonts_ttf(fa_dir: Path) -> None:
@@ -109,6 +115,37 @@ def test_load_codepoints_bad_glyph(fa_dir: Path) -> None:
         fa_extractor.load_codepoints(css_file, ["oijaroeijoi"])
 
 
+@pytest.mark.parametrize("use_index", (False, True))
+def test_load_codepoints_bad_glyphs(fa_dir: Path, use_index: bool) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    index = fa_extractor.ensure_index(fa_dir) if use_index else None
+
+    with pytest.raises(icon_index.UnknownIconsError) as exc_info:
+        fa_extractor.load_codepoints(
+            css_file, ["usr", "user", "qux", "usr"], index=index
+        )
+
+    # Every unknown icon is reported, not just the first.
+    assert exc_info.value.suggestions == {"usr": (), "qux": ()}
+
+
+def test_generate_font_subset_unknown_icons(fa_dir: Path, tmp_path: Path) -> None:
+    fa_extractor.ensure_index(fa_dir)
+
+    with pytest.raises(
+        icon_index.UnknownIconsError,
+        match=r"^Unknown icons: usr \(did you mean: user\?\), qux$",
+    ):
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            tmp_path / "fontawesome-subset.css",
+            tmp_path / "fontawesome-subset",
+            ["regular:usr", "home", "qux"],
+        )
+
+    assert not list(tmp_path.iterdir())
+
+
 def assert_font_subset(
     subtests, font_path: Path, codepoints: Mapping[str, str]
 ) -> None:
@@ -179,3 +216,861 @@ def test_generate_font_subset(fa_dir: Path, tmp_path: Path, subtests) -> None:
     assert set(codepoints.keys()) == {"user", "rss-mod", "github"}
     for expected_output in expected_outputs:
         assert_font_subset(subtests, expected_output, codepoints)
+
+
+def test_generate_subset_font_optimize_size(fa_dir: Path, tmp_path: Path) -> None:
+    glyphs = [
+        "user",
+        "rss",
+        "github",
+    ]
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    codepoints = fa_extractor.load_codepoints(css_file, glyphs)
+
+    out_path = tmp_path / "fontawesome-subset"
+    flavors = ("ttf", "woff", "woff2")
+    size_report: list[fa_extractor.FlavorSize] = []
+    fa_extractor.generate_subset_font(
+        input_fonts,
+        codepoints,
+        out_path,
+        flavors=flavors,
+        optimize="size",
+        size_report=size_report,
+    )
+
+    assert [size.flavor for size in size_report] == list(flavors)
+    for size in size_report:
+        out_file = out_path.with_suffix(f".{size.flavor}")
+        assert size.after == os.path.getsize(out_file)
+        assert size.after <= size.before
+
+    font = ttLib.TTFont(out_path.with_suffix(".ttf"))
+    assert "GSUB" not in font
+    assert "fpgm" not in font
+    assert "prep" not in font
+    assert {record.nameID for record in font["name"].names} <= {0, 1, 2, 4, 6}
+    cmap = font.getBestCmap()
+    assert {int(codepoint, 16) for codepoint in codepoints.values()} == set(cmap)
+
+
+def test_generate_subset_font_bad_optimize(fa_dir: Path, tmp_path: Path) -> None:
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    with pytest.raises(ValueError):
+        fa_extractor.generate_subset_font(
+            input_fonts,
+            {"user": "f007"},
+            tmp_path / "fontawesome-subset",
+            optimize="oijaroeijoi",
+        )
+
+
+def test_generate_subset_font_cache(fa_dir: Path, tmp_path: Path) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    codepoints = fa_extractor.load_codepoints(css_file, ["user", "github"])
+    cache_dir = tmp_path / "cache"
+
+    first_out = tmp_path / "first" / "fontawesome-subset"
+    first_out.parent.mkdir()
+    fa_extractor.generate_subset_font(
+        input_fonts, codepoints, first_out, cache_dir=cache_dir
+    )
+
+    second_out = tmp_path / "second" / "fontawesome-subset"
+    second_out.parent.mkdir()
+    with mock.patch.object(fa_extractor, "_subset_font") as subset_font:
+        fa_extractor.generate_subset_font(
+            input_fonts, codepoints, second_out, cache_dir=cache_dir
+        )
+    subset_font.assert_not_called()
+
+    for flavor in ("woff", "woff2"):
+        first = first_out.with_suffix(f".{flavor}").read_bytes()
+        assert first == second_out.with_suffix(f".{flavor}").read_bytes()
+
+
+@pytest.mark.parametrize("input_flavor", ("ttf", "woff2"))
+def test_generate_subset_font_reproducible(
+    fa_dir: Path, tmp_path: Path, monkeypatch, input_flavor: str
+) -> None:
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir, input_flavor=input_flavor)
+    codepoints = fa_extractor.load_codepoints(css_file, ["user", "rss", "github"])
+    flavors = ("ttf", "woff", "woff2")
+
+    outputs = []
+    for i, now in enumerate((1_600_000_000, 1_700_000_000)):
+        out_path = tmp_path / f"run{i}" / "fontawesome-subset"
+        out_path.parent.mkdir()
+        with mock.patch.object(timeTools.time, "time", return_value=now):
+            fa_extractor.generate_subset_font(
+                input_fonts, codepoints, out_path, flavors=flavors, reproducible=True
+            )
+        outputs.append(
+            [out_path.with_suffix(f".{flavor}").read_bytes() for flavor in flavors]
+        )
+
+    assert outputs[0] == outputs[1]
+
+
+def test_generate_subset_font_source_date_epoch(
+    fa_dir: Path, tmp_path: Path, monkeypatch
+) -> None:
+    source_date_epoch = 1_234_567_890
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", str(source_date_epoch))
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    codepoints = fa_extractor.load_codepoints(css_file, ["user"])
+
+    out_path = tmp_path / "fontawesome-subset"
+    fa_extractor.generate_subset_font(
+        input_fonts, codepoints, out_path, flavors=("ttf",), reproducible=True
+    )
+
+    expected_timestamp = timeTools.timestampSinceEpoch(source_date_epoch)
+    font = ttLib.TTFont(out_path.with_suffix(".ttf"))
+    assert font["head"].created == expected_timestamp
+    assert font["head"].modified == expected_timestamp
+
+
+def test_generate_font_subset_fingerprint(fa_dir: Path, tmp_path: Path) -> None:
+    css_out = tmp_path / "css" / "fontawesome-subset.css"
+    font_out = tmp_path / "fonts" / "fontawesome-subset"
+    css_out.parent.mkdir()
+    font_out.parent.mkdir()
+
+    outputs = fa_extractor.generate_font_subset(
+        fa_dir,
+        css_out,
+        font_out,
+        ["user", "github"],
+        output_font_flavors=("woff", "woff2"),
+        fingerprint=True,
+    )
+
+    assert set(outputs) == {
+        "fontawesome-subset.css",
+        "fontawesome-subset.woff",
+        "fontawesome-subset.woff2",
+    }
+    assert not css_out.exists()
+
+    css = outputs["fontawesome-subset.css"].read_text()
+    for logical_name, path in outputs.items():
+        assert path.exists()
+        stem, digest, suffix = path.name.split(".")
+        assert f"{stem}.{suffix}" == logical_name
+        assert len(digest) == fa_extractor.FINGERPRINT_LENGTH
+        if suffix != "css":
+            assert f"url('../fonts/{path.name}')" in css
+
+    manifest_out = tmp_path / "manifest.json"
+    fa_extractor.write_manifest(outputs, manifest_out)
+    manifest = json.loads(manifest_out.read_text())
+    assert manifest == {
+        name: path.relative_to(tmp_path).as_posix() for name, path in outputs.items()
+    }
+
+
+def test_generate_font_subset_fingerprint_changes(fa_dir: Path, tmp_path: Path) -> None:
+    fingerprinted_names = []
+    for i, glyphs in enumerate((["user"], ["user"], ["user", "github"])):
+        out_dir = tmp_path / f"run{i}"
+        out_dir.mkdir()
+        outputs = fa_extractor.generate_font_subset(
+            fa_dir,
+            out_dir / "fontawesome-subset.css",
+            out_dir / "fontawesome-subset",
+            glyphs,
+            output_font_flavors=("woff2",),
+            fingerprint=True,
+            reproducible=True,
+        )
+        fingerprinted_names.append({path.name for path in outputs.values()})
+
+    assert fingerprinted_names[0] == fingerprinted_names[1]
+    assert fingerprinted_names[0].isdisjoint(fingerprinted_names[2])
+
+
+def test_write_depfile(tmp_path: Path) -> None:
+    depfile = tmp_path / "fa-subset.d"
+    fa_extractor.write_depfile(
+        [Path("out/a.css"), Path("out/a b.woff2")],
+        [Path("glyphs.txt"), Path("fa/css/all.css"), Path("fa/$weird#.ttf")],
+        depfile,
+    )
+
+    assert depfile.read_text() == (
+        "out/a.css out/a\\ b.woff2: \\\n"
+        "  glyphs.txt \\\n"
+        "  fa/css/all.css \\\n"
+        "  fa/$$weird\\#.ttf\n"
+        "\n"
+        "glyphs.txt:\n"
+        "\n"
+        "fa/css/all.css:\n"
+        "\n"
+        "fa/$$weird\\#.ttf:\n"
+    )
+
+
+@pytest.mark.skipif(shutil.which("make") is None, reason="Needs make")
+def test_write_depfile_removed_prerequisite(tmp_path: Path) -> None:
+    target = tmp_path / "out.css"
+    prerequisite = tmp_path / "cache" / "all.css"
+    prerequisite.parent.mkdir()
+    prerequisite.write_text("")
+    depfile = tmp_path / "out.d"
+    fa_extractor.write_depfile([target], [prerequisite], depfile)
+    (tmp_path / "Makefile").write_text(f"{target}:\n\ttouch $@\n\ninclude {depfile}\n")
+
+    subprocess.run(["make", "-C", os.fspath(tmp_path), os.fspath(target)], check=True)
+    # e.g. the release was pruned from the cache
+    prerequisite.unlink()
+
+    subprocess.run(["make", "-C", os.fspath(tmp_path), os.fspath(target)], check=True)
+
+
+def test_generate_font_subset_dependencies(fa_dir: Path, tmp_path: Path) -> None:
+    dependencies: list[Path] = []
+    fa_extractor.generate_font_subset(
+        fa_dir,
+        tmp_path / "fontawesome-subset.css",
+        tmp_path / "fontawesome-subset",
+        ["user"],
+        include_fonts=("solid", "regular"),
+        dependencies=dependencies,
+    )
+
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    assert dependencies == [
+        css_file,
+        css_file.parent.parent / "metadata" / "icons.json",
+        css_file.parent.parent / "metadata" / "shims.json",
+        *fa_extractor.find_input_fonts(fa_dir, include=("solid", "regular")),
+    ]
+
+
+@pytest.mark.parametrize("use_local_cache", (False, True))
+def test_generate_subset_font_remote_cache(
+    fa_dir: Path, tmp_path: Path, use_local_cache: bool
+) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    codepoints = fa_extractor.load_codepoints(css_file, ["user", "github"])
+    backend = remote_cache.DirectoryBackend(tmp_path / "remote")
+
+    # Separate local caches, as if these ran on different machines.
+    def _generate(name: str) -> Path:
+        out_path = tmp_path / name / "fontawesome-subset"
+        out_path.parent.mkdir()
+        fa_extractor.generate_subset_font(
+            input_fonts,
+            codepoints,
+            out_path,
+            cache_dir=(tmp_path / name / "cache") if use_local_cache else None,
+            remote_cache=backend,
+        )
+        return out_path
+
+    first_out = _generate("first")
+    remote_cache.wait_for_uploads()
+    assert len(list((tmp_path / "remote").glob("*/*"))) == 1
+
+    with mock.patch.object(fa_extractor, "_subset_font") as subset_font:
+        second_out = _generate("second")
+    subset_font.assert_not_called()
+
+    for flavor in ("woff", "woff2"):
+        first = first_out.with_suffix(f".{flavor}").read_bytes()
+        assert first == second_out.with_suffix(f".{flavor}").read_bytes()
+
+
+def test_generate_subset_font_cache_source_fonts(fa_dir: Path, tmp_path: Path) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    cache_dir = tmp_path / "cache"
+
+    first_out = tmp_path / "first" / "fontawesome-subset"
+    first_out.parent.mkdir()
+    fa_extractor.generate_subset_font(
+        input_fonts,
+        fa_extractor.load_codepoints(css_file, ["user", "github"]),
+        first_out,
+        cache_dir=cache_dir,
+    )
+
+    # Only the solid font has the rss icon, so the others are not subset again.
+    codepoints = fa_extractor.load_codepoints(css_file, ["user", "github", "rss"])
+    second_out = tmp_path / "second" / "fontawesome-subset"
+    second_out.parent.mkdir()
+    with mock.patch.object(
+        fa_extractor, "_subset_font", wraps=fa_extractor._subset_font
+    ) as subset_font:
+        fa_extractor.generate_subset_font(
+            input_fonts, codepoints, second_out, cache_dir=cache_dir
+        )
+    assert subset_font.call_count == 1
+    assert subset_font.call_args.args[0].name == "fa-solid-900.ttf"
+
+    uncached_out = tmp_path / "uncached" / "fontawesome-subset"
+    uncached_out.parent.mkdir()
+    fa_extractor.generate_subset_font(input_fonts, codepoints, uncached_out)
+
+    for flavor in ("woff", "woff2"):
+        second = second_out.with_suffix(f".{flavor}").read_bytes()
+        assert second == uncached_out.with_suffix(f".{flavor}").read_bytes()
+
+
+# Generous limits for the test glyph set with the fixture fonts, well above
+# what each stage needs once fontTools' modules are imported.
+MEMORY_CEILINGS = {"subset": 256 * 1024, "merge": 512 * 1024, "encode": 1024**2}
+
+
+def test_generate_subset_font_memory_report(fa_dir: Path, tmp_path: Path) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    glyphs = input_reader.read_txt(Path(__file__).parent / "data" / "test_glyphs.txt")
+    codepoints = fa_extractor.load_codepoints(css_file, glyphs)
+
+    # The first build imports modules, which would count towards its stages.
+    fa_extractor.generate_subset_font(input_fonts, codepoints, tmp_path / "warmup")
+
+    memory_report: list[fa_extractor.StageMemory] = []
+    fa_extractor.generate_subset_font(
+        input_fonts,
+        codepoints,
+        tmp_path / "fontawesome-subset",
+        memory_report=memory_report,
+    )
+
+    # All of the test glyphs are in the solid font, so the others are skipped.
+    assert [stage.stage for stage in memory_report] == [
+        "subset fa-solid-900.ttf",
+        "merge",
+        "encode",
+    ]
+    for stage in memory_report:
+        assert 0 < stage.peak < MEMORY_CEILINGS[stage.stage.split()[0]], stage
+
+
+def test_generate_subset_font_memory_report_cached(
+    fa_dir: Path, tmp_path: Path
+) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    codepoints = fa_extractor.load_codepoints(css_file, ["user"])
+    cache_dir = tmp_path / "cache"
+
+    fa_extractor.generate_subset_font(
+        input_fonts, codepoints, tmp_path / "fontawesome-subset", cache_dir=cache_dir
+    )
+
+    memory_report: list[fa_extractor.StageMemory] = []
+    fa_extractor.generate_subset_font(
+        input_fonts,
+        codepoints,
+        tmp_path / "fontawesome-subset",
+        cache_dir=cache_dir,
+        memory_report=memory_report,
+    )
+    assert memory_report == []
+
+
+@pytest.mark.parametrize("flavors", (("woff2", "woff"), ("ttf",)))
+@pytest.mark.parametrize("cached", (False, True))
+def test_generate_subset_font_cost_report(
+    fa_dir: Path, tmp_path: Path, flavors: Sequence[str], cached: bool
+) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    input_fonts = fa_extractor.find_input_fonts(fa_dir)
+    codepoints = fa_extractor.load_codepoints(css_file, ["user", "rss", "github"])
+    cache_dir = tmp_path / "cache" if cached else None
+    if cached:
+        fa_extractor.generate_subset_font(
+            input_fonts, codepoints, tmp_path / "warmup", flavors, cache_dir=cache_dir
+        )
+
+    cost_report: list[fa_extractor.IconCost] = []
+    fa_extractor.generate_subset_font(
+        input_fonts,
+        codepoints,
+        tmp_path / "fontawesome-subset",
+        flavors,
+        cache_dir=cache_dir,
+        cost_report=cost_report,
+    )
+
+    assert {cost.name: cost.codepoint for cost in cost_report} == codepoints
+    assert cost_report == sorted(
+        cost_report, key=lambda cost: (-cost.woff2_size, cost.name)
+    )
+    with ttLib.TTFont(tmp_path / f"fontawesome-subset.{flavors[0]}") as font:
+        cmap = font.getBestCmap()
+        for cost in cost_report:
+            assert cost.glyphs == [cmap[int(cost.codepoint, 16)]]
+            assert 0 < cost.woff2_size < cost.size
+
+
+def test_icon_costs_composite() -> None:
+    fb = fontBuilder.FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder([".notdef", "dot", "two-dots"])
+    fb.setupCharacterMap({0xF001: "dot", 0xF002: "two-dots"})
+    pen = ttGlyphPen.TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 100))
+    pen.lineTo((100, 100))
+    pen.closePath()
+    dot = pen.glyph()
+    pen = ttGlyphPen.TTGlyphPen({"dot": dot})
+    pen.addComponent("dot", (1, 0, 0, 1, 0, 0))
+    pen.addComponent("dot", (1, 0, 0, 1, 200, 0))
+    glyphs = {".notdef": ttGlyphPen.TTGlyphPen(None).glyph(), "dot": dot}
+    glyphs["two-dots"] = pen.glyph()
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({name: (300, 0) for name in glyphs})
+    fb.setupHorizontalHeader()
+    fb.setupMaxp()
+    fb.setupPost()
+    buf = io.BytesIO()
+    fb.save(buf)
+
+    costs = fa_extractor._icon_costs(
+        {"ttf": buf.getvalue()}, {"dot": "f001", "two-dots": "f002"}
+    )
+
+    dot_cost, two_dots_cost = sorted(costs, key=lambda cost: cost.name)
+    assert dot_cost.glyphs == ["dot"]
+    assert two_dots_cost.glyphs == ["two-dots", "dot"]
+    assert two_dots_cost.size > dot_cost.size
+    assert costs == [two_dots_cost, dot_cost]
+
+
+def test_write_cost_report(tmp_path: Path) -> None:
+    costs = [
+        fa_extractor.IconCost(
+            name="user", codepoint="f007", glyphs=["uniF007"], size=62, woff2_size=27
+        )
+    ]
+
+    fa_extractor.write_cost_report(costs, tmp_path / "costs.json")
+
+    assert json.loads((tmp_path / "costs.json").read_text()) == [
+        {
+            "name": "user",
+            "codepoint": "f007",
+            "glyphs": ["uniF007"],
+            "size": 62,
+            "woff2_size": 27,
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    "glyph, expected",
+    (
+        ("user", (None, "user")),
+        ("solid:user", ("solid", "user")),
+        ("v4compat:user", ("v4compat", "user")),
+    ),
+)
+def test_parse_glyph(glyph: str, expected: tuple[str | None, str]) -> None:
+    assert fa_extractor.parse_glyph(glyph) == expected
+
+
+def test_parse_glyph_bad_style() -> None:
+    with pytest.raises(ValueError, match="Unknown style: light"):
+        fa_extractor.parse_glyph("light:user")
+
+
+def test_load_styles(fa_dir: Path) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+    glyphs = ["regular:user", "github", "solid:envelope", "solid:rss"]
+
+    assert fa_extractor.load_codepoints(css_file, glyphs) == {
+        "user": "f007",
+        "github": "f09b",
+        "envelope": "f0e0",
+        "rss-mod": "f09e",
+    }
+    assert fa_extractor.load_styles(css_file, glyphs) == {
+        "f007": "regular",
+        "f0e0": "solid",
+        "f09e": "solid",
+    }
+
+
+def test_load_styles_conflict(fa_dir: Path) -> None:
+    (css_file,) = fa_dir.glob("**/css/all.css")
+
+    with pytest.raises(ValueError, match="more than one style: user"):
+        fa_extractor.load_styles(css_file, ["solid:user", "regular:user"])
+
+
+def _num_contours(font_path: Path, codepoint: int) -> int:
+    with ttLib.TTFont(font_path) as font:
+        return font["glyf"][font.getBestCmap()[codepoint]].numberOfContours
+
+
+@pytest.mark.parametrize(
+    "glyph, expected_contours",
+    (
+        # Unqualified icons come from the first font that has them.
+        ("user", 3),
+        ("solid:user", 3),
+        ("v4compat:user", 4),
+    ),
+)
+def test_generate_font_subset_styles(
+    fa_dir: Path, tmp_path: Path, glyph: str, expected_contours: int
+) -> None:
+    fa_extractor.generate_font_subset(
+        fa_dir,
+        tmp_path / "fontawesome-subset.css",
+        tmp_path / "fontawesome-subset",
+        [glyph, "github"],
+        output_font_flavors=["ttf"],
+    )
+
+    font_path = tmp_path / "fontawesome-subset.ttf"
+    assert _num_contours(font_path, 0xF007) == expected_contours
+    with ttLib.TTFont(font_path) as font:
+        # Each codepoint is only subset from one font, so the merged font only
+        # has the two icons and the .notdef glyphs of the two fonts used.
+        assert len(font.getGlyphOrder()) == 4
+
+
+@pytest.mark.parametrize(
+    "glyph, expected_contours",
+    (("user", 3), ("regular:user", 3), ("v4compat:user", 4)),
+)
+def test_generate_font_subset_superfont(
+    fa_dir: Path, tmp_path: Path, glyph: str, expected_contours: int
+) -> None:
+    superfont.ensure(fa_dir, fa_extractor.find_input_fonts(fa_dir))
+
+    memory_report: list[fa_extractor.StageMemory] = []
+    # Builds using the superfont never merge fonts.
+    with mock.patch.object(fontTools.merge, "Merger", side_effect=AssertionError):
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            tmp_path / "fontawesome-subset.css",
+            tmp_path / "fontawesome-subset",
+            [glyph, "github", "rss"],
+            output_font_flavors=["ttf"],
+            memory_report=memory_report,
+            use_superfont=True,
+        )
+
+    font_path = tmp_path / "fontawesome-subset.ttf"
+    assert _num_contours(font_path, 0xF007) == expected_contours
+    with ttLib.TTFont(font_path) as font:
+        assert set(font.getBestCmap()) == {0xF007, 0xF09B, 0xF09E}
+        # A single .notdef, as only one font was subset.
+        assert len(font.getGlyphOrder()) == 4
+    assert [stage.stage for stage in memory_report] == ["subset superfont", "encode"]
+
+
+def test_generate_font_subset_threads(fa_dir: Path, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+    calls = [
+        (glyphs, options)
+        for glyphs in (
+            ["user", "github"],
+            ["regular:user", "rss", "home"],
+            ["v4compat:user", "arrow-right", "arrow-left"],
+            ["house", "gear", "star"],
+        )
+        for options in (
+            {},
+            {"optimize": "size"},
+            {"cache_dir": cache_dir},
+            {"use_superfont": True},
+            {"memory_report": []},
+        )
+    ]
+
+    def _generate(out_dir: Path, glyphs: list[str], options: dict) -> None:
+        out_dir.mkdir(parents=True)
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            out_dir / "fontawesome-subset.css",
+            out_dir / "fontawesome-subset",
+            glyphs,
+            output_font_flavors=["woff2", "ttf"],
+            reproducible=True,
+            **options,
+        )
+
+    for i, (glyphs, options) in enumerate(calls):
+        _generate(tmp_path / "sequential" / str(i), glyphs, options)
+
+    fa_extractor.clear_caches()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(_generate, tmp_path / f"threads{n}" / str(i), *call)
+            for n in range(3)
+            for i, call in enumerate(calls)
+        ]
+        for future in futures:
+            future.result()
+
+    # Every concurrent call produces exactly what it does on its own.
+    for n in range(3):
+        for i in range(len(calls)):
+            expected_dir = tmp_path / "sequential" / str(i)
+            out_dir = tmp_path / f"threads{n}" / str(i)
+            assert sorted(p.name for p in out_dir.iterdir()) == sorted(
+                p.name for p in expected_dir.iterdir()
+            )
+            for expected in expected_dir.iterdir():
+                assert (out_dir / expected.name).read_bytes() == expected.read_bytes()
+
+
+def test_generate_font_subset_style_not_included(fa_dir: Path, tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="Style not included: regular"):
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            tmp_path / "fontawesome-subset.css",
+            tmp_path / "fontawesome-subset",
+            ["regular:user"],
+            include_fonts=["brands", "solid"],
+        )
+
+
+def test_generate_font_subset_style_missing_glyph(fa_dir: Path, tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="No glyph for U\\+F09B in the solid style"):
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            tmp_path / "fontawesome-subset.css",
+            tmp_path / "fontawesome-subset",
+            ["solid:github"],
+        )
+
+
+def test_generate_font_subset_metrics(fa_dir: Path, tmp_path: Path) -> None:
+    sink = mock.Mock(spec=metrics.MetricsSink)
+    cache_dir = tmp_path / "cache"
+
+    for _ in range(2):
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            tmp_path / "fontawesome-subset.css",
+            tmp_path / "fontawesome-subset",
+            ["user", "github"],
+            cache_dir=cache_dir,
+            metrics_sink=sink,
+        )
+
+    (first,), (second,) = (call.args for call in sink.emit.call_args_list)
+    assert first.glyphs == 2
+    assert first.fonts_touched == 2
+    assert set(first.stage_seconds) == {"codepoints", "subset", "merge", "encode"}
+    assert first.output_bytes == {
+        flavor: (tmp_path / f"fontawesome-subset.{flavor}").stat().st_size
+        for flavor in ("woff", "woff2")
+    }
+    assert first.cache_hits == {}
+    assert first.cache_misses == {"subset": 1, "source": 2}
+    assert first.duration > sum(first.stage_seconds.values()) > 0
+
+    assert second.fonts_touched == 0
+    assert set(second.stage_seconds) == {"codepoints"}
+    assert second.cache_hits == {"subset": 1}
+    assert second.cache_misses == {}
+
+
+def test_canonicalize_glyphs() -> None:
+    aliases = {"home": "house", "home-alt": "house", "feed": "rss"}
+
+    glyphs, replaced = fa_extractor.canonicalize_glyphs(
+        ["home", "user", "house", "solid:home-alt", "user", "feed", "home"], aliases
+    )
+
+    assert glyphs == ["house", "user", "solid:house", "rss"]
+    assert replaced == {"house": ["home", "home-alt"], "rss": ["feed"]}
+
+
+def test_canonicalize_glyphs_shims() -> None:
+    shims = {"envelope-o": "regular:envelope", "star-o": "regular:star"}
+
+    glyphs, replaced = fa_extractor.canonicalize_glyphs(
+        ["envelope-o", "user", "star-o", "solid:star", "regular:envelope"], {}, shims
+    )
+
+    # star is also requested in another style, so star-o is left alone.
+    assert glyphs == ["regular:envelope", "user", "star-o", "solid:star"]
+    assert replaced == {"envelope": ["envelope-o"]}
+
+
+def test_generate_css_aliases() -> None:
+    css = fa_extractor.generate_css(
+        {"house": "f015", "user": "f007"},
+        [("fontawesome-subset.woff2", "woff2")],
+        aliases={"house": ["home"]},
+    )
+
+    assert '.fa-home:before,\n.fa-house:before {\n    content: "\\f015"; }' in css
+    assert '.fa-user:before {\n    content: "\\f007"; }' in css
+
+
+def test_generate_css_core() -> None:
+    core = fa_extractor.CoreFont(
+        codepoints={"user": "f007", "arrow-right": "f061", "arrow-left": "f060"},
+        font_flavors=[("fontawesome-core.woff2", "woff2")],
+        url="https://static.example.com/fa/",
+    )
+
+    css = fa_extractor.generate_css(
+        {"user": "f007", "github": "f09b"},
+        [("fontawesome-subset.woff2", "woff2")],
+        core=core,
+        subset_codepoints=["f09b"],
+    )
+
+    core_font = (
+        "  src:\n"
+        "    url('https://static.example.com/fa/fontawesome-core.woff2') "
+        "format('woff2');\n"
+        "  unicode-range: U+F007, U+F060-F061;\n"
+    )
+    subset_font = (
+        "  src:\n"
+        "    url('../fonts/fontawesome-subset.woff2') format('woff2');\n"
+        "  unicode-range: U+F09B;\n"
+    )
+    # The build's own font comes last, so that it takes precedence.
+    assert 0 <= css.index(core_font) < css.index(subset_font)
+    assert '.fa-user:before {\n    content: "\\f007"; }' in css
+    assert '.fa-github:before {\n    content: "\\f09b"; }' in css
+    assert ".fa-arrow-left" not in css
+
+    css = fa_extractor.generate_css({"user": "f007"}, [], core=core)
+    assert css.count("@font-face") == 1
+
+
+def test_generate_font_subset_core(fa_dir: Path, tmp_path: Path) -> None:
+    core_out = tmp_path / "core" / "fontawesome-core"
+    core_out.parent.mkdir()
+    core = fa_extractor.generate_core_font(
+        fa_dir, core_out, ["user", "home"], "/static/fa", output_font_flavors=["ttf"]
+    )
+
+    assert core.codepoints == {"user": "f007", "house": "f015"}
+    assert core.font_flavors == [("fontawesome-core.ttf", "ttf")]
+    with ttLib.TTFont(core_out.with_suffix(".ttf")) as font:
+        assert set(font.getBestCmap()) == {0xF007, 0xF015}
+
+    css_out = tmp_path / "fontawesome-subset.css"
+    font_out = tmp_path / "fontawesome-subset"
+    outputs = fa_extractor.generate_font_subset(
+        fa_dir,
+        css_out,
+        font_out,
+        ["user", "github", "regular:star"],
+        output_font_flavors=["ttf"],
+        core=core,
+    )
+
+    assert set(outputs) == {"fontawesome-subset.css", "fontawesome-subset.ttf"}
+    with ttLib.TTFont(font_out.with_suffix(".ttf")) as font:
+        assert set(font.getBestCmap()) == {0xF09B, 0xF005}
+    css = css_out.read_text()
+    assert "url('/static/fa/fontawesome-core.ttf')" in css
+    assert "unicode-range: U+F005, U+F09B;" in css
+    assert ".fa-user:before" in css
+
+    # Builds whose icons are all in the core font get no font of their own.
+    font_out.with_suffix(".ttf").unlink()
+    outputs = fa_extractor.generate_font_subset(
+        fa_dir, css_out, font_out, ["house"], output_font_flavors=["ttf"], core=core
+    )
+    assert set(outputs) == {"fontawesome-subset.css"}
+    assert not font_out.with_suffix(".ttf").exists()
+    assert css_out.read_text().count("@font-face") == 1
+
+
+def test_generate_font_subset_aliases(fa_dir: Path, tmp_path: Path) -> None:
+    css_out = tmp_path / "fontawesome-subset.css"
+    with mock.patch.object(
+        fa_extractor, "load_codepoints", wraps=fa_extractor.load_codepoints
+    ) as load_codepoints:
+        fa_extractor.generate_font_subset(
+            fa_dir,
+            css_out,
+            tmp_path / "fontawesome-subset",
+            ["home", "user", "house", "feed", "user"],
+        )
+
+    # Duplicates and aliases are removed before looking up codepoints.
+    assert load_codepoints.call_args.args[1] == ["house", "user", "rss"]
+
+    css = css_out.read_text()
+    assert css.count('content: "\\f015"') == 1
+    assert css.count('content: "\\f007"') == 1
+    assert ".fa-home:before,\n.fa-house:before {" in css
+    assert ".fa-feed:before,\n.fa-rss-mod:before {" in css
+
+
+@pytest.mark.parametrize(
+    "glyphs,v4compat",
+    (
+        (["user", "envelope-o", "github"], False),
+        (["v4compat:user"], True),
+        (["weird-v4-only"], True),
+    ),
+)
+def test_generate_font_subset_v4compat(
+    fa_dir: Path, tmp_path: Path, glyphs: Sequence[str], v4compat: bool
+) -> None:
+    css_out = tmp_path / "fontawesome-subset.css"
+    with mock.patch.object(
+        fa_extractor, "_subset_font", wraps=fa_extractor._subset_font
+    ) as subset_font:
+        fa_extractor.generate_font_subset(
+            fa_dir, css_out, tmp_path / "fontawesome-subset", glyphs
+        )
+
+    fonts_subset = {call.args[0].name for call in subset_font.call_args_list}
+    assert ("fa-v4compatibility.ttf" in fonts_subset) == v4compat
+
+
+def test_generate_font_subset_shims(fa_dir: Path, tmp_path: Path) -> None:
+    css_out = tmp_path / "fontawesome-subset.css"
+    fa_extractor.generate_font_subset(
+        fa_dir, css_out, tmp_path / "fontawesome-subset", ["envelope-o"]
+    )
+
+    css = css_out.read_text()
+    assert ".fa-envelope-o:before,\n.fa-envelope:before {" in css
+    assert 'content: "\\f0e0"' in css
+    with ttLib.TTFont(tmp_path / "fontawesome-subset.woff2") as font:
+        with ttLib.TTFont(
+            fa_extractor.find_input_fonts(fa_dir, include=("regular",))[0]
+        ) as regular:
+            glyph = font.getBestCmap()[0xF0E0]
+            regular_glyph = regular.getBestCmap()[0xF0E0]
+            assert (
+                font["glyf"][glyph].coordinates
+                == regular["glyf"][regular_glyph].coordinates
+            )
+
+
+def test_generate_font_subset_reads_metadata_once(
+    tmp_fa_dir: Path, tmp_path: Path
+) -> None:
+    with mock.patch.object(
+        icon_index, "_read_metadata", wraps=icon_index._read_metadata
+    ) as read_metadata:
+        fa_extractor.generate_font_subset(
+            tmp_fa_dir,
+            tmp_path / "fontawesome-subset.css",
+            tmp_path / "fontawesome-subset",
+            ["home", "envelope-o"],
+        )
+
+    # Once for the icon metadata and once for the shims.
+    assert read_metadata.call_count == 2
@@ -0,0 +1,185 @@
+import os
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from fa_subset import cache, fa_extractor, icon_index
+
+
+def test_build_matches_load_codepoints(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    index = icon_index.build(css_file)
+
+    assert index
+    glyphs = sorted(index.keys() - {"rss"})
+    assert index == {
+        **fa_extractor.load_codepoints(css_file, glyphs),
+        "rss": index["rss"],
+    }
+
+
+def test_write_and_load(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    assert icon_index.load(tmp_fa_dir, css_file) is None
+
+    index = icon_index.write(tmp_fa_dir, css_file)
+
+    assert (tmp_fa_dir / icon_index.INDEX_FILE).exists()
+    assert icon_index.load(tmp_fa_dir, css_file) == index
+
+
+def test_load_stale(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    icon_index.write(tmp_fa_dir, css_file)
+
+    css_file.write_text(css_file.read_text() + "\n/* Modified */\n")
+    os.utime(css_file, ns=(0, 0))
+
+    assert icon_index.load(tmp_fa_dir, css_file) is None
+
+
+def test_ensure_index(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+
+    index = fa_extractor.ensure_index(tmp_fa_dir)
+
+    assert index == icon_index.build(css_file)
+    assert icon_index.load(tmp_fa_dir, css_file) == index
+
+
+def test_build_aliases(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+
+    aliases = icon_index.build_aliases(css_file)
+
+    assert aliases["home"] == "house"
+    assert aliases["home-alt"] == "house"
+    assert aliases["feed"] == "rss"
+    assert "house" not in aliases
+
+
+def test_build_aliases_no_metadata(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    icon_index.metadata_file(css_file).unlink()
+
+    assert icon_index.build_aliases(css_file) == {}
+
+
+def test_build_shims(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+
+    shims = icon_index.build_shims(css_file)
+
+    assert shims == {
+        "envelope-o": "regular:envelope",
+        "star-o": "regular:star",
+        "feed": "rss",
+    }
+
+
+def test_build_shims_no_metadata(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    icon_index.shims_file(css_file).unlink()
+
+    assert icon_index.build_shims(css_file) == {}
+
+
+def test_build_styles(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+
+    styles = icon_index.build_styles(css_file)
+
+    assert styles["f007"] == ["solid", "regular"]
+    assert styles["f09b"] == ["brands"]
+    # Only in the v4 compatibility font.
+    assert "f003" not in styles
+
+
+def test_load_aliases(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    assert icon_index.load_aliases(tmp_fa_dir, css_file) is None
+
+    icon_index.write(tmp_fa_dir, css_file)
+
+    assert icon_index.load_aliases(tmp_fa_dir, css_file) == icon_index.build_aliases(
+        css_file
+    )
+
+
+def test_load_index(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+    assert icon_index.load_index(tmp_fa_dir, css_file) is None
+
+    index = fa_extractor.load_icon_index(tmp_fa_dir)
+
+    assert index == icon_index.load_index(tmp_fa_dir, css_file)
+    assert index.codepoints == icon_index.build(css_file)
+    assert index.aliases == icon_index.build_aliases(css_file)
+    assert "house" in index.trigrams["hou"]
+    assert index.codepoint("home") == index.codepoint("house")
+    assert index.codepoint("not-an-icon") is None
+
+
+def test_load_index_read_only(tmp_fa_dir: Path) -> None:
+    (css_file,) = tmp_fa_dir.glob("**/css/all.css")
+
+    with mock.patch.object(cache, "write_atomic", side_effect=PermissionError):
+        index = fa_extractor.load_icon_index(tmp_fa_dir)
+
+    assert index == icon_index.build_index(css_file)
+    assert icon_index.load_index(tmp_fa_dir, css_file) is None
+
+
+def test_search_prefix(tmp_fa_dir: Path) -> None:
+    index = fa_extractor.load_icon_index(tmp_fa_dir)
+
+    matches = icon_index.search(index, "hom")
+
+    assert [match.name for match in matches] == ["home", "home-alt", "house"]
+    assert matches[0] == icon_index.IconMatch(
+        name="home", codepoint=index.codepoints["house"], alias_of="house"
+    )
+    assert matches[2].alias_of is None
+
+
+@pytest.mark.parametrize(
+    ("term", "expected"),
+    (
+        ("usr", ["user"]),
+        ("arow", ["arrow-left", "arrow-right"]),
+        ("Envelop", ["envelope", "envelope-o"]),
+    ),
+)
+def test_search_fuzzy(tmp_fa_dir: Path, term: str, expected: list[str]) -> None:
+    index = fa_extractor.load_icon_index(tmp_fa_dir)
+
+    assert [match.name for match in icon_index.search(index, term)] == expected
+
+
+def test_search_limit(tmp_fa_dir: Path) -> None:
+    index = fa_extractor.load_icon_index(tmp_fa_dir)
+
+    assert [match.name for match in icon_index.search(index, "a", limit=2)] == [
+        "angle-left",
+        "arrow-left",
+    ]
+    assert icon_index.search(index, "xyzzy") == []
+
+
+def test_check(tmp_fa_dir: Path) -> None:
+    index = fa_extractor.load_icon_index(tmp_fa_dir)
+    icon_index.check(index, ["user", "home", "house"])
+
+    with pytest.raises(icon_index.UnknownIconsError) as exc_info:
+        icon_index.check(index, ["usr", "house", "xyzzy", "envelop"])
+
+    assert exc_info.value.suggestions == {
+        "usr": ["user"],
+        "xyzzy": [],
+        "envelop": ["envelope", "envelope-o"],
+    }
+    assert str(exc_info.value) == (
+        "Unknown icons: usr (did you mean: user?), xyzzy, "
+        "envelop (did you mean: envelope, envelope-o?)"
+    )
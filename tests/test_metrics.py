@@ -0,0 +1,94 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from fa_subset import metrics
+
+
+def _make_metrics() -> metrics.BuildMetrics:
+    build_metrics = metrics.BuildMetrics(
+        timestamp=1700000000.0,
+        duration=1.5,
+        glyphs=3,
+        fonts_touched=2,
+        peak_rss=1024,
+    )
+    build_metrics.stage_seconds["subset"] += 0.5
+    build_metrics.stage_seconds["merge"] += 0.25
+    build_metrics.output_bytes.update(woff2=1000, woff=1200)
+    build_metrics.record_cache("subset", hit=False)
+    build_metrics.record_cache("source", hit=True)
+    build_metrics.record_cache("source", hit=False)
+    return build_metrics
+
+
+def test_json_lines_sink(tmp_path: Path) -> None:
+    metrics_file = tmp_path / "metrics.jsonl"
+    sink = metrics.sink(metrics_file, "jsonl")
+
+    sink.emit(_make_metrics())
+    sink.emit(_make_metrics())
+
+    lines = metrics_file.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {
+        "timestamp": 1700000000.0,
+        "duration": 1.5,
+        "glyphs": 3,
+        "fonts_touched": 2,
+        "stage_seconds": {"subset": 0.5, "merge": 0.25},
+        "output_bytes": {"woff2": 1000, "woff": 1200},
+        "cache_hits": {"source": 1},
+        "cache_misses": {"subset": 1, "source": 1},
+        "peak_rss": 1024,
+    }
+
+
+def test_prometheus_textfile_sink(tmp_path: Path) -> None:
+    metrics_file = tmp_path / "fa_subset.prom"
+    sink = metrics.sink(metrics_file, "prometheus")
+
+    sink.emit(_make_metrics())
+    sink.emit(_make_metrics())
+
+    lines = metrics_file.read_text().splitlines()
+    assert "# TYPE fa_subset_builds_total counter" in lines
+    assert "fa_subset_builds_total 2" in lines
+    assert 'fa_subset_cache_hits_total{cache="source"} 2' in lines
+    assert 'fa_subset_cache_misses_total{cache="subset"} 2' in lines
+    assert "# TYPE fa_subset_last_build_glyphs gauge" in lines
+    assert "fa_subset_last_build_glyphs 3" in lines
+    assert 'fa_subset_last_build_stage_duration_seconds{stage="merge"} 0.25' in lines
+    assert 'fa_subset_last_build_output_bytes{flavor="woff2"} 1000' in lines
+    assert "fa_subset_peak_rss_bytes 1024" in lines
+    # Each metric is only described once.
+    assert lines.count("# TYPE fa_subset_last_build_output_bytes gauge") == 1
+
+
+def test_prometheus_textfile_sink_accumulates(tmp_path: Path) -> None:
+    metrics_file = tmp_path / "fa_subset.prom"
+    build_metrics = _make_metrics()
+    build_metrics.record_cache('odd "name"\\', hit=True)
+
+    # e.g. separate runs of the CLI
+    for _ in range(3):
+        metrics.sink(metrics_file, "prometheus").emit(build_metrics)
+
+    lines = metrics_file.read_text().splitlines()
+    assert "fa_subset_builds_total 3" in lines
+    assert 'fa_subset_cache_hits_total{cache="source"} 3' in lines
+    assert 'fa_subset_cache_hits_total{cache="odd \\"name\\"\\\\"} 3' in lines
+    assert 'fa_subset_cache_misses_total{cache="subset"} 3' in lines
+
+
+def test_sink_unknown_format(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        metrics.sink(tmp_path / "metrics.txt", "csv")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Peak RSS is unknown on Windows")
+def test_peak_rss() -> None:
+    rss = metrics.peak_rss()
+    assert rss is not None and rss > 1024**2
@@ -1,3 +1,5 @@
+import json
+import os
 import textwrap
 from collections.abc import Callable, Iterable, Sequence
 from pathlib import Path
@@ -158,3 +160,55 @@ def test_glyphs(
 def test_invalid_type(bad_input) -> None:
     with pytest.raises(TypeError):
         input_reader.read_txt(bad_input)
+
+
+@pytest.mark.parametrize(
+    "file_name, contents",
+    (
+        ("glyphs.txt", "user\nrss # Comment\n\ngithub\n"),
+        ("glyphs", "user\nrss\ngithub"),
+        ("glyphs.json", '["user", "rss", "github"]'),
+        ("glyphs.json", '{"team": "web", "icons": ["user", "rss", "github"]}'),
+        ("glyphs.toml", 'team = "web"\nicons = ["user", "rss", "github"]\n'),
+    ),
+)
+def test_read_file(tmp_path: Path, file_name: str, contents: str) -> None:
+    glyph_file = tmp_path / file_name
+    glyph_file.write_text(contents)
+
+    assert tuple(input_reader.read_file(glyph_file)) == ("user", "rss", "github")
+
+
+@pytest.mark.parametrize(
+    "file_name, contents",
+    (
+        ("glyphs.json", '{"glyphs": ["user"]}'),
+        ("glyphs.json", '["user", 3]'),
+        ("glyphs.toml", 'icons = "user"\n'),
+    ),
+)
+def test_read_file_invalid(tmp_path: Path, file_name: str, contents: str) -> None:
+    glyph_file = tmp_path / file_name
+    glyph_file.write_text(contents)
+
+    with pytest.raises(ValueError, match="expected a list of icon names"):
+        tuple(input_reader.read_file(glyph_file))
+
+
+def test_read_inputs(tmp_path: Path) -> None:
+    for team, icons in (("b", ["rss", "user"]), ("a", ["user", "github"])):
+        (tmp_path / "teams" / team).mkdir(parents=True)
+        (tmp_path / "teams" / team / "icons.json").write_text(json.dumps(icons))
+    (tmp_path / "extra.txt").write_text("house\n")
+
+    glyphs = input_reader.read_inputs(
+        [tmp_path / "extra.txt", os.fspath(tmp_path / "teams" / "**" / "*.json")]
+    )
+
+    # Globs are expanded in sorted order, and duplicates are kept.
+    assert tuple(glyphs) == ("house", "user", "github", "rss", "user")
+
+
+def test_expand_inputs_no_match(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError, match="No files match"):
+        list(input_reader.expand_inputs([os.fspath(tmp_path / "*.toml")]))
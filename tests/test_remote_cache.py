@@ -0,0 +1,100 @@
+import os
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+from fa_subset import remote_cache
+
+
+@pytest.fixture(params=("directory", "http"))
+def backend(request, tmp_path: Path, fake_server) -> remote_cache.Backend:
+    if request.param == "directory":
+        return remote_cache.DirectoryBackend(tmp_path / "remote")
+    return remote_cache.HTTPBackend(fake_server.url + "/cache/")
+
+
+def test_get_put(backend: remote_cache.Backend) -> None:
+    assert backend.get("0123abcd") is None
+
+    backend.put("0123abcd", b"Some data")
+
+    assert backend.get("0123abcd") == b"Some data"
+    assert backend.get("4567abcd") is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Modes are POSIX only")
+def test_directory_backend_readable(tmp_path: Path) -> None:
+    umask = os.umask(0o022)
+    os.umask(umask)
+    backend = remote_cache.DirectoryBackend(tmp_path)
+
+    backend.put("0123abcd", b"Some data")
+
+    # Other users of a shared directory can read the entry, as the umask allows.
+    mode = stat.S_IMODE((tmp_path / "01" / "0123abcd").stat().st_mode)
+    assert mode == 0o666 & ~umask
+
+
+def test_store_and_load(backend: remote_cache.Backend) -> None:
+    fonts = {"woff": b"woff data", "woff2": b"woff2 data"}
+    sizes_before = {"woff": 20, "woff2": 15}
+
+    assert remote_cache.load(backend, "key", ("woff", "woff2")) is None
+
+    remote_cache.store_async(backend, "key", fonts, sizes_before)
+    remote_cache.wait_for_uploads()
+
+    assert remote_cache.load(backend, "key", ("woff", "woff2")) == (
+        fonts,
+        sizes_before,
+    )
+    assert remote_cache.load(backend, "key", ("woff2",)) == (
+        {"woff2": b"woff2 data"},
+        sizes_before,
+    )
+    # Missing flavors are a miss, not an error
+    assert remote_cache.load(backend, "key", ("ttf",)) is None
+
+
+def test_http_backend_errors(fake_server, caplog) -> None:
+    backend = remote_cache.HTTPBackend(fake_server.url + "/does-not-exist")
+    fake_server.close()
+
+    assert remote_cache.load(backend, "key", ("woff2",)) is None
+    remote_cache.store_async(backend, "key", {"woff2": b"data"}, {})
+    remote_cache.wait_for_uploads()
+
+    assert "Failed to load key" in caplog.text
+    assert "Failed to store key" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "url, expected_type, expected_location",
+    (
+        (
+            "http://cache.example/fa",
+            remote_cache.HTTPBackend,
+            "http://cache.example/fa",
+        ),
+        ("https://cache.example/", remote_cache.HTTPBackend, "https://cache.example"),
+        ("file:///mnt/cache", remote_cache.DirectoryBackend, Path("/mnt/cache")),
+        ("/mnt/cache", remote_cache.DirectoryBackend, Path("/mnt/cache")),
+        ("relative/cache", remote_cache.DirectoryBackend, Path("relative/cache")),
+    ),
+)
+def test_backend_from_url(url: str, expected_type: type, expected_location) -> None:
+    backend = remote_cache.backend_from_url(url)
+
+    assert isinstance(backend, expected_type)
+    if isinstance(backend, remote_cache.HTTPBackend):
+        assert backend.url == expected_location
+    else:
+        assert isinstance(backend, remote_cache.DirectoryBackend)
+        assert backend.root == expected_location
+
+
+def test_backend_from_url_unsupported() -> None:
+    with pytest.raises(ValueError):
+        remote_cache.backend_from_url("s3://bucket/cache")
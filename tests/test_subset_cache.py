@@ -0,0 +1,71 @@
+import concurrent.futures
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+from fa_subset import subset_cache
+
+
+def _make_fonts(tmp_path: Path) -> list[Path]:
+    fonts = []
+    for name, contents in (("a.ttf", b"Font A"), ("b.ttf", b"Font B")):
+        font = tmp_path / name
+        font.write_bytes(contents)
+        fonts.append(font)
+    return fonts
+
+
+def test_subset_key_stable(tmp_path: Path) -> None:
+    fonts = _make_fonts(tmp_path)
+
+    key = subset_cache.subset_key(fonts, ["f007", "f09e"], ["woff", "woff2"])
+    assert key == subset_cache.subset_key(fonts, ["F09E", "f007"], ["woff2", "woff"])
+
+
+def test_subset_key_changes(tmp_path: Path) -> None:
+    fonts = _make_fonts(tmp_path)
+    key = subset_cache.subset_key(fonts, ["f007"], ["woff2"])
+
+    assert key != subset_cache.subset_key(fonts, ["f007", "f09e"], ["woff2"])
+    assert key != subset_cache.subset_key(fonts, ["f007"], ["woff2", "ttf"])
+    assert key != subset_cache.subset_key(fonts, ["f007"], ["woff2"], optimize="size")
+    assert key != subset_cache.subset_key(fonts[:1], ["f007"], ["woff2"])
+
+    fonts[0].write_bytes(b"Font A, version 2")
+    assert key != subset_cache.subset_key(fonts, ["f007"], ["woff2"])
+
+
+def test_store_and_load(tmp_path: Path) -> None:
+    fonts = {"woff": b"woff data", "woff2": b"woff2 data"}
+    sizes_before = {"woff": 20, "woff2": 15}
+
+    assert subset_cache.load(tmp_path, "key", ("woff", "woff2")) is None
+
+    subset_cache.store(tmp_path, "key", fonts, sizes_before)
+
+    assert subset_cache.load(tmp_path, "key", ("woff", "woff2")) == (
+        fonts,
+        sizes_before,
+    )
+    assert subset_cache.load(tmp_path, "key", ("ttf",)) is None
+    assert subset_cache.load(tmp_path, "other_key", ("woff",)) is None
+
+
+def test_load_or_build_concurrent(tmp_path: Path) -> None:
+    fonts = {"woff2": b"woff2 data"}
+    build_calls = []
+
+    def build() -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+        build_calls.append(None)
+        time.sleep(0.1)
+        return fonts, {}
+
+    def load_or_build(_) -> tuple[Mapping[str, bytes], Mapping[str, int]]:
+        return subset_cache.load_or_build(tmp_path, "key", ("woff2",), build)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(load_or_build, range(8)))
+
+    assert len(build_calls) == 1
+    assert all(result == (fonts, {}) for result in results)
+    assert subset_cache.load(tmp_path, "key", ("woff2",)) == (fonts, {})
@@ -0,0 +1,60 @@
+from pathlib import Path
+from unittest import mock
+
+from fontTools import ttLib
+
+from fa_subset import fa_extractor, superfont
+
+
+def test_ensure(tmp_fa_dir: Path) -> None:
+    input_fonts = fa_extractor.find_input_fonts(tmp_fa_dir)
+    assert superfont.load(tmp_fa_dir, input_fonts) is None
+
+    built = superfont.ensure(tmp_fa_dir, input_fonts)
+
+    assert built.path.is_relative_to(tmp_fa_dir / superfont.SUPERFONT_DIR)
+    assert superfont.load(tmp_fa_dir, input_fonts) == built
+    with mock.patch.object(superfont, "_merge") as merge:
+        assert superfont.ensure(tmp_fa_dir, input_fonts) == built
+    merge.assert_not_called()
+
+    # Other combinations of input fonts get their own superfont.
+    other = superfont.ensure(tmp_fa_dir, input_fonts[:2])
+    assert other.path != built.path
+    assert set(other.cmaps) == {font.name for font in input_fonts[:2]}
+
+
+def test_cmaps(tmp_fa_dir: Path) -> None:
+    input_fonts = fa_extractor.find_input_fonts(tmp_fa_dir)
+
+    built = superfont.ensure(tmp_fa_dir, input_fonts)
+
+    with ttLib.TTFont(built.path) as font:
+        glyph_order = font.getGlyphOrder()
+        # The superfont's own character map takes each codepoint from the
+        # first font that has it, like fa_extractor does by default.
+        assert (
+            font.getBestCmap()[0xF007]
+            == glyph_order[built.cmaps["fa-solid-900.ttf"][0xF007]]
+        )
+        # No substitutions are added between the styles of an icon.
+        assert "GSUB" not in font
+
+        for font_in in input_fonts:
+            with ttLib.TTFont(font_in) as source:
+                for cp, glyph in source.getBestCmap().items():
+                    gid = built.cmaps[font_in.name][cp]
+                    assert (
+                        font["glyf"][glyph_order[gid]].numberOfContours
+                        == source["glyf"][glyph].numberOfContours
+                    )
+
+
+def test_rebuilt_when_fonts_change(tmp_fa_dir: Path) -> None:
+    input_fonts = fa_extractor.find_input_fonts(tmp_fa_dir)
+    built = superfont.ensure(tmp_fa_dir, input_fonts)
+
+    input_fonts[0].write_bytes(input_fonts[0].read_bytes() + b"\0")
+
+    assert superfont.load(tmp_fa_dir, input_fonts) is None
+    assert superfont.ensure(tmp_fa_dir, input_fonts).path != built.path
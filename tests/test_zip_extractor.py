@@ -1,5 +1,9 @@
+import concurrent.futures
+import zipfile
 from pathlib import Path
 
+import pytest
+
 from fa_subset import zip_extractor
 
 
@@ -10,3 +14,54 @@ def test_zip_extraction(tmp_fa_zip: Path) -> None:
     assert actual_path == expected_path
     assert actual_path.exists()
     assert actual_path.is_dir()
+
+
+def test_zip_extraction_concurrent(tmp_fa_zip: Path) -> None:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+        actual_paths = set(executor.map(zip_extractor.unzip, [tmp_fa_zip] * 8))
+
+    (actual_path,) = actual_paths
+    assert actual_path == tmp_fa_zip.parent / "fontawesome-free-6.2.1-web"
+    assert next(actual_path.glob("**/all.css")).exists()
+    # No staging directories are left behind
+    assert {path.name for path in tmp_fa_zip.parent.iterdir()} == {
+        tmp_fa_zip.name,
+        actual_path.name,
+        f".{actual_path.name}.lock",
+    }
+
+
+def test_verify(tmp_fa_zip: Path) -> None:
+    zip_extractor.verify(tmp_fa_zip)
+
+
+def test_verify_not_a_zip(tmp_path: Path) -> None:
+    bad_zip = tmp_path / "fontawesome-free-6.2.1-web.zip"
+    bad_zip.write_bytes(b"<html>Not found</html>")
+
+    with pytest.raises(ValueError):
+        zip_extractor.verify(bad_zip)
+
+
+def test_verify_not_font_awesome(tmp_path: Path) -> None:
+    other_zip = tmp_path / "other.zip"
+    with zipfile.ZipFile(other_zip, "w") as zf:
+        zf.writestr("other/readme.txt", "Hello")
+
+    with pytest.raises(ValueError):
+        zip_extractor.verify(other_zip)
+
+
+def test_verify_corrupt(tmp_path: Path) -> None:
+    corrupt_zip = tmp_path / "corrupt.zip"
+    with zipfile.ZipFile(corrupt_zip, "w") as zf:
+        zf.writestr("fa/css/all.css", "A" * 1000)
+        zf.writestr("fa/webfonts/fa-solid-900.ttf", "B" * 1000)
+
+    data = bytearray(corrupt_zip.read_bytes())
+    offset = data.index(b"A" * 1000)
+    data[offset : offset + 10] = b"C" * 10
+    corrupt_zip.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError):
+        zip_extractor.verify(corrupt_zip)